@@ -1,29 +1,60 @@
 # sls_agent/agent.py
-import time, threading
+import os, time, threading
 from .config import Config
 from .rhino_watch import RhinoWatcher
 from .fs_watch import DoneFileWatcher
 from .gui import toast
+from .outbox import Outbox
+from .heartbeat import HeartbeatCadence, SAMPLE_INTERVAL
+from .transport import Outbound, WSClient
 
 INACTIVITY_MINUTES = 15
 
 def run():
     cfg = Config.load()
     rhino = RhinoWatcher()
-    fsw = DoneFileWatcher(cfg)
 
-    # Register
-    cfg.http_post("/api/agents/register", {
-        "agent_id": cfg.agent_id,
-        "user": cfg.user,
-        "hostname": cfg.hostname,
-    })
+    # Register (the server must know us before it accepts the channel)
+    delay = 1.0
+    while True:
+        try:
+            cfg.http_post("/api/agents/register", {
+                "agent_id": cfg.agent_id,
+                "user": cfg.user,
+                "hostname": cfg.hostname,
+            })
+            break
+        except Exception as e:
+            print("[register] failed:", repr(e))
+            time.sleep(delay)
+            delay = min(60.0, delay * 2)
+
+    channel = WSClient(cfg)
+    channel.start()
+    outbound = Outbound(cfg, channel, Outbox())
+    fsw = DoneFileWatcher(cfg, outbound.event)
 
     last_active_ts = time.time()
     inactive_alerted = False
 
+    def start_task(msg):
+        nonlocal last_active_ts, inactive_alerted
+        task_id = msg.get("task_id")
+        if not task_id:
+            return
+        new = task_id != cfg.active_task_id
+        cfg.active_task_id = task_id
+        last_active_ts, inactive_alerted = time.time(), False
+        try:
+            fsw.ensure_folder(os.path.join(cfg.job_root, task_id))
+        except Exception as e:
+            print("[task] cannot watch job folder:", repr(e))
+        if new:
+            toast(f"New SLS task {task_id}: {msg.get('filename') or ''}")
+
     def hb_loop():
         nonlocal last_active_ts, inactive_alerted
+        cadence = HeartbeatCadence()
         while True:
             snap = rhino.snapshot()
             if snap["is_rhino_running"] or snap["is_rhino_foreground"]:
@@ -36,13 +67,9 @@ def run():
                 "is_rhino_running": snap["is_rhino_running"],
                 "is_rhino_foreground": snap["is_rhino_foreground"],
                 "active_task_id": cfg.active_task_id,
-                "cpu_5m": 0.0,  # keep simple, or compute rolling avg
+                "cpu_5m": snap["cpu_5m"],
                 "idle_minutes": snap["idle_minutes"],
             }
-            try:
-                cfg.http_post("/api/agents/heartbeat", hb)
-            except Exception:
-                pass
 
             # inactivity detection
             mins_since_active = (time.time() - last_active_ts) / 60.0
@@ -51,25 +78,33 @@ def run():
                     toast("You have an active SLS task. Please resume Rhino.")
                 except Exception:
                     pass
-                try:
-                    cfg.http_post("/api/agents/event", {
-                        "agent_id": cfg.agent_id,
-                        "type": "inactive_15m",
-                        "task_id": cfg.active_task_id
-                    })
-                except Exception:
-                    pass
+                outbound.event("inactive_15m", cfg.active_task_id)
                 inactive_alerted = True
 
-            time.sleep(30)
+            # Only changes and the periodic keepalive are recorded (on disk first)
+            # and uploaded with any pending events and backlog.
+            beat = cadence.sample(hb)
+            if beat is not None:
+                outbound.heartbeat(*beat)
+            elif len(outbound.outbox):
+                outbound.flush()  # retry what an outage left behind
 
-    threading.Thread(target=hb_loop, daemon=True).start()
+            time.sleep(SAMPLE_INTERVAL)
 
-    # In a simple build we don’t run a WS loop yet; we only react to assignment
-    # via Telegram → server → push to agent (HTTP long-poll can be added later).
+    threading.Thread(target=hb_loop, daemon=True).start()
 
+    # Server → agent: assignments made via Telegram / the API arrive here.
     while True:
-        time.sleep(3600)  # keep process alive
+        msg = channel.recv(timeout=60)
+        kind = msg.get("type")
+        if kind == "hello":
+            # (Re)connected: adopt the server's view of our task.
+            if msg.get("task"):
+                start_task(msg["task"])
+            else:
+                cfg.active_task_id = msg.get("active_task_id")
+        elif kind == "assign":
+            start_task(msg)
 
 if __name__ == "__main__":
     run()
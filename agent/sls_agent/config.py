@@ -1,5 +1,22 @@
 # sls_agent/config.py
-import os, getpass, socket, httpx
+import os, getpass, socket, random, time, threading, httpx
+
+HTTP_RETRIES = int(os.getenv("SLS_HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("SLS_HTTP_BACKOFF", "0.5"))   # s, doubled per attempt, full jitter
+RETRY_STATUS = {429, 502, 503, 504}
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _retry_after(r):
+    try:
+        return min(float(r.headers["Retry-After"]), 30.0)
+    except (KeyError, ValueError):
+        return None
 
 class Config:
     def __init__(self):
@@ -10,17 +27,52 @@ class Config:
         self.job_root = os.getenv("JOB_ROOT", r"C:\SLS\Jobs")
         self.token = os.getenv("SLS_TOKEN", "")
         self.active_task_id = None
+        self._client = None
+        self._client_lock = threading.Lock()
 
     @staticmethod
     def load():
         # Optionally parse .env here if you want
         return Config()
 
-    def http_post(self, path: str, json: dict):
-        url = f"{self.base}{path}"
-        headers = {}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
-        r = httpx.post(url, json=json, headers=headers, timeout=15)
-        r.raise_for_status()
-        return r.json()
+    @property
+    def client(self):
+        """One keep-alive connection pool for every request to the server (HTTP/2 when h2 is installed)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+                    self._client = httpx.Client(
+                        base_url=self.base, headers=headers, http2=_http2_available(),
+                        timeout=httpx.Timeout(15.0, connect=5.0),
+                        limits=httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=120),
+                    )
+        return self._client
+
+    def request(self, method: str, path: str, retries: int = HTTP_RETRIES, **kw):
+        """Send with retries on connection errors / 429 / 5xx gateway errors; raises after the last attempt."""
+        for attempt in range(retries + 1):
+            try:
+                r = self.client.request(method, path, **kw)
+                if r.status_code not in RETRY_STATUS or attempt == retries:
+                    r.raise_for_status()
+                    return r
+                delay = _retry_after(r)
+            except httpx.TransportError:
+                if attempt == retries:
+                    raise
+                delay = None
+            if delay is None:
+                delay = random.uniform(0, HTTP_BACKOFF * 2 ** attempt)
+            time.sleep(delay)
+
+    def http_post(self, path: str, json: dict, **kw):
+        return self.request("POST", path, json=json, **kw).json()
+
+    def http_get(self, path: str, **kw):
+        return self.request("GET", path, **kw).json()
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
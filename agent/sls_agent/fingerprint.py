@@ -0,0 +1,47 @@
+# sls_agent/fingerprint.py
+import os, hashlib
+
+BLOCK = 4 * 1024 * 1024                       # Dropbox content_hash block size
+HEADER = b"3D Geometry File Format "
+
+def content_hash(path):
+    """
+    Dropbox content_hash (SHA-256 over the SHA-256 of each 4 MB block),
+    streamed through one reusable buffer, so the server can match the file
+    against its Dropbox catalog and memory stays flat for any file size.
+    """
+    outer = hashlib.sha256()
+    buf = bytearray(BLOCK)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            while n < BLOCK:  # short reads before EOF: fill the block
+                m = f.readinto(view[n:])
+                if not m:
+                    break
+                n += m
+            outer.update(hashlib.sha256(view[:n]).digest())
+    return outer.hexdigest()
+
+def _format_version(path):
+    """openNURBS archive version from the 32-byte file header (e.g. 70 for Rhino 7), or None."""
+    with open(path, "rb") as f:
+        head = f.read(32)
+    if not head.startswith(HEADER):
+        return None
+    try:
+        return int(head[len(HEADER):].strip())
+    except ValueError:
+        return None
+
+def fingerprint(path):
+    """
+    Hash + cheap metadata of a finished .3dm, sent with its file_done event.
+    Only the streamed hash and the file header are read; the model is never
+    parsed (rhino3dm can only load a whole file), so no bbox/layers/objects.
+    """
+    return {"content_hash": content_hash(path), "size": os.path.getsize(path),
+            "format_version": _format_version(path)}
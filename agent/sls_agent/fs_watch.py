@@ -1,40 +1,139 @@
 # sls_agent/fs_watch.py
 import os, time, threading
+from collections import OrderedDict
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from .fingerprint import fingerprint
+
+DONE_SUFFIX = "_done.3dm"
+SETTLE_SECONDS = float(os.getenv("SLS_DONE_SETTLE", "2.0"))  # size/mtime unchanged this long = written
+POLL_INTERVAL = 0.5
+REPORTED_MAX = 10000
 
 class _DoneHandler(FileSystemEventHandler):
-    def __init__(self, on_done):
-        self.on_done = on_done
+    """Runs on the observer thread: only records the path, no I/O."""
+    def __init__(self, touch):
+        self.touch = touch
+    def _check(self, path):
+        if path.lower().endswith(DONE_SUFFIX):
+            self.touch(path)
     def on_created(self, event):
-        if event.is_directory: return
-        if event.src_path.lower().endswith("_done.3dm"):
-            self.on_done(event.src_path)
+        if not event.is_directory: self._check(event.src_path)
+    def on_modified(self, event):
+        if not event.is_directory: self._check(event.src_path)
+    def on_moved(self, event):
+        # Save-via-temp-file: Rhino writes x.tmp, then renames it to x_done.3dm.
+        if not event.is_directory: self._check(event.dest_path)
 
 class DoneFileWatcher:
-    def __init__(self, cfg):
+    """
+    Recursive watch of the job tree for *_done.3dm files. Observer
+    callbacks only note the path; a settler thread reports a file once its
+    size and mtime have stayed put for SETTLE_SECONDS (Rhino may still be
+    writing a large model), so a half-written or temp-renamed save is
+    neither missed nor reported early. Completions, with the file's
+    fingerprint (content hash, 3dm metadata), go to `send_event` from the
+    settler thread, which queues them for the next batch upload.
+    """
+    def __init__(self, cfg, send_event):
         self.cfg = cfg
+        self.send_event = send_event
         self.observer = None
         self.watch_path = None
+        self._pending = {}                 # path -> (last event time, (size, mtime) or None)
+        self._reported = OrderedDict()     # path -> (size, mtime) already sent
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._settler = None
 
     def ensure_folder(self, path):
-        self.watch_path = path or self.cfg.job_root
-        os.makedirs(self.watch_path, exist_ok=True)
+        """Create `path` and make sure it is inside the watched tree (job_root by default)."""
+        path = path or self.cfg.job_root
+        os.makedirs(path, exist_ok=True)
+        if self.observer and _inside(path, self.watch_path):
+            return
+        root = self.cfg.job_root if _inside(path, self.cfg.job_root) else path
+        os.makedirs(root, exist_ok=True)
         if self.observer:  # re-arm
             self.observer.stop(); self.observer.join()
+        self.watch_path = root
         self.observer = Observer()
-        self.observer.schedule(_DoneHandler(self._on_done), self.watch_path, recursive=False)
+        self.observer.schedule(_DoneHandler(self._touch), root, recursive=True)
         self.observer.start()
+        if self._settler is None:
+            self._stop.clear()
+            self._settler = threading.Thread(target=self._settle_loop, name="done-settler", daemon=True)
+            self._settler.start()
+
+    def _touch(self, path):
+        with self._lock:
+            prev = self._pending.get(path)
+            self._pending[path] = (time.monotonic(), prev[1] if prev else None)
+
+    def _settle_loop(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            with self._lock:
+                pending = list(self._pending.items())
+            now = time.monotonic()
+            done = []
+            for path, (touched, last_stat) in pending:
+                try:
+                    st = os.stat(path)
+                except OSError:  # renamed away / deleted before it settled
+                    with self._lock:
+                        self._pending.pop(path, None)
+                    continue
+                stat = (st.st_size, st.st_mtime)
+                if stat != last_stat or now - touched < SETTLE_SECONDS:
+                    with self._lock:
+                        if self._pending.get(path, (None,))[0] == touched:
+                            self._pending[path] = (touched if stat == last_stat else now, stat)
+                    continue
+                with self._lock:
+                    if self._pending.get(path, (None,))[0] != touched:
+                        continue  # a new event came in meanwhile
+                    del self._pending[path]
+                if self._reported.get(path) != stat:
+                    done.append(path)
+                    self._reported[path] = stat
+                    self._reported.move_to_end(path)
+                    while len(self._reported) > REPORTED_MAX:
+                        self._reported.popitem(last=False)
+            for path in done:
+                self._on_done(path)
+
+    def _task_for(self, path):
+        """Task folder under job_root (job_root/<task_id>/...), else the active task."""
+        rel = os.path.relpath(path, self.cfg.job_root) if _inside(path, self.cfg.job_root) else ""
+        parts = rel.split(os.sep)
+        return parts[0] if len(parts) > 1 else self.cfg.active_task_id
 
     def _on_done(self, filepath):
-        # Notify server immediately
-        self.cfg.http_post("/api/agents/event", {
-            "agent_id": self.cfg.agent_id,
-            "type": "file_done",
-            "path": filepath
-        })
+        task_id = self._task_for(filepath)
+        meta = {}
+        try:
+            meta["fingerprint"] = fingerprint(filepath)
+        except OSError as e:
+            print("[fs_watch] could not fingerprint", filepath, repr(e))
+        try:
+            self.send_event("file_done", task_id, path=filepath, meta=meta)
+        except Exception as e:
+            print("[fs_watch] could not queue completion:", repr(e))
+            return
+        if task_id == self.cfg.active_task_id:
+            self.cfg.active_task_id = None
 
     def stop(self):
+        self._stop.set()
+        if self._settler:
+            self._settler.join(timeout=5)
+            self._settler = None
         if self.observer:
             self.observer.stop(); self.observer.join()
             self.observer = None
+
+def _inside(path, root):
+    if not root:
+        return False
+    path, root = os.path.abspath(path), os.path.abspath(root)
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
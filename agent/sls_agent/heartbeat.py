@@ -0,0 +1,57 @@
+# sls_agent/heartbeat.py
+import os, time
+
+SAMPLE_INTERVAL = float(os.getenv("SLS_HB_SAMPLE", "15"))   # local sampling period
+KEEPALIVE = float(os.getenv("SLS_HB_KEEPALIVE", "300"))     # full heartbeat at least this often
+CPU_STEP = float(os.getenv("SLS_HB_CPU_STEP", "10"))        # cpu_5m must move this many points
+IDLE_STEP = float(os.getenv("SLS_HB_IDLE_STEP", "5"))       # idle_minutes is reported in these steps
+
+class HeartbeatCadence:
+    """
+    Decides which locally sampled heartbeats are worth uploading.
+
+    A sample goes out as an "hb" delta (only the changed fields) when
+    Rhino starts/stops/comes to the front, the task changes, cpu_5m moves
+    by CPU_STEP, or idle_minutes crosses an IDLE_STEP boundary; otherwise
+    nothing is sent until KEEPALIVE, when the full state goes out as a
+    "heartbeat" (which also resyncs the server if a delta was lost).
+    Every upload carries `interval_s` since the previous one and
+    `active_s`, the part of it Rhino was running or in front, so the
+    server counts time instead of beats.
+    """
+    def __init__(self):
+        self._sent = None       # state as of the last upload
+        self._sent_at = None
+        self._sampled_at = None
+        self._active_s = 0.0
+
+    def _changed(self, hb):
+        for k, v in hb.items():
+            old = self._sent.get(k)
+            if k == "cpu_5m":
+                if abs((v or 0) - (old or 0)) >= CPU_STEP:
+                    return True
+            elif k == "idle_minutes":
+                if (v or 0) // IDLE_STEP != (old or 0) // IDLE_STEP:
+                    return True
+            elif v != old:
+                return True
+        return False
+
+    def sample(self, hb):
+        """-> (kind, data) to upload now, or None."""
+        now = time.monotonic()
+        if self._sampled_at is not None and (hb["is_rhino_running"] or hb["is_rhino_foreground"]):
+            # A long gap is sleep/suspend, not work.
+            self._active_s += min(now - self._sampled_at, 2 * SAMPLE_INTERVAL)
+        self._sampled_at = now
+        if self._sent is None or now - self._sent_at >= KEEPALIVE:
+            kind, data = "heartbeat", dict(hb)
+        elif self._changed(hb):
+            kind, data = "hb", {k: v for k, v in hb.items() if self._sent.get(k) != v}
+        else:
+            return None
+        data["interval_s"] = round(now - self._sent_at, 1) if self._sent_at is not None else 0.0
+        data["active_s"] = round(self._active_s, 1)
+        self._sent, self._sent_at, self._active_s = dict(hb), now, 0.0
+        return kind, data
@@ -0,0 +1,73 @@
+# sls_agent/outbox.py
+import os, json, sqlite3, threading, time, uuid
+
+OUTBOX_PATH = os.getenv("SLS_OUTBOX", os.path.join(
+    os.getenv("LOCALAPPDATA") or os.path.expanduser("~"), "SLS", "outbox.db"))
+OUTBOX_MAX_ROWS = int(os.getenv("SLS_OUTBOX_MAX_ROWS", "100000"))  # ~35 days of 30 s heartbeats, ~30 MB
+
+class Outbox:
+    """
+    Append-only on-disk queue (SQLite, WAL) for everything the agent uploads.
+
+    Rows are read back in `seq` order and deleted only after the server
+    confirms them, so heartbeats and file_done events survive network
+    outages and agent restarts. The server de-duplicates by (stream, seq);
+    `stream` is a random id kept in the file, so a deleted/recreated outbox
+    starts a fresh sequence. Disk use is bounded by OUTBOX_MAX_ROWS: when
+    full, the oldest heartbeats go first and events are kept longest.
+    """
+    def __init__(self, path=OUTBOX_PATH, max_rows=OUTBOX_MAX_ROWS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                         " kind TEXT NOT NULL, ts TEXT NOT NULL, data TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        row = self._db.execute("SELECT v FROM meta WHERE k='stream'").fetchone()
+        if row is None:
+            self.stream = uuid.uuid4().hex
+            self._db.execute("INSERT INTO meta VALUES ('stream', ?)", (self.stream,))
+        else:
+            self.stream = row[0]
+        self._count = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def __len__(self):
+        return self._count
+
+    def append(self, kind, data, ts=None):
+        ts = ts or time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        with self._lock:
+            self._db.execute("INSERT INTO outbox (kind, ts, data) VALUES (?, ?, ?)",
+                             (kind, ts, json.dumps(data, separators=(",", ":"))))
+            self._count += 1
+            if self._count > self.max_rows:
+                self._trim()
+
+    def _trim(self):
+        excess = self._count - self.max_rows + max(1, self.max_rows // 100)  # free 1% headroom at once
+        for where in ("kind IN ('heartbeat', 'hb')", "1"):
+            if excess <= 0:
+                break
+            cur = self._db.execute(f"DELETE FROM outbox WHERE seq IN (SELECT seq FROM outbox WHERE {where}"
+                                   " ORDER BY seq LIMIT ?)", (excess,))
+            self._count -= cur.rowcount
+            excess -= cur.rowcount
+
+    def peek(self, n):
+        """Oldest `n` rows as upload items."""
+        with self._lock:
+            rows = self._db.execute("SELECT seq, kind, ts, data FROM outbox ORDER BY seq LIMIT ?", (n,)).fetchall()
+        return [{"seq": seq, "kind": kind, "ts": ts, "data": json.loads(data)} for seq, kind, ts, data in rows]
+
+    def ack(self, upto_seq):
+        """The server has applied everything up to `upto_seq`."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM outbox WHERE seq <= ?", (upto_seq,))
+            self._count -= cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,7 +1,10 @@
 # sls_agent/rhino_watch.py
-import psutil, time, ctypes, win32gui, win32process
+import psutil, re, time, ctypes, win32gui, win32process
+from collections import deque
 
 RHINO_EXE_NAMES = {"rhino.exe", "rhino5.exe", "rhino6.exe", "rhino7.exe", "rhino8.exe"}
+CPU_WINDOW = 300.0  # seconds averaged into cpu_5m
+FULL_SCAN_INTERVAL = 120.0  # re-inspect every PID this often (catches PIDs reused between samples)
 
 def _get_foreground_pid():
     try:
@@ -22,34 +25,106 @@ def _os_idle_minutes():
     millis = ctypes.windll.kernel32.GetTickCount() - lastInputInfo.dwTime
     return int(millis / 1000 / 60)
 
+def _exe_version(exe):
+    """File version from the executable's version resource, e.g. '8.5.24072.13002'."""
+    try:
+        import win32api
+        info = win32api.GetFileVersionInfo(exe, "\\")
+        ms, ls = info["FileVersionMS"], info["FileVersionLS"]
+        return f"{ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+    except Exception:
+        return None
+
+def _name_version(name):
+    digits = [c for c in name if c.isdigit()]
+    return digits[0] if digits else "unknown"
+
+def _version_key(v):
+    """'10.0.1' > '8.5.24072.13002' > '8' (a name guess) > 'unknown'."""
+    return tuple(int(x) for x in re.findall(r"\d+", v))
+
 class RhinoWatcher:
     """
-    Snapshot-only helper, stateless. The agent loop decides what to alert/report.
+    Tracks Rhino processes without walking the whole process table.
+
+    Each snapshot lists PIDs only (one EnumProcesses call) and inspects
+    just the PIDs that appeared since the last one; known Rhino PIDs are
+    dropped when they disappear or the PID was reused. A PID that was
+    reused by a new Rhino between two samples looks already seen, so every
+    FULL_SCAN_INTERVAL all PIDs are inspected again. The version is
+    read from each Rhino executable once. cpu_5m is Rhino's share of the
+    machine over the last CPU_WINDOW seconds, from per-PID cpu_times()
+    deltas between snapshots. The agent loop decides what to alert/report.
     """
+    def __init__(self):
+        self._seen = set()        # every PID already inspected
+        self._rhino = {}          # pid -> psutil.Process
+        self._pid_version = {}    # pid -> version
+        self._cpu = {}            # pid -> cpu seconds at the last sample
+        self._versions = {}       # exe path -> version
+        self._samples = deque()   # (wall time, rhino cpu seconds since the previous sample)
+        self._ncpu = psutil.cpu_count() or 1
+        self._full_scan_at = 0.0
+
+    def _scan(self, now):
+        pids = set(psutil.pids())
+        new = pids - self._seen
+        if now - self._full_scan_at >= FULL_SCAN_INTERVAL:
+            self._full_scan_at = now
+            new = pids - self._rhino.keys()
+        for pid in new:
+            try:
+                p = psutil.Process(pid)
+                if p.name().lower() in RHINO_EXE_NAMES:
+                    self._rhino[pid] = p
+                    self._pid_version[pid] = self._version(p)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        self._seen = pids
+        for pid, p in list(self._rhino.items()):
+            if pid not in pids or not p.is_running():  # is_running also catches PID reuse
+                del self._rhino[pid]
+                self._seen.discard(pid)  # if reused, inspect the new process next time
+                self._cpu.pop(pid, None)
+                self._pid_version.pop(pid, None)
+
+    def _version(self, p):
+        try:
+            exe = p.exe()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return _name_version(p.name().lower())
+        if exe not in self._versions:
+            self._versions[exe] = _exe_version(exe) or _name_version(p.name().lower())
+        return self._versions[exe]
+
+    def _cpu_5m(self, now):
+        used = 0.0
+        for pid, p in self._rhino.items():
+            try:
+                t = p.cpu_times()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            total = t.user + t.system
+            used += max(0.0, total - self._cpu.get(pid, total))
+            self._cpu[pid] = total
+        self._samples.append((now, used))
+        while self._samples and now - self._samples[0][0] > CPU_WINDOW:
+            self._samples.popleft()
+        span = now - self._samples[0][0]
+        if span <= 0:
+            return 0.0
+        # The oldest sample's usage happened before the window opened.
+        return round(100.0 * sum(u for _, u in list(self._samples)[1:]) / span / self._ncpu, 1)
+
     def snapshot(self):
-        procs = []
+        now = time.monotonic()
+        self._scan(now)
         foreground_pid = _get_foreground_pid()
-        rhino_running = False
-        rhino_foreground = False
-        rhino_version = None
-
-        for p in psutil.process_iter(attrs=["pid","name","cpu_percent"]):
-            n = (p.info.get("name") or "").lower()
-            if n in RHINO_EXE_NAMES:
-                rhino_running = True
-                if p.info["pid"] == foreground_pid:
-                    rhino_foreground = True
-                # naive version inference from name
-                if "8" in n: rhino_version = "8"
-                elif "7" in n: rhino_version = "7"
-                elif "6" in n: rhino_version = "6"
-                elif "5" in n: rhino_version = "5"
-                else: rhino_version = rhino_version or "unknown"
-                procs.append(p.info)
-
+        versions = list(self._pid_version.values())
         return {
-            "is_rhino_running": rhino_running,
-            "is_rhino_foreground": rhino_foreground,
-            "rhino_version": rhino_version or "unknown",
+            "is_rhino_running": bool(self._rhino),
+            "is_rhino_foreground": foreground_pid in self._rhino,
+            "rhino_version": max(versions, key=_version_key) if versions else "unknown",
+            "cpu_5m": self._cpu_5m(now),
             "idle_minutes": _os_idle_minutes(),
         }
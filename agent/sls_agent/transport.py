@@ -1,16 +1,242 @@
-import httpx
+# sls_agent/transport.py
+import gzip, itertools, json, queue, random, threading, time
+from urllib.parse import quote
+
+BACKOFF_MIN = 1.0
+BACKOFF_MAX = 60.0
+STABLE_AFTER = 30.0        # s connected before the backoff resets
+POLL_TIMEOUT = 25.0        # server holds a long-poll this long
+POLL_MODE_RETRY = 600.0    # s in long-poll mode before trying the WebSocket again
+EVENT_LINGER = 1.0         # s an event waits for company before it is sent on its own
+BATCH_MAX = 500            # outbox items per upload
+DRAIN_PAUSE = 0.5          # s between full batches while draining a backlog
 
 class WSClient:
+    """
+    Persistent channel to the server: /api/agents/ws, or long-polling
+    /api/agents/poll when a WebSocket can't get through (proxy, missing
+    `websockets`). Reconnects forever with capped, jittered exponential
+    backoff. Server messages (hello / assign / ...) land in recv();
+    send() pushes heartbeats/events upstream and returns False when there
+    is no live socket, so callers fall back to plain HTTP.
+    """
     def __init__(self, cfg):
-        self.base = cfg.server_base
+        self.cfg = cfg
+        self.base = cfg.base
         self.token = cfg.token
-        self.sess = httpx.Client(timeout=10.0)
+        self.mode = "ws"
+        self._inbox = queue.Queue()
+        self._ws = None
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._stop = threading.Event()
+        self._thread = None
+        self._up_since = None
+        self._poll_until = 0.0
+        self._waiters = {}  # message id -> [threading.Event, reply]
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
     def post(self, path, json_body):
-        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
         try:
-            r = self.sess.post(self.base + path, json=json_body, headers=headers)
-            return r.json()
+            return self.cfg.http_post(path, json_body)
+        except Exception:
+            return {}
+
+    # -- lifecycle --
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sls-channel", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try: ws.close()
+            except Exception: pass
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @property
+    def connected(self):
+        return self._ws is not None
+
+    # -- messages --
+
+    def send(self, msg):
+        """Upstream over the WebSocket; False if not connected (caller should use HTTP)."""
+        ws = self._ws
+        if ws is None:
+            return False
+        try:
+            with self._send_lock:
+                ws.send(json.dumps({"id": next(self._ids), **msg}))
+            return True
+        except Exception:
+            return False
+
+    def call(self, msg, timeout=15.0):
+        """Send and wait for the server's ack/error; None when not connected or no reply in time."""
+        ws = self._ws
+        if ws is None:
+            return None
+        msg_id = next(self._ids)
+        waiter = self._waiters[msg_id] = [threading.Event(), None]
+        try:
+            with self._send_lock:
+                ws.send(json.dumps({**msg, "id": msg_id}))
+            waiter[0].wait(timeout)
+            return waiter[1]
         except Exception:
+            return None
+        finally:
+            self._waiters.pop(msg_id, None)
+
+    def recv(self, timeout=None):
+        """Next server message, or {} after `timeout` seconds."""
+        try:
+            return self._inbox.get(timeout=timeout)
+        except queue.Empty:
             return {}
-    def recv(self):
-        return {}
+
+    # -- connection loop --
+
+    def _run(self):
+        backoff = BACKOFF_MIN
+        while not self._stop.is_set():
+            self._up_since = None
+            try:
+                if self.mode == "ws":
+                    self._run_ws()
+                else:
+                    self._run_poll()
+            except ImportError:
+                self._to_poll("websockets not installed")
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if self.mode == "ws" and status is not None and status not in (401, 403):
+                    # Handshake answered with a plain HTTP status: no WebSocket on this path.
+                    self._to_poll(f"WebSocket refused ({status})")
+                    continue
+                print("[channel]", self.mode, "error:", repr(e))
+            if self._up_since and time.time() - self._up_since >= STABLE_AFTER:
+                backoff = BACKOFF_MIN
+            if self._stop.wait(random.uniform(0, backoff)):  # full jitter
+                break
+            backoff = min(BACKOFF_MAX, backoff * 2)
+
+    def _to_poll(self, why):
+        print("[channel]", why, "- falling back to long-poll")
+        self.mode = "poll"
+        self._poll_until = time.time() + POLL_MODE_RETRY
+
+    def _run_ws(self):
+        from websockets.sync.client import connect
+        url = self.base.replace("http", "ws", 1) + f"/api/agents/ws?agent_id={quote(self.cfg.agent_id)}"
+        with connect(url, additional_headers=self._headers(), open_timeout=10) as ws:
+            self._ws, self._up_since = ws, time.time()
+            try:
+                for raw in ws:
+                    msg = json.loads(raw)
+                    if msg.get("type") in ("ack", "error"):
+                        waiter = self._waiters.get(msg.get("ref"))
+                        if waiter is not None:
+                            waiter[1] = msg
+                            waiter[0].set()
+                        elif msg["type"] == "error":
+                            print("[channel] server:", msg.get("status"), msg.get("detail"))
+                        continue
+                    self._inbox.put(msg)
+            finally:
+                self._ws = None
+                for waiter in list(self._waiters.values()):
+                    waiter[0].set()
+
+    def _run_poll(self):
+        hello = True
+        while not self._stop.is_set() and time.time() < self._poll_until:
+            r = self.cfg.request("GET", "/api/agents/poll", retries=0, timeout=POLL_TIMEOUT + 10,
+                                 params={"agent_id": self.cfg.agent_id, "timeout": POLL_TIMEOUT, "hello": int(hello)})
+            if hello:
+                hello, self._up_since = False, time.time()
+            for msg in r.json().get("messages", []):
+                self._inbox.put(msg)
+        self.mode = "ws"
+
+
+class Outbound:
+    """
+    Upstream path: every heartbeat and event is appended to the on-disk
+    Outbox first, then uploaded in seq order, BATCH_MAX items per
+    message (over the channel) or per gzipped POST /api/agents/outbox
+    (without it), and deleted once the server acks. Events wait up to
+    EVENT_LINGER for company; each heartbeat upload flushes the rest.
+    After an outage the backlog drains oldest-first, paced by
+    DRAIN_PAUSE and by the server's 503 Retry-After.
+    """
+    def __init__(self, cfg, channel, outbox):
+        self.cfg = cfg
+        self.channel = channel
+        self.outbox = outbox
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._timer = None
+
+    def event(self, event_type, task_id=None, **fields):
+        self.outbox.append("event", {"type": event_type, "task_id": task_id, **fields})
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(EVENT_LINGER, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def heartbeat(self, kind, data):
+        """kind "heartbeat" (full state) or "hb" (changed fields), see heartbeat.HeartbeatCadence."""
+        self.outbox.append(kind, {k: v for k, v in data.items() if k != "agent_id"})
+        return self.flush()
+
+    def flush(self):
+        """Upload until the outbox is empty or the server is unreachable; True if it emptied."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not self._flushing.acquire(blocking=False):
+            return False  # another thread is already draining
+        try:
+            while True:
+                items = self.outbox.peek(BATCH_MAX)
+                if not items:
+                    return True
+                last_seq = self._upload(items)
+                if last_seq is None:
+                    return False
+                self.outbox.ack(last_seq)
+                if len(items) < BATCH_MAX:
+                    return True
+                time.sleep(DRAIN_PAUSE)
+        finally:
+            self._flushing.release()
+
+    def _upload(self, items):
+        body = {"stream": self.outbox.stream, "items": items}
+        reply = self.channel.call({"type": "outbox", **body})
+        if reply is not None:
+            if reply.get("type") == "ack":
+                return reply["last_seq"]
+            print("[outbound] server refused batch:", reply.get("status"), reply.get("detail"))
+            return None
+        try:
+            raw = gzip.compress(json.dumps({"agent_id": self.cfg.agent_id, **body}).encode())
+            r = self.cfg.request("POST", "/api/agents/outbox", content=raw,
+                                 headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+            return r.json()["last_seq"]
+        except Exception as e:
+            print(f"[outbound] upload failed ({len(self.outbox)} queued):", repr(e))
+            return None
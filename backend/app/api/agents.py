@@ -1,10 +1,24 @@
 # backend/app/api/agents.py
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from app.models.db import get_db
+from app.models import db as dbm
+from app.models.db import get_db, SessionLocal, async_enabled as db_async_enabled
 from app.models.orm import Agent, Heartbeat
-from app.models.schemas import AgentRegisterIn, AgentRegisterOut, HeartbeatIn
+from app.models.schemas import (AgentBatchIn, AgentEventData, AgentEventIn, AgentRegisterIn, AgentRegisterOut,
+                                HeartbeatIn, OutboxBatchIn)
+from app.services.agent_channel import channel, POLL_TIMEOUT
+from app.services.agent_registry import registry
+from app.services.agent_inbox import (OUTBOX_CONCURRENCY, OUTBOX_MAX_ITEMS, OUTBOX_RETRY_AFTER, PayloadTooLarge,
+                                      apply_outbox, decode_body, store_events)
+from app.services.telemetry_hub import hub
+from app.services.heartbeat_buffer import buffer, BufferFull, HB_BUFFERED, HB_FLUSH_INTERVAL
+from app.utils.logging import logger
 
 router = APIRouter()
 
@@ -32,17 +46,26 @@ def _new_agent_kwargs(payload: AgentRegisterIn) -> dict:
     return kwargs
 
 
+# Resolved once at import instead of on every request.
+AGENT_ID_COL = _agent_id_col()
+HB_AGENT_KEY = _heartbeat_agent_id_key()
+
+
 @router.post("/register", response_model=AgentRegisterOut)
 def register_agent(payload: AgentRegisterIn, db: Session = Depends(get_db)):
     """
     Register or update an agent (worker).
     Works whether the ORM column is Agent.id or Agent.agent_id.
     """
-    agent_id_col = _agent_id_col()
-    if agent_id_col is None:
+    if AGENT_ID_COL is None:
         raise HTTPException(status_code=500, detail="Agent model missing id/agent_id column")
 
-    agent = db.query(Agent).filter(agent_id_col == payload.agent_id).first()
+    known = registry.get(payload.agent_id)
+    if known and known.user == payload.user and known.hostname == payload.hostname:
+        # Re-registration with nothing new (agent restart): no DB round trip.
+        return AgentRegisterOut(agent_id=payload.agent_id, token="ok")
+
+    agent = db.query(Agent).filter(AGENT_ID_COL == payload.agent_id).first()
     if not agent:
         agent = Agent(**_new_agent_kwargs(payload))
         db.add(agent)
@@ -54,29 +77,237 @@ def register_agent(payload: AgentRegisterIn, db: Session = Depends(get_db)):
             agent.user = payload.user
 
     db.commit()
+    registry.upsert(payload.agent_id, payload.user, payload.hostname)
     # TODO: replace "ok" with a real JWT if you enable agent auth
     return AgentRegisterOut(agent_id=payload.agent_id, token="ok")
 
 
+def _lookup_agent_sync(agent_id: str):
+    db = SessionLocal()
+    try:
+        return registry.get(agent_id, db)
+    finally:
+        db.close()
+
+async def _lookup_agent(agent_id: str):
+    """Registry miss: one DB read, on the async engine when there is one."""
+    if not db_async_enabled():
+        return await run_in_threadpool(_lookup_agent_sync, agent_id)
+    async with dbm.AsyncSessionLocal() as adb:
+        row = await adb.get(Agent, agent_id)
+    return registry.adopt(row) if row is not None else None
+
+async def _known(agent_id: str) -> bool:
+    return registry.get(agent_id) is not None or await _lookup_agent(agent_id) is not None
+
+def _insert_heartbeat_sync(hb_kwargs: dict):
+    db = SessionLocal()
+    try:
+        db.add(Heartbeat(**hb_kwargs))
+        db.commit()
+    finally:
+        db.close()
+
+
 @router.post("/heartbeat")
-def heartbeat(payload: HeartbeatIn, db: Session = Depends(get_db)):
+async def heartbeat(payload: HeartbeatIn):
     """
     Receive periodic agent status updates.
+    Validated against the in-memory agent registry; the DB is only read on
+    a registry miss (e.g. the agent registered through another worker).
+    Runs on the event loop: the common path is memory-only, and DB work
+    goes through the async engine or, without one, the threadpool.
     """
-    agent_id_col = _agent_id_col()
-    if agent_id_col is None:
-        raise HTTPException(status_code=500, detail="Agent model missing id/agent_id column")
-
-    agent = db.query(Agent).filter(agent_id_col == payload.agent_id).first()
-    if not agent:
+    if registry.get(payload.agent_id) is None and await _lookup_agent(payload.agent_id) is None:
         raise HTTPException(status_code=404, detail="unknown agent")
 
     # Store heartbeat; avoid double-passing agent_id
     data = payload.model_dump(exclude={"agent_id"})
     hb_kwargs = dict(data)
-    hb_kwargs[_heartbeat_agent_id_key()] = payload.agent_id
+    hb_kwargs[HB_AGENT_KEY] = payload.agent_id
 
-    hb = Heartbeat(**hb_kwargs)
-    db.add(hb)
-    db.commit()
+    now = datetime.utcnow()
+    registry.heartbeat(payload.agent_id, data, seen=now)
+
+    if HB_BUFFERED:
+        # Stamp receive time now; the row is written later by the flusher.
+        hb_kwargs.setdefault("ts", now)
+        hb_kwargs.setdefault("created_at", now)
+        try:
+            buffer.put(hb_kwargs, block=False)
+        except BufferFull:
+            try:
+                # Queue is full: wait for the flusher off the event loop.
+                await run_in_threadpool(buffer.put, hb_kwargs)
+            except BufferFull:
+                raise HTTPException(status_code=503, detail="heartbeat queue full",
+                                    headers={"Retry-After": str(max(1, int(HB_FLUSH_INTERVAL)))})
+        return {"ok": True}
+
+    if db_async_enabled():
+        async with dbm.AsyncSessionLocal() as adb:
+            adb.add(Heartbeat(**hb_kwargs))
+            await adb.commit()
+    else:
+        await run_in_threadpool(_insert_heartbeat_sync, hb_kwargs)
+    return {"ok": True}
+
+
+@router.post("/event")
+def agent_event(payload: AgentEventIn, db: Session = Depends(get_db)):
+    """Agent-side events (file_done, inactive_15m, ...): stored, pushed to telemetry, completions free the agent."""
+    if registry.get(payload.agent_id, db) is None:
+        raise HTTPException(status_code=404, detail="unknown agent")
+    store_events(db, payload.agent_id, [payload])
     return {"ok": True}
+
+def _store_events_sync(agent_id: str, events: List[AgentEventData]):
+    db = SessionLocal()
+    try:
+        store_events(db, agent_id, events)
+    finally:
+        db.close()
+
+
+@router.post("/batch")
+async def batch(payload: AgentBatchIn):
+    """A heartbeat plus the agent's pending events in one round trip."""
+    if not await _known(payload.agent_id):
+        raise HTTPException(status_code=404, detail="unknown agent")
+    if payload.heartbeat is not None:
+        await heartbeat(HeartbeatIn(agent_id=payload.agent_id, **payload.heartbeat.model_dump()))
+    if payload.events:
+        await run_in_threadpool(_store_events_sync, payload.agent_id, payload.events)
+    return {"ok": True, "events": len(payload.events)}
+
+
+def _apply_outbox_sync(payload: OutboxBatchIn) -> dict:
+    db = SessionLocal()
+    try:
+        return apply_outbox(db, payload.agent_id, payload.stream, payload.items)
+    finally:
+        db.close()
+
+_outbox_slots = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+
+async def outbox_batch(payload: OutboxBatchIn) -> dict:
+    if len(payload.items) > OUTBOX_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"at most {OUTBOX_MAX_ITEMS} items per batch")
+    if not await _known(payload.agent_id):
+        raise HTTPException(status_code=404, detail="unknown agent")
+    if _outbox_slots.locked():
+        # Everyone is replaying at once (e.g. after an outage): shed load, agents back off.
+        raise HTTPException(status_code=503, detail="busy", headers={"Retry-After": str(OUTBOX_RETRY_AFTER)})
+    async with _outbox_slots:
+        try:
+            return await run_in_threadpool(_apply_outbox_sync, payload)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/outbox")
+async def outbox(request: Request):
+    """
+    Idempotent batch from an agent's on-disk outbox (optionally
+    Content-Encoding: gzip). Returns the stream's last applied seq; the
+    agent deletes everything up to it.
+    """
+    try:
+        data = decode_body(await request.body(), request.headers.get("content-encoding", ""))
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:  # bad gzip / JSON
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        payload = OutboxBatchIn(**data)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    return await outbox_batch(payload)
+
+
+@router.get("/workers")
+def list_workers():
+    """Latest state of every agent, from memory (see /api/telemetry for the push feeds)."""
+    return hub.workers()
+
+
+async def _upstream(agent_id: str, msg: dict) -> dict:
+    """One agent -> server message on the WebSocket: heartbeat or event."""
+    kind = msg.pop("type", None)
+    ref = msg.pop("id", None)
+    body = {**msg, "agent_id": agent_id}
+    try:
+        if kind == "heartbeat":
+            await heartbeat(HeartbeatIn(**body))
+        elif kind == "event":
+            body["type"] = body.pop("event", None)
+            ev = AgentEventIn(**body)
+            await run_in_threadpool(_store_events_sync, agent_id, [ev])
+        elif kind == "batch":
+            await batch(AgentBatchIn(**body))
+        elif kind == "outbox":
+            return {"type": "ack", "ref": ref, **await outbox_batch(OutboxBatchIn(**body))}
+        else:
+            return {"type": "error", "ref": ref, "status": 400, "detail": f"unknown message type {kind!r}"}
+    except HTTPException as e:
+        return {"type": "error", "ref": ref, "status": e.status_code, "detail": e.detail}
+    except ValidationError as e:
+        return {"type": "error", "ref": ref, "status": 422, "detail": e.errors(include_url=False)}
+    return {"type": "ack", "ref": ref}
+
+
+@router.websocket("/ws")
+async def agent_ws(websocket: WebSocket, agent_id: str):
+    """
+    Persistent agent connection. Upstream: {"type": "heartbeat", ...HeartbeatIn},
+    {"type": "event", "event": <event type>, ...} and {"type": "batch",
+    "heartbeat": {...}, "events": [...]}, each answered with an
+    ack/error carrying the message's "id" as "ref". Downstream: a `hello`
+    on connect, then `assign` and other commands as they are sent.
+    """
+    if not await _known(agent_id):
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    channel.connected(agent_id, 1)
+
+    async def downstream():
+        await websocket.send_json(channel.hello(agent_id))
+        while True:
+            for msg in await channel.receive(agent_id):
+                await websocket.send_json(msg)
+
+    async def upstream():
+        while True:
+            msg = await websocket.receive_json()
+            await websocket.send_json(await _upstream(agent_id, msg if isinstance(msg, dict) else {}))
+
+    tasks = [asyncio.ensure_future(downstream()), asyncio.ensure_future(upstream())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            exc = t.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                logger.warning(f"Agent {agent_id} connection closed: {exc!r}")
+    finally:
+        for t in tasks:
+            t.cancel()
+        channel.connected(agent_id, -1)
+
+
+@router.get("/poll")
+async def poll(agent_id: str, timeout: float = POLL_TIMEOUT, hello: bool = False):
+    """
+    Long-poll fallback for agents that can't hold a WebSocket: returns as
+    soon as something is queued, or empty after `timeout` s. hello=1 (first
+    poll after a (re)connect) returns the hello immediately.
+    """
+    if not await _known(agent_id):
+        raise HTTPException(status_code=404, detail="unknown agent")
+    channel.connected(agent_id, 1)
+    try:
+        msgs = [channel.hello(agent_id)] if hello else []
+        msgs += await channel.receive(agent_id, 0 if hello else max(0.0, min(timeout, POLL_TIMEOUT)))
+    finally:
+        channel.connected(agent_id, -1)
+    return {"messages": msgs}
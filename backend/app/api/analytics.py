@@ -0,0 +1,93 @@
+# backend/app/api/analytics.py
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.models.db import get_db
+from app.models.orm import TaskStats
+
+router = APIRouter()
+
+PERCENTILES = (50, 90, 95)
+
+def _minutes(a: Optional[datetime], b: Optional[datetime]) -> Optional[float]:
+    return max(0.0, (b - a).total_seconds() / 60) if a and b else None
+
+METRICS = {
+    "latency_min": lambda r: _minutes(r.assigned_at, r.first_activity_at),   # assignment -> first Rhino activity
+    "active_min": lambda r: (r.active_seconds or 0.0) / 60,
+    "idle_min": lambda r: (r.idle_seconds or 0.0) / 60,
+    "idle_gaps": lambda r: r.idle_gaps or 0,
+    "completion_min": lambda r: _minutes(r.assigned_at, r.completed_at),     # assignment -> file_done
+}
+
+def _percentile(values: List[float], p: float) -> float:
+    """Linear interpolation between closest ranks; `values` sorted."""
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def _dist(values: List[float]) -> Dict:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {"n": 0}
+    out = {"n": len(values), "mean": round(sum(values) / len(values), 1), "max": round(values[-1], 1)}
+    for p in PERCENTILES:
+        out[f"p{p}"] = round(_percentile(values, p), 1)
+    return out
+
+def _summary(rows: List[TaskStats]) -> Dict:
+    return {"tasks": len(rows), "completed": sum(1 for r in rows if r.completed_at),
+            **{name: _dist([fn(r) for r in rows]) for name, fn in METRICS.items()}}
+
+def _task(r: TaskStats) -> Dict:
+    return {"task_id": r.task_id, "order_id": r.order_id, "agent_id": r.agent_id, "category": r.category,
+            "assigned_at": r.assigned_at, "first_activity_at": r.first_activity_at,
+            "completed_at": r.completed_at, "inactive_alerts": r.inactive_alerts or 0,
+            **{name: (round(v, 1) if isinstance(v, float) else v) for name, v in
+               ((name, fn(r)) for name, fn in METRICS.items())}}
+
+def _tasks(db: Session, from_: Optional[date], to: Optional[date], agent_id: Optional[List[str]],
+           category: Optional[str], order_id: Optional[int] = None) -> List[TaskStats]:
+    to = to or date.today()
+    from_ = from_ or to - timedelta(days=29)
+    if to < from_:
+        raise HTTPException(400, "'to' is before 'from'")
+    q = db.query(TaskStats).filter(TaskStats.assigned_at >= datetime.combine(from_, time.min),
+                                   TaskStats.assigned_at < datetime.combine(to + timedelta(days=1), time.min))
+    if agent_id:
+        q = q.filter(TaskStats.agent_id.in_(agent_id))
+    if category:
+        q = q.filter(TaskStats.category == category)
+    if order_id is not None:
+        q = q.filter(TaskStats.order_id == order_id)
+    return q.order_by(TaskStats.assigned_at).all()
+
+@router.get("/throughput")
+def throughput(from_: Optional[date] = Query(None, alias="from"), to: Optional[date] = Query(None),
+               group_by: str = Query("agent", enum=["agent", "order", "category", "none"]),
+               agent_id: Optional[List[str]] = Query(None), category: Optional[str] = None,
+               db: Session = Depends(get_db)):
+    """
+    Distributions (n, mean, p50/p90/p95, max) of assignment-to-first-activity
+    latency, active and idle minutes, idle gaps and completion time for
+    tasks assigned in [from, to] (default: the last 30 days), overall and
+    per designer / order / category.
+    """
+    rows = _tasks(db, from_, to, agent_id, category)
+    out = {"overall": _summary(rows)}
+    if group_by != "none":
+        key = {"agent": "agent_id", "order": "order_id", "category": "category"}[group_by]
+        groups: Dict = {}
+        for r in rows:
+            groups.setdefault(getattr(r, key), []).append(r)
+        out["groups"] = [{group_by: k, **_summary(g)} for k, g in sorted(groups.items(), key=lambda kv: str(kv[0]))]
+    return out
+
+@router.get("/tasks")
+def tasks(from_: Optional[date] = Query(None, alias="from"), to: Optional[date] = Query(None),
+          agent_id: Optional[List[str]] = Query(None), category: Optional[str] = None,
+          order_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """Per-task timings behind /throughput."""
+    return [_task(r) for r in _tasks(db, from_, to, agent_id, category, order_id)]
@@ -0,0 +1,35 @@
+# backend/app/api/files.py
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.models.db import get_db
+from app.models.orm import ModelFingerprint
+from app.services import fingerprints
+from app.services.file_catalog import catalog
+
+router = APIRouter()
+
+def _fp_out(row: ModelFingerprint) -> dict:
+    return {"content_hash": row.content_hash, "size": row.size, "format_version": row.format_version,
+            "layers": row.layers, "objects": row.objects, "units": row.units,
+            "bbox": json.loads(row.bbox) if row.bbox else None,
+            "first_path": row.first_path, "last_path": row.last_path, "seen_count": row.seen_count,
+            "first_seen": row.first_seen, "last_seen": row.last_seen,
+            "library_paths": catalog.paths_for_hash(row.content_hash)}
+
+@router.get("/fingerprints/{content_hash}")
+def get_fingerprint(content_hash: str, db: Session = Depends(get_db)):
+    row = db.get(ModelFingerprint, content_hash)
+    if row is None:
+        raise HTTPException(404, "unknown content hash")
+    return _fp_out(row)
+
+@router.get("/similar")
+def similar(content_hash: str, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """Models closest in geometry (bbox shape, object/layer counts, size) to a fingerprinted one."""
+    if fingerprints.index.get(content_hash) is None:
+        raise HTTPException(404, "unknown content hash")
+    near = fingerprints.index.nearest(content_hash, limit)
+    rows = {r.content_hash: r for r in db.query(ModelFingerprint)
+            .filter(ModelFingerprint.content_hash.in_([h for h, _ in near]))}
+    return [{**_fp_out(rows[h]), "similarity": round(sim, 3)} for h, sim in near if h in rows]
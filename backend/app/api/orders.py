@@ -1,30 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from app.services.filename_rules import load_rules, build_filename
-from app.services.dropbox_search import search_similar_files
-from app.services.monday_client import MondayClient
-from app.services.telegram_bot import notify_new_order
 from app.models.schemas import OrderIn, OrderOut
-from app.models.db import SessionLocal
-from app.models.orm import Order, Suggestion
+from app.models.db import SessionLocal, get_db
+from app.models.orm import Order, Job
 from sqlalchemy.orm import Session
-from app.utils.logging import logger
 from app.services.assignment import top_free_workers
+from app.services.order_jobs import enqueue_order_jobs, order_status, suggestions_of
+from app.services import jobs
+from app.services.order_import import import_orders, OrderImportError
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("", response_model=OrderOut)
 def create_order(order: OrderIn, db: Session = Depends(get_db)):
+    """
+    Persist the order and return immediately. Similar-file suggestions, the
+    Monday draft and the Telegram notification are produced by background
+    jobs; poll GET /api/orders/{id}/status for them.
+    """
     rules = load_rules()
     filename = build_filename(order, rules)
-    suggestions = search_similar_files(filename)
-    workers = top_free_workers(db)
     db_order = Order(
         customer_name=order.customer_name,
         customer_email=order.customer_email,
@@ -39,33 +35,54 @@ def create_order(order: OrderIn, db: Session = Depends(get_db)):
         canonical_filename=filename,
     )
     db.add(db_order); db.commit(); db.refresh(db_order)
-    for s in suggestions:
-        db.add(Suggestion(order_id=db_order.id, **s))
-    db.commit()
-    try:
-        monday = MondayClient()
-        monday_item = monday.create_draft_item(order, filename)
-    except Exception as e:
-        logger.warning(f"Monday draft skipped: {e}")
-        monday_item = None
-    try:
-        notify_new_order(order, filename, suggestions, workers, monday_item)
-    except Exception as e:
-        logger.warning(f"Telegram notify skipped: {e}")
+    enqueue_order_jobs(db, db_order.id)
+    workers = top_free_workers(db, category=db_order.category)
     return OrderOut(
         id=db_order.id,
         filename=filename,
-        suggestions=suggestions,
+        suggestions=[],
         workers=workers,
-        monday_item=monday_item or {},
+        monday_item={},
     )
 
+@router.post("/import")
+async def import_order_file(request: Request, format: str = ""):
+    """
+    Bulk-import historical orders. The request body is the raw CSV or JSONL
+    file (one order per row/line, OrderIn field names; optional created_at).
+    Format comes from ?format= or the Content-Type. No background jobs are
+    queued for imported orders.
+    """
+    fmt = format.lower() or ("jsonl" if "json" in request.headers.get("content-type", "") else "csv")
+    body = await request.body()
+    if not body:
+        raise HTTPException(400, "Empty body")
+
+    def run():
+        db = SessionLocal()
+        try:
+            return import_orders(db, body, fmt)
+        finally:
+            db.close()
+
+    try:
+        return await run_in_threadpool(run)
+    except OrderImportError as e:
+        raise HTTPException(400, str(e))
+
 @router.get("/{order_id}", response_model=OrderOut)
 def get_order(order_id: int, db: Session = Depends(get_db)):
     order = db.get(Order, order_id)
     if not order:
         raise HTTPException(404, "Order not found")
-    suggestions = [{"filename": s.filename, "path": s.path, "size": s.size, "score": s.score, "temp_link": s.temp_link} for s in order.suggestions]
-    workers = top_free_workers(db)
-    monday_item = {}
+    suggestions = suggestions_of(order)
+    workers = top_free_workers(db, category=order.category)
+    monday_item = jobs.job_result(db.query(Job).filter(Job.idempotency_key == f"monday:{order_id}").first())
     return OrderOut(id=order.id, filename=order.canonical_filename, suggestions=suggestions, workers=workers, monday_item=monday_item)
+
+@router.get("/{order_id}/status")
+def get_order_status(order_id: int, db: Session = Depends(get_db)):
+    order = db.get(Order, order_id)
+    if not order:
+        raise HTTPException(404, "Order not found")
+    return order_status(db, order)
@@ -1,55 +1,149 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from fastapi.responses import StreamingResponse
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Iterator, List, Optional
 import csv, io
-from app.models.db import get_db
-from sqlalchemy import text
+from app.models import db as dbm
+from app.models.db import SessionLocal, get_db
+from app.models.orm import AgentDailyRollup, Heartbeat
+from app.services import activity_sessions
+from app.workers.activity_agg import active_seconds_sql
+from app.workers.retention import HEARTBEAT_RETENTION_DAYS
+from sqlalchemy import func, select
 
 router = APIRouter()
 
+STREAM_BATCH = 1000
+
+def _rollup_query(start: date, end: date, agent_ids: Optional[List[str]]):
+    q = (select(AgentDailyRollup.day, AgentDailyRollup.agent_id,
+                AgentDailyRollup.active_minutes, AgentDailyRollup.heartbeats)
+         .where(AgentDailyRollup.day >= start, AgentDailyRollup.day <= end))
+    if agent_ids:
+        q = q.where(AgentDailyRollup.agent_id.in_(agent_ids))
+    return q.order_by(AgentDailyRollup.day, AgentDailyRollup.agent_id)
+
+def _raw_query(start: date, end: date, agent_ids: Optional[List[str]]):
+    # Half-open timestamp range keeps the filter sargable on created_at;
+    # date() exists on both SQLite and Postgres.
+    day = func.date(Heartbeat.created_at)
+    # Each beat is credited to the day it arrived (rollups split across hours).
+    q = (select(day, Heartbeat.agent_id, func.sum(active_seconds_sql()) / 60.0, func.count())
+         .where(Heartbeat.created_at >= datetime.combine(start, time.min),
+                Heartbeat.created_at < datetime.combine(end + timedelta(days=1), time.min)))
+    if agent_ids:
+        q = q.where(Heartbeat.agent_id.in_(agent_ids))
+    return q.group_by(day, Heartbeat.agent_id).order_by(day, Heartbeat.agent_id)
+
+def _utilization_query(start: date, end: date, agent_ids: Optional[List[str]], source: str):
+    q = _raw_query(start, end, agent_ids) if source == "raw" else _rollup_query(start, end, agent_ids)
+    return q.execution_options(stream_results=True, yield_per=STREAM_BATCH)
+
+def _row(d, agent_id, active, beats) -> dict:
+    return {"day": str(d), "agent_id": agent_id, "active_minutes": float(active or 0.0),
+            "heartbeats": int(beats or 0)}
+
+def iter_utilization(db: Session, start: date, end: date, agent_ids: Optional[List[str]] = None,
+                     source: str = "rollup") -> Iterator[dict]:
+    """Per-day, per-agent utilization for [start, end], one query, fetched from a server-side cursor."""
+    if source == "sessions":
+        rows = activity_sessions.daily_utilization(db, start, end, agent_ids)
+    else:
+        rows = db.execute(_utilization_query(start, end, agent_ids, source))
+    for r in rows:
+        yield _row(*r)
+
+def utilization(db: Session, start: date, end: date, agent_ids: Optional[List[str]] = None):
+    return list(iter_utilization(db, start, end, agent_ids))
+
 def daily_utilization(db: Session, day: str):
-    sql = text("""
-    WITH hb AS (
-      SELECT agent_id, created_at::date as d,
-             CASE WHEN is_rhino_running OR is_rhino_foreground THEN 1 ELSE 0 END AS active
-      FROM heartbeats
-      WHERE created_at::date = :day
-    )
-    SELECT agent_id,
-           SUM(active) * 0.5 AS active_minutes,  -- 30s heartbeat ~ 0.5 min
-           COUNT(*) AS total_heartbeats
-    FROM hb
-    GROUP BY agent_id
-    ORDER BY agent_id;
-    """)
-    rows = db.execute(sql, {"day": day}).fetchall()
-    return [{"agent_id": r[0], "active_minutes": float(r[1]), "heartbeats": int(r[2])} for r in rows]
+    d = date.fromisoformat(day)
+    return [{k: r[k] for k in ("agent_id", "active_minutes", "heartbeats")} for r in utilization(db, d, d)]
 
-@router.get("")
-def reports(range: str = Query("daily", enum=["daily","weekly","monthly"]),
-            db: Session = Depends(get_db)):
-    today = date.today()
+def _range_bounds(range: str, today: date):
     if range == "daily":
-        days = [today]
-    elif range == "weekly":
+        return today, today
+    if range == "weekly":
         start = today - timedelta(days=today.weekday())
-        days = [start + timedelta(days=i) for i in range(7)]
-    else:
-        start = today.replace(day=1)
-        days = [start + timedelta(days=i) for i in range(31) if (start + timedelta(days=i)).month == start.month]
-
-    by_day = []
-    for d in days:
-        rows = daily_utilization(db, d.isoformat())
-        by_day.append({"day": d.isoformat(), "data": rows})
-
-    buf = io.StringIO()
-    w = csv.writer(buf)
-    w.writerow(["day","agent_id","active_minutes","heartbeats"])
-    for day in by_day:
-        for r in day["data"]:
-            w.writerow([day["day"], r["agent_id"], r["active_minutes"], r["heartbeats"]])
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="text/csv",
-                             headers={"Content-Disposition":"attachment; filename=utilization.csv"})
+        return start, start + timedelta(days=6)
+    start = today.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+CSV_HEADER = ["day", "agent_id", "active_minutes", "heartbeats"]
+
+def _csv_rows(start: date, end: date, agent_ids: Optional[List[str]], source: str) -> Iterator[str]:
+    # The session lives as long as the stream, not the request dependency.
+    db = SessionLocal()
+    try:
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(CSV_HEADER)
+        for r in iter_utilization(db, start, end, agent_ids, source):
+            w.writerow([r[k] for k in CSV_HEADER])
+            if buf.tell() >= 8192:
+                yield buf.getvalue()
+                buf.seek(0); buf.truncate()
+        yield buf.getvalue()
+    finally:
+        db.close()
+
+async def _csv_rows_async(start: date, end: date, agent_ids: Optional[List[str]], source: str) -> AsyncIterator[str]:
+    """Same CSV as _csv_rows, streamed from the async engine without a threadpool worker per report."""
+    async with dbm.AsyncSessionLocal() as db:
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(CSV_HEADER)
+        res = await db.stream(_utilization_query(start, end, agent_ids, source))
+        async for r in res:
+            row = _row(*r)
+            w.writerow([row[k] for k in CSV_HEADER])
+            if buf.tell() >= 8192:
+                yield buf.getvalue()
+                buf.seek(0); buf.truncate()
+        yield buf.getvalue()
+
+@router.get("")
+def reports(range: str = Query("daily", enum=["daily","weekly","monthly"]),
+            from_: Optional[date] = Query(None, alias="from"),
+            to: Optional[date] = Query(None),
+            agent_id: Optional[List[str]] = Query(None),
+            source: str = Query("rollup", enum=["rollup", "raw", "sessions"])):
+    """
+    Utilization CSV. `from`/`to` (inclusive, YYYY-MM-DD) override `range`;
+    repeat `agent_id` to filter. `source=raw` aggregates heartbeats directly,
+    `source=sessions` sums foreground/running session time. Raw heartbeats
+    are only kept for HEARTBEAT_RETENTION_DAYS (when set), so `source=raw`
+    is refused for ranges that start before that.
+    """
+    # Only `to`: the `range` period containing it, not today's.
+    start, end = _range_bounds(range, to or date.today())
+    if from_ or to:
+        start, end = from_ or start, to or end
+    if end < start:
+        raise HTTPException(400, "'to' is before 'from'")
+    if source == "raw" and HEARTBEAT_RETENTION_DAYS > 0 \
+            and start < date.today() - timedelta(days=HEARTBEAT_RETENTION_DAYS):
+        raise HTTPException(400, f"raw heartbeats are only kept for {HEARTBEAT_RETENTION_DAYS} days; "
+                                 "use source=rollup or source=sessions")
+    name = f"utilization_{start.isoformat()}_{end.isoformat()}.csv"
+    rows = _csv_rows_async if dbm.async_enabled() and source != "sessions" else _csv_rows
+    return StreamingResponse(rows(start, end, agent_id, source), media_type="text/csv",
+                             headers={"Content-Disposition": f"attachment; filename={name}"})
+
+@router.get("/tasks")
+def task_time(task_id: Optional[List[str]] = Query(None),
+              from_: Optional[date] = Query(None, alias="from"),
+              to: Optional[date] = Query(None),
+              db: Session = Depends(get_db)):
+    """Minutes per task in foreground / running / idle, from activity sessions."""
+    start = datetime.combine(from_, time.min) if from_ else None
+    end = datetime.combine(to + timedelta(days=1), time.min) if to else None
+    if not task_id and not start:
+        raise HTTPException(400, "give task_id or from")
+    return activity_sessions.task_time(db, task_id, start, end)
+
+@router.get("/idle")
+def idle(minutes: float = Query(15, ge=0), db: Session = Depends(get_db)):
+    """Agents holding a task with Rhino closed for at least `minutes`."""
+    return activity_sessions.idle_agents(db, minutes)
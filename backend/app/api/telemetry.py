@@ -1,7 +1,76 @@
-from fastapi import APIRouter
+import asyncio, json, os
+from fastapi import APIRouter, Request, WebSocket
+from fastapi.responses import Response, StreamingResponse
+from app.services.heartbeat_buffer import buffer
+from app.services.dropbox_search import cache_stats
+from app.services.telemetry_hub import hub
+from app.services.agent_channel import channel
+from app.utils import profiling
+
+SSE_KEEPALIVE = float(os.getenv("TELEMETRY_SSE_KEEPALIVE", "15"))
 
 router = APIRouter()
 
 @router.get("/workers")
 def workers():
-    return {"workers": []}
+    """Snapshot: {"type": "snapshot", "version", "workers": [...]}, served from memory."""
+    return Response(hub.snapshot_json(), media_type="application/json")
+
+@router.get("/stream")
+async def stream(request: Request):
+    """Server-Sent Events: one snapshot, then `delta` messages (upsert/remove) as agents change."""
+    sub = hub.subscribe()
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    msg = await asyncio.wait_for(sub.queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {msg['type']}\ndata: {json.dumps(msg)}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/ws")
+async def ws(websocket: WebSocket):
+    """Same messages as /stream, over a WebSocket."""
+    await websocket.accept()
+    sub = hub.subscribe()
+
+    async def send():
+        while True:
+            await websocket.send_json(await sub.queue.get())
+
+    async def drain():
+        # Client messages are ignored; reading is how a disconnect is noticed.
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(drain())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        hub.unsubscribe(sub)
+
+@router.get("/ingest")
+def ingest_stats():
+    return {"heartbeats": buffer.stats()}
+
+@router.get("/channel")
+def channel_stats():
+    return channel.stats()
+
+@router.get("/cache")
+def cache():
+    return cache_stats()
+
+@router.get("/startup")
+def startup_profile():
+    return profiling.summary()
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Request, HTTPException
 from app.models.db import SessionLocal
 from app.models.orm import Order, Agent, Assignment
 from app.services.telegram_bot import send_to
+from app.services.assignment import record_assignment
+from app.services.telemetry_hub import hub
 import os
 
 router = APIRouter()
@@ -38,6 +40,7 @@ async def telegram_webhook(request: Request):
                         if ag:
                             ag.active_task_id = f"TASK-{order_id}"
                         db.commit()
+                        record_assignment(db, agent_id, int(order_id), f"TASK-{order_id}")
                         send_to(chat_id, f"✅ Assigned order {order_id} to {agent_id}")
                     finally:
                         db.close()
@@ -64,19 +67,15 @@ async def telegram_webhook(request: Request):
                     db.close()
 
             elif text.startswith('/workers'):
-                db = SessionLocal()
-                try:
-                    agents = db.query(Agent).all()
-                    if not agents:
-                        send_to(chat_id, "No agents registered.")
-                    else:
-                        lines = ["Workers:"]
-                        for a in agents:
-                            status = f"busy({a.active_task_id})" if a.active_task_id else "free"
-                            lines.append(f"{a.user or a.agent_id}: {status}, cpu={a.cpu_5m}, idle={a.idle_minutes}m")
-                        send_to(chat_id, "\n".join(lines))
-                finally:
-                    db.close()
+                agents = hub.workers()
+                if not agents:
+                    send_to(chat_id, "No agents registered.")
+                else:
+                    lines = ["Workers:"]
+                    for a in agents:
+                        status = f"busy({a['active_task_id']})" if a["active_task_id"] else "free"
+                        lines.append(f"{a['user'] or a['agent_id']}: {status}, cpu={a['cpu_5m']}, idle={a['idle_minutes']}m")
+                    send_to(chat_id, "\n".join(lines))
 
             elif text.startswith('/report'):
                 rng = 'daily'
@@ -1,8 +1,20 @@
+# Must precede the app imports so SLS_PROFILE_STARTUP can time them.
+from app.utils import profiling
+profiling.install()
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import orders, agents, assign, telemetry, reports, webhooks
-from app.models.db import init_engine, create_all
+from app.api import orders, agents, assign, telemetry, reports, webhooks, files, analytics
+from app.models.db import init_engine, create_all, dispose_engines, SessionLocal
+from app.services.agent_registry import registry as agent_registry
+from app.services.worker_ranking import ranking as worker_ranking
+from app.services.telemetry_hub import hub as telemetry_hub
+from app.services.agent_channel import channel as agent_channel
+from app.services.jobs import pool as job_pool
+from app.services import dropbox_api, file_catalog, filename_rules, fingerprints
+from app.services.heartbeat_buffer import buffer as heartbeat_buffer, HB_BUFFERED
+from app.workers import activity_agg, retention
 from app.utils.logging import logger
 import os
 
@@ -22,13 +34,59 @@ app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
 app.include_router(telemetry.router, prefix="/api/telemetry", tags=["telemetry"])
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
 app.include_router(webhooks.router, prefix="/api/webhooks", tags=["webhooks"])
+app.include_router(files.router, prefix="/api/files", tags=["files"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
 
 
+def _load_agents():
+    db = SessionLocal()
+    try:
+        agent_registry.load(db)
+        worker_ranking.load_counts(db)
+    finally:
+        db.close()
+    agent_registry.start()
+
+
+STARTUP = [
+    ("naming rules", filename_rules.start),
+    ("db engine", init_engine),
+    ("create_all", create_all),
+    ("agent registry", _load_agents),
+    ("telemetry hub", telemetry_hub.start),
+    ("agent channel", agent_channel.start),
+    ("activity_agg", activity_agg.start),
+    ("retention", retention.start),
+    ("job pool", job_pool.start),
+    ("file catalog", file_catalog.start),
+    ("fingerprints", fingerprints.start),
+    ("heartbeat buffer", lambda: HB_BUFFERED and heartbeat_buffer.start()),
+]
+
+
 @app.on_event("startup")
 async def startup_event():
-    init_engine()
-    create_all()
+    for name, hook in STARTUP:
+        with profiling.step(name):
+            hook()
+    profiling.report()
     logger.info("SLS Platform started")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    telemetry_hub.stop()
+    job_pool.stop()
+    file_catalog.stop()
+    filename_rules.stop()
+    dropbox_api.close()
+    # Flush queued heartbeats before the process exits.
+    heartbeat_buffer.stop()
+    agent_registry.stop()
+    activity_agg.stop()
+    retention.stop()
+    await dispose_engines()
+    logger.info("SLS Platform stopped")
@@ -1,33 +1,173 @@
 # backend/app/models/db.py
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url, URL
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app.utils.logging import logger
+
+# Pool / driver settings (Postgres; file-backed SQLite uses the same pool knobs).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # s; below typical LB/pgbouncer idle cutoffs
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = server default
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# "auto": use an async engine when the async driver (asyncpg / aiosqlite) is installed.
+DB_ASYNC = os.getenv("DB_ASYNC", "auto").lower()
 
 engine = None
 SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+async_engine = None
+AsyncSessionLocal = None
 Base = declarative_base()
 
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def engine_kwargs(url: URL, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine arguments for `url`, from the DB_* settings."""
+    kw = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if not is_async:
+        kw["future"] = True
+    connect_args = {}
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        # Sessions are handed between threads (flushers, job workers, threadpool).
+        connect_args["check_same_thread"] = False
+        if _is_memory_sqlite(url):
+            return {**kw, "connect_args": connect_args}
+    elif backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        if url.get_driver_name() == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    if is_async and backend == "sqlite":
+        # aiosqlite defaults to NullPool for files; pool them like the sync engine.
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        kw["poolclass"] = AsyncAdaptedQueuePool
+    kw.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+              pool_recycle=DB_POOL_RECYCLE, connect_args=connect_args)
+    return kw
+
+def _sqlite_pragmas(sync_engine, url: URL):
+    if _is_memory_sqlite(url):
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_conn, _):
+        cur = dbapi_conn.cursor()
+        if SQLITE_WAL:
+            # Readers no longer block the heartbeat/aggregator writers.
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.close()
+
+def make_engine(url: str):
+    u = make_url(url)
+    eng = create_engine(u, **engine_kwargs(u))
+    if u.get_backend_name() == "sqlite":
+        _sqlite_pragmas(eng, u)
+    return eng
+
+def async_url(url: str) -> URL:
+    u = make_url(url)
+    if u.get_backend_name() == "postgresql":
+        return u.set(drivername="postgresql+asyncpg")
+    if u.get_backend_name() == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite")
+    return u
+
+def make_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    u = async_url(os.getenv("DB_ASYNC_URI") or url)
+    eng = create_async_engine(u, **engine_kwargs(u, is_async=True))
+    if u.get_backend_name() == "sqlite":
+        _sqlite_pragmas(eng.sync_engine, u)
+    return eng
+
 def init_engine():
     """
     Initialize SQLAlchemy engine and bind SessionLocal.
     POSTGRES_URI examples:
       - postgresql+psycopg2://postgres:postgres@db:5432/sls
       - sqlite:///./sls.db  (fallback)
+    With DB_ASYNC=auto|1 an async engine is also created for get_async_db.
     """
     global engine, SessionLocal
     url = os.getenv("POSTGRES_URI", "sqlite:///./sls.db")
-    engine = create_engine(url, future=True)
+    engine = make_engine(url)
     SessionLocal.configure(bind=engine)
+    if DB_ASYNC != "0":
+        init_async_engine(url)
+
+def init_async_engine(url: str) -> bool:
+    global async_engine, AsyncSessionLocal
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    try:
+        async_engine = make_async_engine(url)
+    except ImportError as e:  # driver not installed
+        if DB_ASYNC == "1":
+            raise
+        logger.info(f"Async DB engine disabled ({e}); async endpoints use the threadpool")
+        return False
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    return True
+
+def async_enabled() -> bool:
+    return AsyncSessionLocal is not None
+
+async def dispose_engines():
+    """Call from the app's own event loop (shutdown), where the async pool's connections live."""
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
 
 def create_all():
     # import models to register metadata before create_all
-    from app.models import orm  # noqa: F401
+    from app.models import orm, partitions  # noqa: F401
+    partitions.prepare(engine)
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+    partitions.ensure_partitions(engine)
 
-# FastAPI dependency
+def ensure_columns():
+    """create_all() skips tables that already exist; add nullable columns they are missing."""
+    insp = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        have = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in have or not col.nullable:
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} '
+                                  f'{col.type.compile(dialect=engine.dialect)}'))
+            logger.info(f"Added column {table.name}.{col.name}")
+
+def ensure_indexes():
+    """create_all() skips tables that already exist; add any indexes they are missing."""
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=engine, checkfirst=True)
+
+# FastAPI dependencies
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """AsyncSession; only usable when async_enabled()."""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("async DB engine not initialized")
+    async with AsyncSessionLocal() as db:
+        yield db
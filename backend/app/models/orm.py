@@ -1,5 +1,5 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text, Date, Index
 from datetime import datetime
 from app.models.db import Base
 
@@ -19,11 +19,14 @@ class Order(Base):
     canonical_filename = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     suggestions = relationship("Suggestion", back_populates="order")
+    __table_args__ = (
+        Index("ix_orders_created_at", "created_at"),
+    )
 
 class Suggestion(Base):
     __tablename__ = "suggestions"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     filename = Column(String)
     path = Column(String)
     size = Column(String)
@@ -56,8 +59,17 @@ class Heartbeat(Base):
     cpu_5m = Column(Float, default=0.0)
     idle_minutes = Column(Float, default=0.0)
     last_input_ts = Column(String, default="")
+    # Agents with adaptive cadence report the seconds since their previous beat
+    # and how many of them Rhino was active; NULL on fixed 30 s beats.
+    interval_s = Column(Float, nullable=True)
+    active_s = Column(Float, nullable=True)
     ts = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # On Postgres this table is range-partitioned by created_at (see models/partitions.py).
+    __table_args__ = (
+        Index("ix_heartbeats_agent_created", "agent_id", "created_at"),
+        Index("ix_heartbeats_created", "created_at"),
+    )
 
 class Event(Base):
     __tablename__ = "events"
@@ -67,6 +79,19 @@ class Event(Base):
     task_id = Column(String, nullable=True)
     meta = Column(Text, default="")
     ts = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_events_agent_ts", "agent_id", "ts"),
+        Index("ix_events_task", "task_id"),
+    )
+
+class AgentStream(Base):
+    """Highest outbox seq applied per agent outbox (idempotent replay, see services/agent_inbox.py)."""
+    __tablename__ = "agent_streams"
+    stream = Column(String, primary_key=True)
+    agent_id = Column(String, nullable=False, index=True)
+    last_seq = Column(Integer, default=0)
+    state = Column(Text, nullable=True)  # JSON heartbeat state that delta heartbeats apply to
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 class Assignment(Base):
     __tablename__ = "assignments"
@@ -75,3 +100,122 @@ class Assignment(Base):
     agent_id = Column(String)
     task_id = Column(String)
     ts = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_assignments_agent_ts", "agent_id", "ts"),
+        Index("ix_assignments_order", "order_id"),
+    )
+
+class AgentDailyRollup(Base):
+    __tablename__ = "agent_daily_rollups"
+    agent_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    active_minutes = Column(Float, default=0.0)
+    heartbeats = Column(Integer, default=0)
+
+class AgentHourlyRollup(Base):
+    __tablename__ = "agent_hourly_rollups"
+    agent_id = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # truncated to the hour (UTC)
+    active_minutes = Column(Float, default=0.0)
+    heartbeats = Column(Integer, default=0)
+
+class ActivitySession(Base):
+    """A run of one activity state per agent, extended in place as heartbeats arrive (services/activity_sessions.py)."""
+    __tablename__ = "activity_sessions"
+    id = Column(Integer, primary_key=True)
+    agent_id = Column(String, nullable=False)
+    state = Column(String, nullable=False)  # foreground | running | idle
+    task_id = Column(String, nullable=True)
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    heartbeats = Column(Integer, default=1)
+    __table_args__ = (
+        Index("ix_activity_sessions_agent_ended", "agent_id", "ended_at"),
+        Index("ix_activity_sessions_ended", "ended_at"),
+        Index("ix_activity_sessions_task", "task_id"),
+    )
+
+class TaskStats(Base):
+    """Per-task time accounting, kept current incrementally (services/task_stats.py)."""
+    __tablename__ = "task_stats"
+    task_id = Column(String, primary_key=True)
+    order_id = Column(Integer, nullable=True)
+    agent_id = Column(String, nullable=True)
+    category = Column(String, default="")
+    assigned_at = Column(DateTime, nullable=True)
+    first_activity_at = Column(DateTime, nullable=True)
+    last_activity_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    active_seconds = Column(Float, default=0.0)  # Rhino running or in front while holding the task
+    idle_seconds = Column(Float, default=0.0)    # holding the task without Rhino
+    idle_gaps = Column(Integer, default=0)       # idle sessions opened while holding it
+    inactive_alerts = Column(Integer, default=0) # inactive_15m events
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_task_stats_assigned", "assigned_at"),
+        Index("ix_task_stats_order", "order_id"),
+    )
+
+class WorkerState(Base):
+    """Small key/value store for background workers (high-water marks, cursors)."""
+    __tablename__ = "worker_state"
+    name = Column(String, primary_key=True)
+    value = Column(Text, default="")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(Base):
+    """Background job (order side-effects). `idempotency_key` makes enqueue safe to repeat."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    idempotency_key = Column(String, nullable=False, unique=True)
+    status = Column(String, default="queued")  # queued | running | done | failed | skipped
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, default="")
+    result = Column(Text, default="")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+        Index("ix_jobs_order", "order_id"),
+    )
+
+class DropboxFile(Base):
+    """Local catalog of the .3dm library, synced incrementally from Dropbox."""
+    __tablename__ = "dropbox_files"
+    path_lower = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    size = Column(Integer, default=0)
+    rev = Column(String, default="")
+    content_hash = Column(String, default="")
+    server_modified = Column(DateTime, nullable=True)
+    category = Column(String, default="")
+    tokens = Column(String, default="")  # canonical filename parts, space separated
+    synced_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_dropbox_files_category", "category"),
+        Index("ix_dropbox_files_content_hash", "content_hash"),
+    )
+
+class ModelFingerprint(Base):
+    """Content hash + geometry metadata of finished models (services/fingerprints.py)."""
+    __tablename__ = "model_fingerprints"
+    content_hash = Column(String, primary_key=True)  # Dropbox content_hash, joins dropbox_files
+    size = Column(Integer, default=0)
+    format_version = Column(Integer, nullable=True)
+    layers = Column(Integer, nullable=True)
+    objects = Column(Integer, nullable=True)
+    units = Column(String, default="")
+    bbox = Column(Text, default="")  # JSON [minx, miny, minz, maxx, maxy, maxz]
+    agent_id = Column(String, index=True)
+    task_id = Column(String, nullable=True)
+    first_path = Column(String, default="")
+    last_path = Column(String, default="")
+    seen_count = Column(Integer, default=1)
+    first_seen = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,108 @@
+# backend/app/models/partitions.py
+"""
+Monthly range partitioning of `heartbeats` on Postgres.
+
+create_all() cannot declare a partitioned table with the ORM's plain
+`id` primary key, so on a fresh Postgres database the table is created
+here first from the ORM's own DDL, with the partition key added to the
+primary key. Other backends (SQLite) keep a plain table.
+"""
+import os, re
+from datetime import date, datetime, timedelta
+from typing import List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+from app.utils.logging import logger
+
+HB_PARTITION_MONTHS_AHEAD = int(os.getenv("HB_PARTITION_MONTHS_AHEAD", "2"))
+
+_PART_RE = re.compile(r"^heartbeats_y(\d{4})m(\d{2})$")
+
+
+def is_postgres(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def prepare(engine: Engine):
+    """Create `heartbeats` as a partitioned table (Postgres only, fresh DBs only)."""
+    if not is_postgres(engine):
+        return
+    from app.models.orm import Heartbeat
+    if inspect(engine).has_table(Heartbeat.__tablename__):
+        if not is_partitioned(engine):
+            logger.warning("heartbeats exists and is not partitioned; retention falls back to DELETE")
+        return
+    ddl = str(CreateTable(Heartbeat.__table__).compile(dialect=engine.dialect)).rstrip().rstrip(";")
+    ddl = ddl.replace("PRIMARY KEY (id)", "PRIMARY KEY (id, created_at)")
+    ddl += " PARTITION BY RANGE (created_at)"
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+        conn.execute(text("CREATE TABLE IF NOT EXISTS heartbeats_default PARTITION OF heartbeats DEFAULT"))
+    logger.info("Created partitioned heartbeats table")
+
+
+def is_partitioned(engine: Engine) -> bool:
+    if not is_postgres(engine):
+        return False
+    with engine.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = 'heartbeats'"
+        )).first())
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = HB_PARTITION_MONTHS_AHEAD, today: date = None):
+    """Create monthly partitions from the current month through `months_ahead`."""
+    if not is_partitioned(engine):
+        return
+    d = _month_start(today or datetime.utcnow().date())
+    with engine.begin() as conn:
+        for _ in range(months_ahead + 1):
+            nxt = _next_month(d)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS heartbeats_y{d.year:04d}m{d.month:02d} "
+                f"PARTITION OF heartbeats FOR VALUES FROM ('{d.isoformat()}') TO ('{nxt.isoformat()}')"
+            ))
+            d = nxt
+
+
+def list_partitions(engine: Engine) -> List[str]:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'heartbeats' ORDER BY c.relname"
+        )).all()
+    return [r[0] for r in rows]
+
+
+def drop_partitions_before(engine: Engine, cutoff: date, max_id: int) -> List[str]:
+    """
+    Drop monthly partitions whose whole range ends on or before `cutoff`,
+    skipping any that still hold heartbeats above `max_id` (not yet rolled up).
+    """
+    dropped = []
+    for name in list_partitions(engine):
+        m = _PART_RE.match(name)
+        if not m:
+            continue
+        upper = _next_month(date(int(m.group(1)), int(m.group(2)), 1))
+        if upper > cutoff:
+            continue
+        with engine.begin() as conn:
+            top = conn.execute(text(f"SELECT max(id) FROM {name}")).scalar()
+            if top is not None and top > max_id:
+                logger.info(f"Keeping {name}: not fully aggregated yet")
+                continue
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
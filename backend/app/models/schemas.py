@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict
+from datetime import datetime
 
 class OrderIn(BaseModel):
     customer_name: str
@@ -29,8 +30,7 @@ class AgentRegisterOut(BaseModel):
     agent_id: str
     token: str
 
-class HeartbeatIn(BaseModel):
-    agent_id: str
+class HeartbeatData(BaseModel):
     user: Optional[str] = ""
     hostname: Optional[str] = ""
     os_version: Optional[str] = ""
@@ -41,12 +41,39 @@ class HeartbeatIn(BaseModel):
     cpu_5m: Optional[float] = 0.0
     idle_minutes: Optional[float] = 0.0
     last_input_ts: Optional[str] = ""
+    interval_s: Optional[float] = None  # seconds since the previous beat (adaptive cadence)
+    active_s: Optional[float] = None    # ... of which Rhino was running or in front
 
-class AgentEventIn(BaseModel):
+class HeartbeatIn(HeartbeatData):
     agent_id: str
+
+class AgentEventData(BaseModel):
     type: str
     task_id: Optional[str] = None
+    path: Optional[str] = None
     meta: Optional[dict] = {}
+    ts: Optional[datetime] = None  # when the agent saw it (UTC); default: received
+
+class AgentEventIn(AgentEventData):
+    agent_id: str
+
+class AgentBatchIn(BaseModel):
+    """A heartbeat and/or queued events in one request."""
+    agent_id: str
+    heartbeat: Optional[HeartbeatData] = None
+    events: List[AgentEventData] = []
+
+class OutboxItem(BaseModel):
+    seq: int
+    kind: str                      # heartbeat | event
+    ts: Optional[datetime] = None  # when the agent recorded it (UTC)
+    data: dict = {}
+
+class OutboxBatchIn(BaseModel):
+    """Replay from an agent's on-disk outbox; `stream` identifies that outbox, seq orders it."""
+    agent_id: str
+    stream: str
+    items: List[OutboxItem]
 
 class AssignIn(BaseModel):
     order_id: int
@@ -0,0 +1,127 @@
+# backend/app/services/activity_sessions.py
+"""
+Activity sessions: each agent's heartbeat stream compressed into runs of
+one state (foreground / running / idle) and task.
+
+The aggregator (workers/activity_agg.py) folds new heartbeats in id
+order, in the same transaction as the rollups: a beat in the same state
+and task as the agent's latest session moves its `ended_at`; a change
+closes it at the beat's time and opens the next one. Silence longer than
+SESSION_GAP (agent off or offline) ends a session where it stood. Reports,
+idle detection and per-task time are then interval queries over
+sessions instead of scans of raw heartbeats.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.orm import ActivitySession
+
+SESSION_GAP = timedelta(seconds=float(os.getenv("ACTIVITY_SESSION_GAP", "630")))  # two missed keepalives
+ACTIVE_STATES = ("foreground", "running")
+
+
+def state_of(running: bool, foreground: bool) -> str:
+    return "foreground" if foreground else "running" if running else "idle"
+
+
+def fold(db: Session, beats: Iterable[Tuple[str, datetime, bool, bool, Optional[str]]]) -> List[ActivitySession]:
+    """
+    Stage session updates for (agent_id, created_at, running, foreground,
+    task_id) beats in arrival order; the caller commits. Returns the sessions opened.
+    """
+    beats = list(beats)
+    agents = {b[0] for b in beats}
+    if not agents:
+        return []
+    latest = (select(func.max(ActivitySession.id)).where(ActivitySession.agent_id.in_(agents))
+              .group_by(ActivitySession.agent_id))
+    current: Dict[str, ActivitySession] = {
+        s.agent_id: s for s in db.query(ActivitySession).filter(ActivitySession.id.in_(latest))}
+    opened = []
+    for agent_id, ts, running, foreground, task_id in beats:
+        state = state_of(running, foreground)
+        cur = current.get(agent_id)
+        if cur is not None and ts < cur.ended_at:
+            continue  # late replay; the rollups still count it
+        if cur is not None and ts - cur.ended_at <= SESSION_GAP:
+            cur.ended_at = ts
+            if cur.state == state and cur.task_id == task_id:
+                cur.heartbeats = (cur.heartbeats or 0) + 1
+                continue
+        cur = current[agent_id] = ActivitySession(agent_id=agent_id, state=state, task_id=task_id,
+                                                  started_at=ts, ended_at=ts, heartbeats=1)
+        db.add(cur)
+        opened.append(cur)
+    return opened
+
+
+def overlapping(db: Session, start: datetime, end: datetime, agent_ids: Optional[List[str]] = None,
+                task_ids: Optional[List[str]] = None) -> Iterator[ActivitySession]:
+    q = (db.query(ActivitySession)
+         .filter(ActivitySession.ended_at > start, ActivitySession.started_at < end))
+    if agent_ids:
+        q = q.filter(ActivitySession.agent_id.in_(agent_ids))
+    if task_ids:
+        q = q.filter(ActivitySession.task_id.in_(task_ids))
+    return q.yield_per(1000)
+
+
+def _minutes(a: datetime, b: datetime) -> float:
+    return max(0.0, (b - a).total_seconds() / 60)
+
+
+def daily_utilization(db: Session, start: date, end: date,
+                      agent_ids: Optional[List[str]] = None) -> List[Tuple[date, str, float, int]]:
+    """[(day, agent_id, active minutes, heartbeats)] for [start, end], sessions split at midnight."""
+    lo, hi = datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+    acc: Dict[Tuple[date, str], list] = defaultdict(lambda: [0.0, 0])
+    for s in overlapping(db, lo, hi, agent_ids):
+        if lo <= s.ended_at < hi:
+            acc[(s.ended_at.date(), s.agent_id)][1] += s.heartbeats or 0
+        if s.state not in ACTIVE_STATES:
+            continue
+        t = max(s.started_at, lo)
+        while t < min(s.ended_at, hi):
+            midnight = datetime.combine(t.date() + timedelta(days=1), time.min)
+            acc[(t.date(), s.agent_id)][0] += _minutes(t, min(s.ended_at, midnight, hi))
+            t = midnight
+    return [(d, a, round(m, 2), n) for (d, a), (m, n) in sorted(acc.items())]
+
+
+def task_time(db: Session, task_ids: Optional[List[str]] = None, start: Optional[datetime] = None,
+              end: Optional[datetime] = None) -> List[Dict]:
+    """Minutes per state spent on each task (clipped to [start, end) when given)."""
+    start, end = start or datetime.min, end or datetime.max
+    out: Dict[str, Dict] = {}
+    for s in overlapping(db, start, end, task_ids=task_ids):
+        if not s.task_id:
+            continue
+        t = out.setdefault(s.task_id, {"task_id": s.task_id, "foreground_minutes": 0.0, "running_minutes": 0.0,
+                                       "idle_minutes": 0.0, "agents": set(), "first_seen": s.started_at,
+                                       "last_seen": s.ended_at})
+        t[f"{s.state}_minutes"] += _minutes(max(s.started_at, start), min(s.ended_at, end))
+        t["agents"].add(s.agent_id)
+        t["first_seen"], t["last_seen"] = min(t["first_seen"], s.started_at), max(t["last_seen"], s.ended_at)
+    for t in out.values():
+        t["agents"] = sorted(t["agents"])
+        for k in ("foreground_minutes", "running_minutes", "idle_minutes"):
+            t[k] = round(t[k], 1)
+    return sorted(out.values(), key=lambda t: t["task_id"])
+
+
+def idle_agents(db: Session, min_minutes: float, now: Optional[datetime] = None) -> List[Dict]:
+    """Agents still reporting that have held a task without Rhino for at least `min_minutes`."""
+    now = now or datetime.utcnow()
+    latest = (select(func.max(ActivitySession.id))
+              .where(ActivitySession.ended_at >= now - SESSION_GAP)
+              .group_by(ActivitySession.agent_id))
+    out = []
+    for s in db.query(ActivitySession).filter(ActivitySession.id.in_(latest)):
+        idle = _minutes(s.started_at, now)
+        if s.state == "idle" and s.task_id and idle >= min_minutes:
+            out.append({"agent_id": s.agent_id, "task_id": s.task_id, "idle_since": s.started_at,
+                        "idle_minutes": round(idle, 1)})
+    return sorted(out, key=lambda r: -r["idle_minutes"])
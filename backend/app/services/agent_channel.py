@@ -0,0 +1,110 @@
+# backend/app/services/agent_channel.py
+"""
+Server -> agent messages (assignments, commands).
+
+Each agent has a small mailbox on the app's event loop. Agents drain it
+over the /api/agents/ws WebSocket (which also carries their heartbeats
+and events upstream) or, where WebSockets can't get through, by
+long-polling /api/agents/poll. send() may be called from any thread
+(sync endpoints run in the threadpool) and wakes the waiting connection
+immediately. An idle connection costs one parked coroutine.
+
+Messages to an agent that is offline wait in its mailbox (newest
+CHANNEL_BACKLOG kept). On every (re)connect the agent also gets a
+`hello` carrying the task the server believes it is on, so state
+converges even if a message was lost with a dropped connection.
+"""
+import asyncio, itertools, os, threading, time
+from collections import deque
+from typing import Dict, List, Optional
+from app.services.agent_registry import registry
+from app.utils.logging import logger
+
+CHANNEL_BACKLOG = int(os.getenv("CHANNEL_BACKLOG", "100"))
+POLL_TIMEOUT = float(os.getenv("CHANNEL_POLL_TIMEOUT", "25"))  # s; stay under proxy read timeouts
+
+
+class _Mailbox:
+    def __init__(self):
+        self.messages: deque = deque(maxlen=CHANNEL_BACKLOG)
+        self.ready = asyncio.Event()
+        self.connections = 0
+
+
+class AgentChannel:
+    def __init__(self):
+        self._boxes: Dict[str, _Mailbox] = {}
+        self._last_assign: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Bind to the app's event loop (call from an async startup hook)."""
+        self._loop = asyncio.get_running_loop()
+
+    def _box(self, agent_id: str) -> _Mailbox:
+        box = self._boxes.get(agent_id)
+        if box is None:
+            box = self._boxes[agent_id] = _Mailbox()
+        return box
+
+    # -- downstream --
+
+    def send(self, agent_id: str, msg: Dict):
+        """Queue `msg` for the agent; safe from any thread."""
+        msg = {"id": next(self._ids), "ts": time.time(), **msg}
+        if msg.get("type") == "assign":
+            with self._lock:
+                self._last_assign[agent_id] = msg
+        loop = self._loop
+        if loop is None:
+            logger.warning(f"Agent channel not started; dropped {msg.get('type')} for {agent_id}")
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(agent_id, msg)
+        else:
+            loop.call_soon_threadsafe(self._deliver, agent_id, msg)
+
+    def _deliver(self, agent_id: str, msg: Dict):
+        box = self._box(agent_id)
+        box.messages.append(msg)
+        box.ready.set()
+
+    def hello(self, agent_id: str) -> Dict:
+        st = registry.get(agent_id)
+        task_id = st.active_task_id if st else None
+        with self._lock:
+            last = self._last_assign.get(agent_id)
+        return {"type": "hello", "ts": time.time(), "active_task_id": task_id,
+                "task": last if last and task_id and last.get("task_id") == task_id else None}
+
+    async def receive(self, agent_id: str, timeout: Optional[float] = None) -> List[Dict]:
+        """Wait for queued messages (up to `timeout` s) and take them all."""
+        box = self._box(agent_id)
+        if not box.messages:
+            box.ready.clear()
+            try:
+                await asyncio.wait_for(box.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        out = list(box.messages)
+        box.messages.clear()
+        box.ready.clear()
+        return out
+
+    def connected(self, agent_id: str, delta: int):
+        box = self._box(agent_id)
+        box.connections += delta
+
+    def stats(self) -> Dict:
+        return {"agents": len(self._boxes),
+                "connections": sum(b.connections for b in self._boxes.values()),
+                "queued": sum(len(b.messages) for b in self._boxes.values())}
+
+
+channel = AgentChannel()
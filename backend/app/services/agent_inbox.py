@@ -0,0 +1,191 @@
+# backend/app/services/agent_inbox.py
+"""
+Agent events and replayed outbox batches.
+
+Agents keep heartbeats and events in a local append-only outbox and
+upload them in seq order as {"stream", "items": [{"seq", "kind", "ts",
+"data"}]}. `agent_streams` remembers the highest seq applied per stream
+(one stream per outbox file), and the items and the new high-water mark
+commit in one transaction. A batch that is re-sent after a lost ack,
+or that overlaps an earlier one, therefore applies each item exactly
+once. Items that don't validate (or are older than OUTBOX_MAX_AGE_DAYS) are
+skipped but still consumed, so one bad row can't wedge an agent's outbox.
+
+Heartbeats come as "heartbeat" items (full state, sent as a keepalive)
+or "hb" items (only the fields that changed). Deltas are applied to the
+state kept in `agent_streams.state`, so every stored row is complete.
+
+A file_done carrying a `fingerprint` upserts `model_fingerprints` in the
+same transaction; the stored event keeps only the content_hash, tagged
+with `duplicate_of` / `in_library` when the model was seen before.
+"""
+import json, os, zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.orm import AgentStream, Event, Heartbeat
+from app.models.schemas import AgentEventData, HeartbeatData, OutboxItem
+from app.services.agent_registry import registry
+from app.services.assignment import record_completion
+from app.services import fingerprints, task_stats
+from app.services.file_catalog import catalog
+from app.services.scheduler import COMPLETION_EVENTS
+from app.services.telemetry_hub import hub
+from app.utils.logging import logger
+
+OUTBOX_MAX_ITEMS = int(os.getenv("OUTBOX_MAX_ITEMS", "1000"))
+OUTBOX_MAX_BYTES = int(os.getenv("OUTBOX_MAX_BYTES", str(8 << 20)))  # decompressed
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))        # batches applied at once
+OUTBOX_RETRY_AFTER = int(os.getenv("OUTBOX_RETRY_AFTER", "5"))
+# Older replayed items are dropped (their heartbeat partitions may be gone).
+OUTBOX_MAX_AGE = timedelta(days=float(os.getenv("OUTBOX_MAX_AGE_DAYS", "14")))
+# Per-beat counters; everything else in a heartbeat is state that deltas update.
+HB_COUNTERS = {"interval_s", "active_s"}
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+def decode_body(body: bytes, encoding: str = "") -> dict:
+    """JSON body, gunzipped when Content-Encoding is gzip; capped at OUTBOX_MAX_BYTES."""
+    if encoding.lower() == "gzip":
+        try:
+            body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, OUTBOX_MAX_BYTES + 1)
+        except zlib.error as e:
+            raise ValueError(f"bad gzip body: {e}")
+    if len(body) > OUTBOX_MAX_BYTES:
+        raise PayloadTooLarge(f"payload over {OUTBOX_MAX_BYTES} bytes")
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    return data
+
+
+def _utc(ts: Optional[datetime], default: datetime) -> datetime:
+    if ts is None:
+        return default
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _event_row(agent_id: str, ev: AgentEventData, now: datetime) -> Event:
+    meta = dict(ev.meta or {})
+    if ev.path:
+        meta["path"] = ev.path
+    return Event(agent_id=agent_id, type=ev.type, task_id=ev.task_id,
+                 meta=json.dumps(meta) if meta else "", ts=_utc(ev.ts, now))
+
+
+def _fingerprint_of(ev: AgentEventData) -> Optional[dict]:
+    fp = (ev.meta or {}).get("fingerprint")
+    return fp if ev.type == "file_done" and isinstance(fp, dict) and fp.get("content_hash") else None
+
+
+def _stage_fingerprints(db: Session, agent_id: str, events: List[AgentEventData],
+                        rows: List[Event], now: datetime):
+    """Upsert fingerprints carried by file_done events; the event row keeps the hash and dedup tags."""
+    for ev, row in zip(events, rows):
+        fp = _fingerprint_of(ev)
+        if fp is None:
+            continue
+        meta = json.loads(row.meta) if row.meta else {}
+        meta.pop("fingerprint", None)
+        meta["content_hash"] = fp["content_hash"]
+        first = fingerprints.upsert(db, agent_id, ev.task_id, ev.path or "", fp, now)
+        if first:
+            meta["duplicate_of"] = first
+        library = catalog.paths_for_hash(fp["content_hash"])
+        if library:
+            meta["in_library"] = library[:5]
+        row.meta = json.dumps(meta)
+
+
+def _after_events(agent_id: str, events: List[AgentEventData], rows: List[Event]):
+    """Publish committed events; a completion of the agent's current task frees it."""
+    for ev, row in zip(events, rows):
+        fp = _fingerprint_of(ev)
+        if fp is not None:
+            fingerprints.index.add(fp["content_hash"], fp)
+        hub.event(agent_id, ev.type, ev.task_id, row.ts, json.loads(row.meta) if row.meta else {})
+        if ev.type in COMPLETION_EVENTS:
+            record_completion(agent_id, ev.task_id)
+
+
+def store_events(db: Session, agent_id: str, events: List[AgentEventData]):
+    """Persist agent events in one transaction, then publish them."""
+    now = datetime.utcnow()
+    rows = [_event_row(agent_id, ev, now) for ev in events]
+    _stage_fingerprints(db, agent_id, events, rows, now)
+    task_stats.events(db, ((r.type, r.task_id, r.ts) for r in rows))
+    db.add_all(rows)
+    db.commit()
+    _after_events(agent_id, events, rows)
+
+
+def _parse(items: List[OutboxItem], now: datetime, state: Dict) -> Tuple[list, list, int]:
+    """Validate items in seq order; `state` (the stream's heartbeat state) is updated in place."""
+    heartbeats, events, bad = [], [], 0
+    for it in items:
+        # Agent clocks drift: never in the future, never older than OUTBOX_MAX_AGE.
+        it.ts = min(_utc(it.ts, now), now)
+        if now - it.ts > OUTBOX_MAX_AGE:
+            bad += 1
+            continue
+        try:
+            if it.kind in ("heartbeat", "hb"):
+                hb = HeartbeatData(**{**(state if it.kind == "hb" else {}), **it.data})
+                state.clear()
+                state.update(hb.model_dump(exclude=HB_COUNTERS))
+                heartbeats.append((it, hb))
+            elif it.kind == "event":
+                events.append((it, AgentEventData(**{"ts": it.ts, **it.data})))
+            else:
+                bad += 1
+        except ValidationError:
+            bad += 1
+    return heartbeats, events, bad
+
+
+def apply_outbox(db: Session, agent_id: str, stream: str, items: List[OutboxItem]) -> Dict:
+    now = datetime.utcnow()
+    st = db.query(AgentStream).filter(AgentStream.stream == stream).with_for_update().first()
+    if st is None:
+        st = AgentStream(stream=stream, agent_id=agent_id, last_seq=0)
+        db.add(st)
+    elif st.agent_id != agent_id:
+        raise ValueError("stream belongs to another agent")
+    fresh = sorted((it for it in items if it.seq > st.last_seq), key=lambda it: it.seq)
+    if not fresh:
+        db.rollback()
+        return {"last_seq": st.last_seq, "applied": 0, "duplicates": len(items), "rejected": 0}
+
+    state = json.loads(st.state) if st.state else {}
+    heartbeats, events, bad = _parse(fresh, now, state)
+    hb_rows = []
+    for it, hb in heartbeats:
+        # created_at is the agent's time so rollups count outage activity in the hour it happened.
+        hb_rows.append({**hb.model_dump(), "agent_id": agent_id, "ts": it.ts, "created_at": it.ts})
+    if hb_rows:
+        db.execute(insert(Heartbeat), hb_rows)
+    ev_rows = [_event_row(agent_id, ev, now) for _, ev in events]
+    _stage_fingerprints(db, agent_id, [ev for _, ev in events], ev_rows, now)
+    task_stats.events(db, ((r.type, r.task_id, r.ts) for r in ev_rows))
+    db.add_all(ev_rows)
+    st.last_seq = fresh[-1].seq
+    st.state = json.dumps(state)
+    st.updated_at = now
+    db.commit()
+
+    if heartbeats:
+        # Live state follows the newest heartbeat, unless a fresher one already arrived.
+        latest = hb_rows[-1]
+        known = registry.get(agent_id)
+        if known is not None and (known.last_seen is None or latest["ts"] >= known.last_seen):
+            registry.heartbeat(agent_id, heartbeats[-1][1].model_dump(), seen=latest["ts"])
+    _after_events(agent_id, [ev for _, ev in events], ev_rows)
+    if bad:
+        logger.warning(f"Outbox {stream} ({agent_id}): skipped {bad} invalid items")
+    return {"last_seq": st.last_seq, "applied": len(fresh) - bad,
+            "duplicates": len(items) - len(fresh), "rejected": bad}
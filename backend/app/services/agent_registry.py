@@ -0,0 +1,175 @@
+# backend/app/services/agent_registry.py
+import os, threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.db import SessionLocal
+from app.models.orm import Agent
+from app.utils.logging import logger
+
+AGENT_FLUSH_INTERVAL = float(os.getenv("AGENT_FLUSH_INTERVAL", "5.0"))
+
+LIVE_FIELDS = ("is_rhino_running", "idle_minutes", "active_task_id", "cpu_5m")
+
+
+@dataclass
+class AgentState:
+    agent_id: str
+    user: str = ""
+    hostname: str = ""
+    last_seen: Optional[datetime] = None
+    active_task_id: Optional[str] = None
+    is_rhino_running: bool = False
+    cpu_5m: float = 0.0
+    idle_minutes: float = 0.0
+
+    @classmethod
+    def from_row(cls, a: Agent) -> "AgentState":
+        return cls(
+            agent_id=a.agent_id, user=a.user or "", hostname=a.hostname or "",
+            last_seen=a.last_seen, active_task_id=a.active_task_id,
+            is_rhino_running=bool(a.is_rhino_running),
+            cpu_5m=a.cpu_5m or 0.0, idle_minutes=a.idle_minutes or 0.0,
+        )
+
+
+class AgentRegistry:
+    """
+    Process-wide cache of registered agents and their latest live state.
+    Loaded once at startup, kept current by register/heartbeat/assign, and
+    written back to the `agents` table in coalesced batches: however many
+    heartbeats arrive between flushes, each agent row is updated once.
+    """
+
+    def __init__(self, flush_interval: float = AGENT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._agents: Dict[str, AgentState] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners: List[Callable[[Optional[str], Optional[AgentState]], None]] = []
+
+    def subscribe(self, fn: Callable[[Optional[str], Optional[AgentState]], None]):
+        """
+        fn(agent_id, state) after every change: state None = agent dropped,
+        agent_id None = everything replaced (load).
+        Called with the registry lock held; listeners must not call back in.
+        """
+        self._listeners.append(fn)
+
+    def _changed(self, agent_id: Optional[str], st: Optional[AgentState]):
+        for fn in self._listeners:
+            fn(agent_id, st)
+
+    def load(self, db: Session):
+        states = {a.agent_id: AgentState.from_row(a) for a in db.query(Agent).all()}
+        with self._lock:
+            self._agents = states
+            self._dirty.clear()
+            self._changed(None, None)
+        logger.info(f"Agent registry loaded {len(states)} agents")
+
+    def get(self, agent_id: str, db: Optional[Session] = None) -> Optional[AgentState]:
+        """Memory lookup; on a miss, fall back to one DB read (agent registered by another process)."""
+        st = self._agents.get(agent_id)
+        if st is not None or db is None:
+            return st
+        row = db.get(Agent, agent_id)
+        return self.adopt(row) if row is not None else None
+
+    def adopt(self, row: Agent) -> AgentState:
+        """Cache an Agent row read elsewhere (e.g. via an AsyncSession); an existing entry wins."""
+        with self._lock:
+            st = self._agents.get(row.agent_id)
+            if st is None:
+                st = self._agents[row.agent_id] = AgentState.from_row(row)
+                self._changed(st.agent_id, st)
+            return st
+
+    def all(self) -> List[AgentState]:
+        return list(self._agents.values())
+
+    def upsert(self, agent_id: str, user: str, hostname: str) -> AgentState:
+        """Called after the agent row was committed by /register."""
+        with self._lock:
+            st = self._agents.get(agent_id)
+            if st is None:
+                st = self._agents[agent_id] = AgentState(agent_id=agent_id)
+            st.user, st.hostname = user, hostname
+            self._changed(agent_id, st)
+            return st
+
+    def heartbeat(self, agent_id: str, data: Dict, seen: Optional[datetime] = None) -> Optional[AgentState]:
+        with self._lock:
+            st = self._agents.get(agent_id)
+            if st is None:
+                return None
+            st.last_seen = seen or datetime.utcnow()
+            st.is_rhino_running = bool(data.get("is_rhino_running"))
+            st.cpu_5m = data.get("cpu_5m") or 0.0
+            st.idle_minutes = data.get("idle_minutes") or 0.0
+            # The agent only learns its task from the server; don't let a
+            # heartbeat that doesn't know about it wipe a fresh assignment.
+            if data.get("active_task_id") is not None:
+                st.active_task_id = data["active_task_id"]
+            self._dirty.add(agent_id)
+            self._changed(agent_id, st)
+            return st
+
+    def set_task(self, agent_id: str, task_id: Optional[str]):
+        with self._lock:
+            st = self._agents.get(agent_id)
+            if st is not None:
+                st.active_task_id = task_id
+                self._dirty.add(agent_id)
+                self._changed(agent_id, st)
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = []
+            for agent_id in self._dirty:
+                st = self._agents.get(agent_id)
+                if st is not None:
+                    row = {k: getattr(st, k) for k in LIVE_FIELDS}
+                    row.update(agent_id=agent_id, last_seen=st.last_seen)
+                    rows.append(row)
+            self._dirty.clear()
+        if not rows:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(update(Agent), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Agent state flush failed: {e}")
+            with self._lock:
+                self._dirty.update(r["agent_id"] for r in rows)
+        finally:
+            db.close()
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="agent-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+registry = AgentRegistry()
@@ -1,20 +1,43 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from app.models.orm import Agent, Assignment
-from sqlalchemy import func
+from app.models.orm import Order
+from app.services.agent_channel import channel
+from app.services.agent_registry import registry
+from app.services.scheduler import scheduler
+from app.services import task_stats
+from app.services.worker_ranking import ranking
 
-def top_free_workers(db: Session) -> List[Dict]:
-    agents = db.query(Agent).all()
-    tasks_today = dict(db.query(Assignment.agent_id, func.count(Assignment.id)).group_by(Assignment.agent_id).all())
-    ranked = []
-    for a in agents:
-        ranked.append({
-            "agent_id": a.agent_id,
-            "user": a.user,
-            "cpu_5m": a.cpu_5m or 0.0,
-            "idle_minutes": a.idle_minutes or 0.0,
-            "active_task_id": a.active_task_id,
-            "tasks_today": tasks_today.get(a.agent_id, 0),
-        })
-    ranked.sort(key=lambda w: (w["active_task_id"] is not None, w["cpu_5m"], w["idle_minutes"], w["tasks_today"]))
-    return ranked[:3]
+def top_free_workers(db: Optional[Session] = None, k: int = 3, category: str = "") -> List[Dict]:
+    """
+    Suggested workers for an order, best first, by the ASSIGN_POLICY scheduler
+    policy. The default "legacy" policy (free first, then lowest cpu_5m, idle
+    time and assignments today) is served from the incrementally maintained
+    ranking.
+    """
+    if scheduler.policy.name == "legacy":
+        return ranking.top(k)
+    return scheduler.suggest(category, k, db)
+
+def record_assignment(db: Session, agent_id: str, order_id: int, task_id: Optional[str] = None):
+    """Call after an Assignment row is committed; pushes the task to the agent."""
+    order = db.get(Order, order_id)
+    ranking.assigned(agent_id)
+    scheduler.assigned(agent_id, order.category if order else "")
+    if task_id:
+        task_stats.assigned(db, task_id, order_id, agent_id, order.category if order else "")
+        db.commit()
+        registry.set_task(agent_id, task_id)
+        channel.send(agent_id, {"type": "assign", "task_id": task_id, "order_id": order_id,
+                                "filename": order.canonical_filename if order else "",
+                                "category": order.category if order else ""})
+
+def record_completion(agent_id: str, task_id: Optional[str] = None):
+    """
+    A completion event. Frees the agent only when it names no task or the
+    one the agent holds; a done file from another task folder is history.
+    """
+    st = registry.get(agent_id)
+    if task_id and st is not None and st.active_task_id not in (None, task_id):
+        return
+    scheduler.completed(agent_id)
+    registry.set_task(agent_id, None)
@@ -0,0 +1,61 @@
+import os
+from typing import TYPE_CHECKING, Optional
+from app.utils.aio import run_sync
+
+if TYPE_CHECKING:
+    import httpx
+
+# Point at a local fake (scripts/fake_dropbox.py) for testing.
+DROPBOX_API = os.getenv("DROPBOX_API_BASE", "https://api.dropboxapi.com/2").rstrip("/")
+DROPBOX_TIMEOUT = float(os.getenv("DROPBOX_TIMEOUT", "15.0"))
+
+_cx: Optional["httpx.AsyncClient"] = None
+
+def configured() -> bool:
+    return bool(os.getenv("DROPBOX_TOKEN"))
+
+def client() -> "httpx.AsyncClient":
+    """
+    Shared pooled client, bound to the background event loop (app.utils.aio).
+    Reusing it keeps TLS connections to Dropbox warm across calls.
+    """
+    import httpx
+    global _cx
+    token = os.getenv("DROPBOX_TOKEN")
+    if not token:
+        raise RuntimeError("DROPBOX_TOKEN not configured")
+    if _cx is None or _cx.is_closed:
+        _cx = httpx.AsyncClient(
+            base_url=DROPBOX_API,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=httpx.Timeout(DROPBOX_TIMEOUT),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=120),
+        )
+    return _cx
+
+class DropboxApiError(Exception):
+    def __init__(self, payload: dict):
+        self.payload = payload or {}
+        super().__init__(self.payload.get("error_summary", "dropbox api error"))
+
+    @property
+    def tag(self) -> str:
+        return ((self.payload.get("error") or {}).get(".tag")) or ""
+
+async def rpc(cx: "httpx.AsyncClient", route: str, body: dict) -> dict:
+    r = await cx.post(route, json=body)
+    if r.status_code == 409:
+        # Dropbox route errors: {"error_summary": "...", "error": {...}}
+        raise DropboxApiError(r.json())
+    r.raise_for_status()
+    return r.json()
+
+async def aclose():
+    global _cx
+    if _cx is not None:
+        await _cx.aclose()
+        _cx = None
+
+def close():
+    if _cx is not None:
+        run_sync(aclose(), timeout=5)
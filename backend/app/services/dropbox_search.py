@@ -1,61 +1,69 @@
-import os
-from typing import List, Dict
-from dropbox import Dropbox, files
-from dropbox.files import FileMetadata
-from rapidfuzz import fuzz
-
-def _client() -> Dropbox:
-    token = os.getenv("DROPBOX_TOKEN")
-    if not token:
-        raise RuntimeError("DROPBOX_TOKEN not configured")
-    return Dropbox(token)
-
-def _temp_link(dbx: Dropbox, path: str) -> str:
-    try:
-        return dbx.files_get_temporary_link(path).link
-    except Exception:
-        return ""
+import os, asyncio
+from typing import TYPE_CHECKING, List, Dict
+from app.services import dropbox_api
+from app.services.file_catalog import catalog
+from app.utils.aio import run_sync
+from app.utils.ttl_cache import TTLCache
 
-def search_similar_files(canonical_name: str) -> List[Dict]:
-    """
-    Search exact and fuzzy .3dm files; return top 3 suggestions with ~4h temporary links.
-    """
-    try:
-        dbx = _client()
-    except Exception:
-        # Safe fallback when token is not configured
-        return [{"filename": canonical_name, "path": "/new", "size": "0", "score": 0, "temp_link": ""}]
+if TYPE_CHECKING:
+    import httpx
 
-    # Common search options: only .3dm files
-    opts = files.SearchOptions(file_extensions=["3dm"])
+# Whole-search budget: both queries plus the temporary links.
+SEARCH_DEADLINE = float(os.getenv("DROPBOX_SEARCH_DEADLINE", "8.0"))
 
-    candidates: List[Dict] = []
+# Dropbox temporary links live ~4h; hand them out for a bit less than that.
+link_cache = TTLCache("dropbox_links", maxsize=int(os.getenv("LINK_CACHE_SIZE", "5000")),
+                      ttl=float(os.getenv("LINK_CACHE_TTL", str(3.5 * 3600))))
+# Search results per query (remote) or per canonical filename (local catalog).
+search_cache = TTLCache("dropbox_search", maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "2000")),
+                        ttl=float(os.getenv("SEARCH_CACHE_TTL", "600")))
 
-    # 1) Exact search by the full canonical filename
-    try:
-        res = dbx.files_search_v2(files.SearchV2Arg(query=canonical_name, options=opts))
-        for match in (res.matches or []):
-            md = match.metadata.get_metadata()
-            if isinstance(md, FileMetadata):
-                candidates.append({"filename": md.name, "path": md.path_lower, "size": md.size})
-    except Exception:
-        # ignore search failure; we'll still return a fallback later if empty
-        pass
+async def _search(cx: "httpx.AsyncClient", query: str) -> List[Dict]:
+    return await search_cache.get_or_load(("remote", query), lambda: _search_uncached(cx, query))
 
-    # 2) Broaden search: category + design prefix (first two parts)
+async def _search_uncached(cx: "httpx.AsyncClient", query: str) -> List[Dict]:
+    data = await dropbox_api.rpc(cx, "/files/search_v2", {"query": query, "options": {"file_extensions": ["3dm"]}})
+    out = []
+    for match in data.get("matches") or []:
+        md = (match.get("metadata") or {}).get("metadata") or {}
+        if md.get(".tag") == "file":
+            out.append({"filename": md.get("name"), "path": md.get("path_lower"), "size": md.get("size")})
+    return out
+
+async def _temp_link(cx: "httpx.AsyncClient", path: str) -> str:
+    # Failed fetches ("") are not cached, so the next order retries them.
+    return await link_cache.get_or_load(path, lambda: _temp_link_uncached(cx, path), cache_if=bool)
+
+async def _temp_link_uncached(cx: "httpx.AsyncClient", path: str) -> str:
     try:
-        parts = canonical_name.split("_")
-        prefix = "_".join(parts[:2]) if len(parts) >= 2 else parts[0]
-        if prefix:
-            res2 = dbx.files_search_v2(files.SearchV2Arg(query=prefix, options=opts))
-            for match in (res2.matches or []):
-                md = match.metadata.get_metadata()
-                if isinstance(md, FileMetadata):
-                    candidates.append({"filename": md.name, "path": md.path_lower, "size": md.size})
+        return (await dropbox_api.rpc(cx, "/files/get_temporary_link", {"path": path})).get("link", "")
     except Exception:
-        pass
+        return ""
+
+async def _gather(coros: List, deadline: float) -> List:
+    """Run concurrently until `deadline` (loop time); stragglers are cancelled and yield None."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    if not tasks:
+        return []
+    loop = asyncio.get_running_loop()
+    _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+    for t in pending:
+        t.cancel()
+    return [t.result() if t.done() and not t.cancelled() and t.exception() is None else None for t in tasks]
+
+def _queries(canonical_name: str) -> List[str]:
+    # 1) exact canonical filename, 2) category + design prefix (first two parts)
+    parts = canonical_name.split("_")
+    prefix = "_".join(parts[:2]) if len(parts) >= 2 else parts[0]
+    return [q for q in (canonical_name, prefix) if q]
+
+async def _remote_candidates(cx: "httpx.AsyncClient", canonical_name: str, deadline: float) -> List[Dict]:
+    results = await _gather([_search(cx, q) for q in _queries(canonical_name)], deadline)
+    # Copies: the lists are shared through the search cache.
+    candidates: List[Dict] = [dict(c) for res in results if res for c in res]
 
     # De-dup and score with RapidFuzz
+    from rapidfuzz import fuzz
     seen = set()
     scored: List[Dict] = []
     for c in candidates:
@@ -65,12 +73,44 @@ def search_similar_files(canonical_name: str) -> List[Dict]:
         seen.add(key)
         c["score"] = int(fuzz.WRatio(c["filename"], canonical_name))
         scored.append(c)
-
     scored.sort(key=lambda x: x["score"], reverse=True)
-    top = scored[:3] if scored else [{"filename": canonical_name, "path": "/new", "size": "0", "score": 0}]
+    return scored[:3]
+
+async def search_similar_files_async(canonical_name: str) -> List[Dict]:
+    """
+    Search exact and fuzzy .3dm files; return top 3 suggestions with ~4h temporary links.
+    Candidates come from the local catalog once it is synced; otherwise both
+    Dropbox searches run concurrently. Link fetches share the same deadline.
+    """
+    try:
+        cx = dropbox_api.client()
+    except Exception:
+        # Safe fallback when token is not configured
+        return [{"filename": canonical_name, "path": "/new", "size": "0", "score": 0, "temp_link": ""}]
+
+    deadline = asyncio.get_running_loop().time() + SEARCH_DEADLINE
+    if len(catalog):
+        scored = search_cache.get(("local", canonical_name))
+        if scored is None:
+            scored = catalog.search(canonical_name, limit=3)
+            search_cache.set(("local", canonical_name), scored)
+        scored = [dict(c) for c in scored]
+    else:
+        scored = await _remote_candidates(cx, canonical_name, deadline)
+    top = scored or [{"filename": canonical_name, "path": "/new", "size": "0", "score": 0}]
 
     # Add temporary links
+    linkable = [t for t in top if t.get("path") and t["path"].startswith("/") and t["path"] != "/new"]
+    links = await _gather([_temp_link(cx, t["path"]) for t in linkable], deadline)
     for t in top:
-        t["temp_link"] = _temp_link(dbx, t.get("path", "")) if t.get("path") and t["path"].startswith("/") else ""
-
+        t["temp_link"] = ""
+    for t, link in zip(linkable, links):
+        t["temp_link"] = link or ""
     return top
+
+def search_similar_files(canonical_name: str) -> List[Dict]:
+    """Blocking wrapper for sync callers (job workers); runs on the shared background loop."""
+    return run_sync(search_similar_files_async(canonical_name), timeout=SEARCH_DEADLINE + 2)
+
+def cache_stats() -> Dict:
+    return {"links": link_cache.stats(), "search": search_cache.stats()}
@@ -2,7 +2,6 @@ import os, smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from app.utils.logging import logger
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 import pathlib
 
 def send_invoice_email(to_email: str, subject: str, html_body: str):
@@ -19,6 +18,7 @@ def send_invoice_email(to_email: str, subject: str, html_body: str):
     return True
 
 def render_invoice_html(**ctx):
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
     templates_dir = pathlib.Path(__file__).resolve().parents[1] / "templates"
     env = Environment(loader=FileSystemLoader(str(templates_dir)), autoescape=select_autoescape())
     tpl = env.get_template("invoice_email.html")
@@ -0,0 +1,257 @@
+# backend/app/services/file_catalog.py
+"""
+Local catalog of the Dropbox .3dm library.
+
+The `dropbox_files` table mirrors DROPBOX_LIBRARY_ROOT and is kept
+current with list_folder / list_folder/continue; the cursor is stored
+in worker_state so each sync only fetches changes. An in-memory index
+maps canonical filename parts (category, design, stone, metal, size,
+as produced by build_filename) and filename trigrams to paths, so
+similar-file search scores a small candidate set locally and only
+needs Dropbox for temporary links. Hits are collapsed by content_hash
+(copies of one model show once) and, where agents have fingerprinted
+the models, re-ranked by geometry (services/fingerprints.py).
+"""
+import os, threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from sqlalchemy.orm import Session
+from app.models.db import SessionLocal
+from app.models.orm import DropboxFile, WorkerState
+from app.services import dropbox_api, fingerprints
+from app.utils.aio import run_sync
+from app.utils.logging import logger
+
+LIBRARY_ROOT = os.getenv("DROPBOX_LIBRARY_ROOT", "")  # "" = whole Dropbox
+SYNC_INTERVAL = float(os.getenv("DROPBOX_SYNC_INTERVAL", "300"))
+MAX_CANDIDATES = int(os.getenv("CATALOG_MAX_CANDIDATES", "500"))
+CURSOR_KEY = "file_catalog.cursor"
+
+
+def filename_parts(name: str) -> List[str]:
+    """'er_hal_ovl_pt_6_5_done.3dm' -> ['er', 'hal', 'ovl', 'pt', '6_5']"""
+    stem = name.lower()
+    if stem.endswith(".3dm"):
+        stem = stem[:-4]
+    if stem.endswith("_done"):
+        stem = stem[:-5]
+    parts = [p for p in stem.replace("-", "_").replace(" ", "_").split("_") if p]
+    # build_filename writes size 6.5 as "6_5"; glue it back into one part.
+    if len(parts) >= 2 and parts[-1].isdigit() and parts[-2].isdigit():
+        parts[-2:] = [f"{parts[-2]}_{parts[-1]}"]
+    return parts
+
+
+def _trigrams(s: str) -> Set[str]:
+    s = f" {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class CatalogIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.names: Dict[str, str] = {}
+        self.sizes: Dict[str, int] = {}
+        self.hashes: Dict[str, str] = {}
+        self._by_hash: Dict[str, Set[str]] = defaultdict(set)
+        self._parts: Dict[str, List[str]] = {}
+        self._by_part: Dict[str, Set[str]] = defaultdict(set)
+        self._by_gram: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, path: str, name: str, size: int = 0, content_hash: str = ""):
+        with self._lock:
+            self._remove(path)
+            parts = filename_parts(name)
+            self.names[path], self.sizes[path], self.hashes[path] = name, size or 0, content_hash or ""
+            self._parts[path] = parts
+            if content_hash:
+                self._by_hash[content_hash].add(path)
+            for p in parts:
+                self._by_part[p].add(path)
+            for g in _trigrams("_".join(parts)):
+                self._by_gram[g].add(path)
+
+    def clear(self):
+        with self._lock:
+            for d in (self.names, self.sizes, self.hashes, self._by_hash, self._parts, self._by_part, self._by_gram):
+                d.clear()
+
+    def remove(self, path: str):
+        with self._lock:
+            self._remove(path)
+
+    def remove_prefix(self, prefix: str):
+        with self._lock:
+            for path in [p for p in self.names if p == prefix or p.startswith(prefix.rstrip("/") + "/")]:
+                self._remove(path)
+
+    def _remove(self, path: str):
+        parts = self._parts.pop(path, None)
+        if parts is None:
+            return
+        for p in parts:
+            self._by_part[p].discard(path)
+        for g in _trigrams("_".join(parts)):
+            self._by_gram[g].discard(path)
+        h = self.hashes.pop(path, None)
+        if h:
+            self._by_hash[h].discard(path)
+            if not self._by_hash[h]:
+                del self._by_hash[h]
+        self.names.pop(path, None); self.sizes.pop(path, None)
+
+    def paths_for_hash(self, content_hash: str) -> List[str]:
+        with self._lock:
+            return sorted(self._by_hash.get(content_hash, ()))
+
+    def candidates(self, canonical_name: str, limit: int = MAX_CANDIDATES) -> List[str]:
+        """Paths sharing the most canonical parts (category counts double); trigram recall as a fallback."""
+        parts = filename_parts(canonical_name)
+        votes: Counter = Counter()
+        with self._lock:
+            for i, p in enumerate(parts):
+                for path in self._by_part.get(p, ()):
+                    votes[path] += 2 if i == 0 else 1
+            if len(votes) < limit:
+                for g in _trigrams("_".join(parts)):
+                    for path in self._by_gram.get(g, ()):
+                        votes.setdefault(path, 0)
+                    if len(votes) >= limit * 4:
+                        break
+        return [p for p, _ in votes.most_common(limit)]
+
+    def search(self, canonical_name: str, limit: int = 3) -> List[Dict]:
+        from rapidfuzz import fuzz, process
+        paths = self.candidates(canonical_name)
+        choices = {p: self.names[p] for p in paths if p in self.names}
+        # Over-fetch: copies collapse and geometry may reorder the tail.
+        hits = process.extract(canonical_name, choices, scorer=fuzz.WRatio, limit=limit * 5)
+        hits = [{"filename": name, "path": path, "size": self.sizes.get(path, 0), "score": int(score)}
+                for name, score, path in hits]
+        return fingerprints.rerank(hits, self.hashes.get, limit)
+
+
+catalog = CatalogIndex()
+
+
+def load(db: Session):
+    n = 0
+    for f in db.query(DropboxFile.path_lower, DropboxFile.name, DropboxFile.size, DropboxFile.content_hash):
+        catalog.add(f.path_lower, f.name, f.size, f.content_hash)
+        n += 1
+    logger.info(f"File catalog loaded {n} files")
+
+
+def _apply(db: Session, entries: List[Dict]) -> int:
+    changed = 0
+    for e in entries:
+        tag, path = e.get(".tag"), (e.get("path_lower") or "")
+        if tag == "deleted":
+            prefix = path.rstrip("/") + "/"
+            db.query(DropboxFile).filter(
+                (DropboxFile.path_lower == path) | DropboxFile.path_lower.startswith(prefix)
+            ).delete(synchronize_session=False)
+            catalog.remove_prefix(path)
+            changed += 1
+        elif tag == "file" and path.endswith(".3dm"):
+            parts = filename_parts(e["name"])
+            modified = e.get("server_modified")
+            db.merge(DropboxFile(
+                path_lower=path, name=e["name"], size=e.get("size") or 0, rev=e.get("rev", ""),
+                content_hash=e.get("content_hash", ""),
+                server_modified=datetime.fromisoformat(modified.rstrip("Z")) if modified else None,
+                category=parts[0] if parts else "", tokens=" ".join(parts),
+            ))
+            catalog.add(path, e["name"], e.get("size") or 0, e.get("content_hash", ""))
+            changed += 1
+    return changed
+
+
+def _page(cx, cursor: str) -> Dict:
+    if cursor:
+        coro = dropbox_api.rpc(cx, "/files/list_folder/continue", {"cursor": cursor})
+    else:
+        coro = dropbox_api.rpc(cx, "/files/list_folder", {
+            "path": LIBRARY_ROOT, "recursive": True, "include_deleted": False, "limit": 2000,
+        })
+    # HTTP on the shared loop; DB writes stay on this thread.
+    return run_sync(coro, timeout=dropbox_api.DROPBOX_TIMEOUT + 5)
+
+
+def _sync(db: Session) -> int:
+    cx = dropbox_api.client()
+    state = db.get(WorkerState, CURSOR_KEY) or WorkerState(name=CURSOR_KEY, value="")
+    changed = 0
+    while True:
+        try:
+            page = _page(cx, state.value)
+        except dropbox_api.DropboxApiError as e:
+            if state.value and e.tag == "reset":
+                logger.warning("Dropbox cursor reset; re-listing the library")
+                db.query(DropboxFile).delete()
+                catalog.clear()
+                state.value = ""
+                continue
+            raise
+        changed += _apply(db, page.get("entries") or [])
+        state.value = page.get("cursor", state.value)
+        db.merge(state)
+        db.commit()  # one page at a time, so an interrupted sync resumes from here
+        if not page.get("has_more"):
+            return changed
+
+
+def sync_once() -> int:
+    """Pull changes since the stored cursor. Returns the number of entries applied."""
+    if not dropbox_api.configured():
+        return 0
+    db = SessionLocal()
+    try:
+        return _sync(db)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Dropbox catalog sync failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _loop():
+    while True:
+        n = sync_once()
+        if n:
+            from app.services.dropbox_search import search_cache
+            search_cache.invalidate()  # scored results may now miss new files
+            logger.info(f"Dropbox catalog sync applied {n} changes ({len(catalog)} files)")
+        if _stop.wait(SYNC_INTERVAL):
+            return
+
+
+def start():
+    global _thread
+    if _thread:
+        return
+    db = SessionLocal()
+    try:
+        load(db)
+    finally:
+        db.close()
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="catalog-sync", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread
+    _stop.set()
+    if _thread:
+        _thread.join(5)
+        _thread = None
@@ -1,8 +1,27 @@
+# backend/app/services/filename_rules.py
+"""
+Canonical .3dm filename rules.
+
+BASELINE plus whatever "SLS Naming SH.xlsx" adds are compiled into plain
+dicts (and their case-folded twins) and snapshotted as JSON keyed by the
+workbook's mtime, size and sha256 and a hash of BASELINE itself. Startup loads the snapshot in a few
+milliseconds; pandas/openpyxl are only imported when the workbook has
+actually changed. A watcher thread polls the workbook and swaps the
+compiled rules in atomically, so edits apply without a restart.
+"""
+import hashlib, json, os, tempfile, threading
 from pathlib import Path
-import pandas as pd
-from functools import lru_cache
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 from app.models.schemas import OrderIn
+from app.utils.logging import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+XLSX_PATH = Path(os.getenv("NAMING_RULES_XLSX", str(Path(__file__).with_name("SLS Naming SH.xlsx"))))
+SNAPSHOT_PATH = Path(os.getenv("NAMING_RULES_SNAPSHOT", os.path.join(tempfile.gettempdir(), "sls_naming_rules.json")))
+POLL_INTERVAL = float(os.getenv("NAMING_RULES_POLL", "30"))
+SNAPSHOT_VERSION = 1
 
 BASELINE = {
     "category": {
@@ -25,51 +44,211 @@ BASELINE = {
     }
 }
 
-@lru_cache()
-def load_rules() -> Dict[str, Dict[str, str]]:
-    xl_path = Path(__file__).with_name("SLS Naming SH.xlsx")
+BASELINE_SHA256 = hashlib.sha256(json.dumps(BASELINE, sort_keys=True).encode()).hexdigest()
+
+BUCKETS = ("category", "design", "stone", "metal")
+
+Rules = Dict[str, Dict[str, str]]
+
+_lock = threading.Lock()
+_rules: Optional[Rules] = None
+_folded: Tuple[object, Rules] = (None, {})
+_source: Dict = {}  # {"mtime", "size", "sha256"} of the workbook behind _rules
+
+
+def _bucket_for(sheet: str) -> Optional[str]:
+    s = sheet.lower()
+    if "category" in s or "ring type" in s or "type" in s:
+        return "category"
+    if "design" in s or "shank" in s or "style" in s:
+        return "design"
+    if "stone" in s or "shape" in s:
+        return "stone"
+    if "metal" in s or "material" in s:
+        return "metal"
+    return None
+
+
+def _compile(xl_path: Path) -> Rules:
+    """Parse the workbook over BASELINE. Only this path needs pandas."""
     rules = {k: v.copy() for k, v in BASELINE.items()}
-    if xl_path.exists():
-        try:
-            xls = pd.ExcelFile(xl_path)
-            for sheet in xls.sheet_names:
-                df = xls.parse(sheet)
-                cols = {c.lower(): c for c in df.columns}
-                name_col = cols.get("name") or next((c for c in df.columns if "name" in c.lower()), None)
-                code_col = cols.get("code") or next((c for c in df.columns if "code" in c.lower()), None)
-                if not (name_col and code_col):
-                    continue
-                key = None
-                s = sheet.lower()
-                if "category" in s or "ring type" in s or "type" in s:
-                    key = "category"
-                elif "design" in s or "shank" in s or "style" in s:
-                    key = "design"
-                elif "stone" in s or "shape" in s:
-                    key = "stone"
-                elif "metal" in s or "material" in s:
-                    key = "metal"
-                if key:
-                    for _, row in df.iterrows():
-                        name = str(row[name_col]).strip()
-                        code = str(row[code_col]).strip().lower()
-                        if name and code and code != "nan":
-                            rules[key][name] = code
-        except Exception:
-            pass
+    if not xl_path.exists():
+        return rules
+    try:
+        import pandas as pd
+        xls = pd.ExcelFile(xl_path)
+        for sheet in xls.sheet_names:
+            key = _bucket_for(sheet)
+            df = xls.parse(sheet)
+            cols = {str(c).lower(): c for c in df.columns}
+            name_col = cols.get("name") or next((c for c in df.columns if "name" in str(c).lower()), None)
+            code_col = cols.get("code") or next((c for c in df.columns if "code" in str(c).lower()), None)
+            if not (key and name_col and code_col):
+                continue
+            names = df[name_col].astype(str).str.strip()
+            codes = df[code_col].astype(str).str.strip().str.lower()
+            for name, code in zip(names, codes):
+                if name and code and code != "nan":
+                    rules[key][name] = code
+    except Exception as e:
+        logger.warning(f"Naming rules: could not parse {xl_path.name}: {e}")
     return rules
 
+
+def _fold(rules: Rules) -> Rules:
+    table: Rules = {}
+    for bucket, names in rules.items():
+        table[bucket] = {}
+        for k, v in names.items():
+            table[bucket].setdefault(k.casefold(), v)  # first spelling wins
+    return table
+
+
+def _stat(xl_path: Path) -> Dict:
+    try:
+        st = xl_path.stat()
+    except OSError:
+        return {"mtime": 0, "size": 0, "sha256": ""}
+    return {"mtime": st.st_mtime_ns, "size": st.st_size, "sha256": None}
+
+
+def _sha256(xl_path: Path) -> str:
+    h = hashlib.sha256()
+    with open(xl_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_snapshot() -> Optional[Dict]:
+    try:
+        with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+            snap = json.load(f)
+        if snap.get("version") != SNAPSHOT_VERSION or snap.get("baseline") != BASELINE_SHA256:
+            return None  # older format, or compiled over a different built-in table
+        return snap
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(src: Dict, rules: Rules, folded: Rules):
+    tmp = SNAPSHOT_PATH.with_name(SNAPSHOT_PATH.name + f".{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "baseline": BASELINE_SHA256, **src,
+                       "rules": rules, "folded": folded}, f, ensure_ascii=False)
+        os.replace(tmp, SNAPSHOT_PATH)
+    except OSError as e:
+        logger.warning(f"Naming rules: could not write snapshot {SNAPSHOT_PATH}: {e}")
+
+
+def _build(src: Dict) -> Tuple[Rules, Rules, Dict]:
+    """Compiled (rules, folded, src) for the workbook described by `src`, via the snapshot when it matches."""
+    snap = _read_snapshot()
+    if snap and (snap["mtime"], snap["size"]) == (src["mtime"], src["size"]):
+        return snap["rules"], snap["folded"], src | {"sha256": snap["sha256"]}
+    if src["size"]:
+        src = src | {"sha256": _sha256(XLSX_PATH)}
+        if snap and snap["sha256"] == src["sha256"]:
+            # Touched but unchanged: keep the compiled rules, refresh the key.
+            _write_snapshot(src, snap["rules"], snap["folded"])
+            return snap["rules"], snap["folded"], src
+    rules = _compile(XLSX_PATH)
+    folded = _fold(rules)
+    _write_snapshot(src, rules, folded)
+    logger.info(f"Naming rules compiled from {XLSX_PATH.name}: " + ", ".join(f"{k}={len(v)}" for k, v in rules.items()))
+    return rules, folded, src
+
+
+def reload(force: bool = False) -> bool:
+    """Recompile if the workbook changed since the current rules; returns True when swapped in."""
+    global _rules, _folded, _source
+    src = _stat(XLSX_PATH)
+    with _lock:
+        if not force and _rules is not None and (_source.get("mtime"), _source.get("size")) == (src["mtime"], src["size"]):
+            return False
+        rules, folded, src = _build(src)
+        if not force and _rules is not None and src["sha256"] == _source.get("sha256"):
+            _source = src
+            return False
+        # Readers grab `_rules` once per call; the new dicts are complete before they are published.
+        _folded = (rules, folded)
+        _rules = rules
+        _source = src
+        return True
+
+
+def load_rules() -> Rules:
+    if _rules is None:
+        reload()
+    return _rules
+
+
+def folded_rules(rules: Rules) -> Rules:
+    """Case-folded table for `rules`; precompiled for the current rules, built once for any other dict."""
+    global _folded
+    src, table = _folded
+    if src is not rules:
+        table = _fold(rules)
+        if rules is _rules or _rules is None:
+            _folded = (rules, table)
+    return table
+
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _watch():
+    while not _stop.wait(POLL_INTERVAL):
+        try:
+            if reload():
+                logger.info(f"Naming rules reloaded from {XLSX_PATH.name}")
+        except Exception as e:
+            logger.warning(f"Naming rules reload failed: {e}")
+
+
+def start():
+    """Load (snapshot or compile) now, then watch the workbook for edits."""
+    global _thread
+    reload()
+    if _thread or POLL_INTERVAL <= 0:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_watch, name="naming-rules", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread
+    _stop.set()
+    if _thread:
+        _thread.join(5)
+        _thread = None
+
+
+def _fallback(bucket: str, value: str) -> str:
+    if bucket == "metal":
+        return value.lower().replace(" ", "").replace("gold", "g")
+    return value.lower()[:3]
+
 def _map(rules: Dict[str, Dict[str, str]], bucket: str, value: str) -> str:
     if not value:
         return ""
     if value in rules[bucket]:
         return rules[bucket][value]
-    for k, v in rules[bucket].items():
-        if k.lower() == value.lower():
-            return v
+    code = folded_rules(rules)[bucket].get(value.casefold())
+    return code if code is not None else _fallback(bucket, value)
+
+def _map_series(rules: Dict[str, Dict[str, str]], bucket: str, values: "pd.Series") -> "pd.Series":
+    values = values.fillna("").astype(str)
+    codes = values.map(rules[bucket])
+    codes = codes.fillna(values.str.casefold().map(folded_rules(rules)[bucket]))
     if bucket == "metal":
-        return value.lower().replace(" ", "").replace("gold", "g")
-    return value.lower()[:3]
+        fallback = values.str.lower().str.replace(" ", "", regex=False).str.replace("gold", "g", regex=False)
+    else:
+        fallback = values.str.lower().str[:3]
+    return codes.fillna(fallback).where(values != "", "")
 
 def build_filename(order: OrderIn, rules=None) -> str:
     if rules is None:
@@ -83,3 +262,18 @@ def build_filename(order: OrderIn, rules=None) -> str:
         parts.append(str(order.size).replace(".", "_"))
     core = "_".join([p for p in parts if p])
     return f"{core}.3dm"
+
+def build_filenames(orders: "pd.DataFrame", rules=None) -> "pd.Series":
+    """
+    Batch build_filename over a frame with category/design/stone/metal/size
+    columns. Each bucket is mapped once per column rather than once per row.
+    """
+    import pandas as pd
+    if rules is None:
+        rules = load_rules()
+    empty = pd.Series("", index=orders.index)
+    cols = [_map_series(rules, b, orders[b] if b in orders else empty) for b in BUCKETS]
+    size = pd.to_numeric(orders["size"] if "size" in orders else empty, errors="coerce")
+    has_size = size.notna() & (size != 0)
+    cols.append(size.astype(float).astype(str).str.replace(".", "_", regex=False).where(has_size, ""))
+    return pd.Series(["_".join(p for p in row if p) + ".3dm" for row in zip(*cols)], index=orders.index)
@@ -0,0 +1,163 @@
+# backend/app/services/fingerprints.py
+"""
+Content fingerprints of finished models, sent by agents with file_done.
+
+`content_hash` is Dropbox's content_hash, so a fingerprint joins
+directly to dropbox_files and the catalog. Rows are keyed by hash. A
+second file_done with a known hash is a duplicate: seen_count goes up
+and the event is tagged `duplicate_of`. The geometry signature (sorted
+bounding-box extents, object/layer counts, file size) is kept in memory
+for similarity scoring. It is bucketed by the scale of the largest
+extent, so a nearest-model lookup only compares models of similar size.
+"""
+import json, math, threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.models.db import SessionLocal
+from app.models.orm import ModelFingerprint
+from app.utils.logging import logger
+
+GEOMETRY_WEIGHT = 0.25  # share of a search score that geometry similarity can move
+
+
+class Signature(NamedTuple):
+    size: int
+    layers: Optional[int]
+    objects: Optional[int]
+    extents: Optional[Tuple[float, float, float]]  # bbox sides, largest first
+
+    @classmethod
+    def from_fp(cls, fp: Dict) -> "Signature":
+        box = fp.get("bbox")
+        extents = None
+        if box and len(box) == 6:
+            extents = tuple(sorted((abs(box[i + 3] - box[i]) for i in range(3)), reverse=True))
+        return cls(int(fp.get("size") or 0), fp.get("layers"), fp.get("objects"), extents)
+
+    def bucket(self) -> Optional[int]:
+        if not self.extents or self.extents[0] <= 0:
+            return None
+        return int(math.floor(math.log2(self.extents[0])))
+
+
+def _ratio(a: float, b: float) -> float:
+    if a == b:
+        return 1.0
+    hi = max(abs(a), abs(b))
+    return min(abs(a), abs(b)) / hi if hi else 1.0
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """0..1 over whatever both signatures carry: bbox shape 0.5, objects 0.25, size 0.15, layers 0.1."""
+    parts = [(0.15, _ratio(a.size, b.size))]
+    if a.extents and b.extents:
+        parts.append((0.5, sum(_ratio(x, y) for x, y in zip(a.extents, b.extents)) / 3))
+    if a.objects is not None and b.objects is not None:
+        parts.append((0.25, _ratio(a.objects, b.objects)))
+    if a.layers is not None and b.layers is not None:
+        parts.append((0.1, _ratio(a.layers, b.layers)))
+    total = sum(w for w, _ in parts)
+    return sum(w * s for w, s in parts) / total
+
+
+class FingerprintIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sigs: Dict[str, Signature] = {}
+        self._buckets: Dict[Optional[int], Set[str]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self.sigs)
+
+    def add(self, content_hash: str, fp: Dict):
+        sig = Signature.from_fp(fp)
+        with self._lock:
+            old = self.sigs.get(content_hash)
+            if old is not None:
+                self._buckets[old.bucket()].discard(content_hash)
+            self.sigs[content_hash] = sig
+            self._buckets[sig.bucket()].add(content_hash)
+
+    def get(self, content_hash: str) -> Optional[Signature]:
+        return self.sigs.get(content_hash)
+
+    def nearest(self, content_hash: str, k: int = 10) -> List[Tuple[str, float]]:
+        ref = self.sigs.get(content_hash)
+        if ref is None:
+            return []
+        b = ref.bucket()
+        with self._lock:
+            pool = set().union(*(self._buckets.get(x, ()) for x in ((b - 1, b, b + 1) if b is not None else (None,))))
+        pool.discard(content_hash)
+        scored = sorted(((h, similarity(ref, self.sigs[h])) for h in pool if h in self.sigs),
+                        key=lambda t: t[1], reverse=True)
+        return scored[:k]
+
+
+index = FingerprintIndex()
+
+
+def load(db: Session):
+    for row in db.query(ModelFingerprint.content_hash, ModelFingerprint.size, ModelFingerprint.layers,
+                        ModelFingerprint.objects, ModelFingerprint.bbox):
+        index.add(row.content_hash, {"size": row.size, "layers": row.layers, "objects": row.objects,
+                                     "bbox": json.loads(row.bbox) if row.bbox else None})
+    logger.info(f"Fingerprint index loaded {len(index)} models")
+
+
+def start():
+    db = SessionLocal()
+    try:
+        load(db)
+    finally:
+        db.close()
+
+
+def upsert(db: Session, agent_id: str, task_id: Optional[str], path: str, fp: Dict,
+           now: Optional[datetime] = None) -> Optional[str]:
+    """Stage the fingerprint row (caller commits); returns the first path if this content was seen before."""
+    h = fp.get("content_hash")
+    if not h:
+        return None
+    now = now or datetime.utcnow()
+    row = db.get(ModelFingerprint, h)
+    if row is not None:
+        row.seen_count = (row.seen_count or 1) + 1
+        row.last_path, row.last_seen = path, now
+        return row.first_path
+    db.add(ModelFingerprint(
+        content_hash=h, size=int(fp.get("size") or 0), format_version=fp.get("format_version"),
+        layers=fp.get("layers"), objects=fp.get("objects"), units=fp.get("units") or "",
+        bbox=json.dumps(fp["bbox"]) if fp.get("bbox") else "",
+        agent_id=agent_id, task_id=task_id, first_path=path, last_path=path,
+        seen_count=1, first_seen=now, last_seen=now))
+    db.flush()  # a second copy later in the same batch must see this row
+    return None
+
+
+def rerank(hits: List[Dict], hash_of: Callable[[str], str], limit: int) -> List[Dict]:
+    """
+    Filename-scored hits (best first) -> one hit per content, and where
+    fingerprints carry a bounding box, the score blended with geometry
+    similarity to the best-named model that has one. Hash/size-only
+    fingerprints still dedupe but never move the score.
+    """
+    seen, unique = set(), []
+    for hit in hits:
+        h = hash_of(hit["path"])
+        if h and h in seen:
+            continue
+        seen.add(h)
+        unique.append((hit, h))
+    sigs = [index.get(h) if h else None for _, h in unique]
+    ref = next((sig for sig in sigs if sig is not None and sig.extents), None)
+    if ref is not None:
+        for (hit, _), sig in zip(unique, sigs):
+            if sig is not None and sig.extents:
+                geo = similarity(ref, sig)
+                hit["geometry"] = round(geo, 3)
+                hit["score"] = int(round((1 - GEOMETRY_WEIGHT) * hit["score"] + GEOMETRY_WEIGHT * 100 * geo))
+        unique.sort(key=lambda t: t[0]["score"], reverse=True)
+    return [hit for hit, _ in unique[:limit]]
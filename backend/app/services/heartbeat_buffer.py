@@ -0,0 +1,163 @@
+# backend/app/services/heartbeat_buffer.py
+import os, threading, time
+from collections import deque
+from typing import Dict, List
+from sqlalchemy import insert
+from app.models.db import SessionLocal
+from app.models.orm import Heartbeat
+from app.utils.logging import logger
+
+HB_BUFFERED = os.getenv("HB_BUFFERED", "1") == "1"
+HB_BATCH_SIZE = int(os.getenv("HB_BATCH_SIZE", "500"))
+HB_FLUSH_INTERVAL = float(os.getenv("HB_FLUSH_INTERVAL", "2.0"))
+HB_QUEUE_MAX = int(os.getenv("HB_QUEUE_MAX", "20000"))
+HB_ENQUEUE_TIMEOUT = float(os.getenv("HB_ENQUEUE_TIMEOUT", "0.5"))
+
+
+class BufferFull(Exception):
+    pass
+
+
+class HeartbeatBuffer:
+    """
+    Bounded in-process queue of heartbeat rows, flushed by one background
+    thread as multi-row INSERTs when either the batch size or the flush
+    interval is reached. Producers block for at most `enqueue_timeout`
+    seconds when the queue is full, then get BufferFull (backpressure).
+    """
+
+    def __init__(self, batch_size: int = HB_BATCH_SIZE, flush_interval: float = HB_FLUSH_INTERVAL,
+                 max_rows: int = HB_QUEUE_MAX, enqueue_timeout: float = HB_ENQUEUE_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.enqueue_timeout = enqueue_timeout
+        self._rows: deque = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        # counters
+        self.enqueued = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.deferred = 0   # non-blocking puts that found the queue full (the caller retries blocking)
+        self.failed_flushes = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="hb-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write out everything still queued."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def put(self, row: Dict, block: bool = True):
+        """
+        With block=False, raises BufferFull at once instead of waiting (for
+        event-loop callers, which retry blocking); only a blocking put that
+        times out counts as rejected.
+        """
+        deadline = time.monotonic() + (self.enqueue_timeout if block else 0)
+        with self._cond:
+            while len(self._rows) >= self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if block:
+                        self.rejected += 1
+                    else:
+                        self.deferred += 1
+                    raise BufferFull()
+                self._cond.wait(remaining)
+            self._rows.append(row)
+            self.enqueued += 1
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Synchronously drain the queue (used on shutdown)."""
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            if not self._write(batch):
+                return
+
+    def stats(self) -> Dict:
+        with self._cond:
+            depth = len(self._rows)
+        return {
+            "enabled": HB_BUFFERED,
+            "queue_depth": depth,
+            "queue_max": self.max_rows,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "deferred": self.deferred,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+    def _take(self) -> List[Dict]:
+        with self._cond:
+            n = min(self.batch_size, len(self._rows))
+            batch = [self._rows.popleft() for _ in range(n)]
+            if n:
+                self._cond.notify_all()  # wake producers waiting for space
+            return batch
+
+    def _requeue(self, batch: List[Dict]):
+        with self._cond:
+            self._rows.extendleft(reversed(batch))
+
+    def _write(self, batch: List[Dict]) -> bool:
+        t0 = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(insert(Heartbeat), batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            logger.warning(f"Heartbeat flush of {len(batch)} rows failed: {e}")
+            self._requeue(batch)
+            return False
+        finally:
+            db.close()
+        ms = (time.perf_counter() - t0) * 1000
+        self.flushes += 1
+        self.flushed += len(batch)
+        self.last_flush_ms = ms
+        self.max_flush_ms = max(self.max_flush_ms, ms)
+        self._total_flush_ms += ms
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._rows) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if not self._running:
+                    return
+            batch = self._take()
+            if batch and not self._write(batch):
+                time.sleep(self.flush_interval)  # DB unavailable; rows stay queued
+
+
+buffer = HeartbeatBuffer()
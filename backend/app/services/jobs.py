@@ -0,0 +1,195 @@
+# backend/app/services/jobs.py
+"""
+Persistent background jobs.
+
+Jobs live in the `jobs` table, so they survive restarts and can be run
+by any backend process. Workers claim a job with a conditional UPDATE
+(queued -> running), retry failures with jittered exponential backoff
+and give up after `max_attempts`. Enqueue is idempotent per key.
+"""
+import json, os, random, socket, threading, time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.db import SessionLocal
+from app.models.orm import Job
+from app.utils.logging import logger
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_LOCK_TIMEOUT = float(os.getenv("JOB_LOCK_TIMEOUT", "300"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "2.0"))
+
+
+SETTLED = ("done", "failed", "skipped")
+
+
+class SkipJob(Exception):
+    """Raised by a handler when the job cannot ever succeed (e.g. integration not configured)."""
+
+
+_handlers: Dict[str, Callable[[Session, Job], Optional[dict]]] = {}
+_listeners: List[Callable[[Session, Job], None]] = []
+_wake = threading.Event()
+
+
+def handler(kind: str):
+    def deco(fn):
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+
+def on_settled(fn: Callable[[Session, Job], None]):
+    """Call `fn(db, job)` whenever a job reaches done/failed/skipped."""
+    _listeners.append(fn)
+    return fn
+
+
+def enqueue(db: Session, kind: str, order_id: Optional[int] = None, key: Optional[str] = None,
+            max_attempts: int = 5, delay: float = 0.0) -> Job:
+    key = key or f"{kind}:{order_id}"
+    existing = db.query(Job).filter(Job.idempotency_key == key).first()
+    if existing:
+        return existing
+    job = Job(kind=kind, order_id=order_id, idempotency_key=key, max_attempts=max_attempts,
+              run_after=datetime.utcnow() + timedelta(seconds=delay))
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with another enqueue of the same key.
+        db.rollback()
+        return db.query(Job).filter(Job.idempotency_key == key).one()
+    _wake.set()
+    return job
+
+
+def job_result(job: Optional[Job]) -> dict:
+    if not job or not job.result:
+        return {}
+    try:
+        return json.loads(job.result)
+    except ValueError:
+        return {}
+
+
+def _claim(db: Session, worker: str) -> Optional[Job]:
+    now = datetime.utcnow()
+    ids = db.execute(
+        select(Job.id).where(Job.status == "queued", Job.run_after <= now)
+        .order_by(Job.run_after).limit(8)
+    ).scalars().all()
+    for job_id in ids:
+        won = db.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", locked_by=worker, locked_at=now, attempts=Job.attempts + 1)
+        ).rowcount
+        db.commit()
+        if won == 1:
+            return db.get(Job, job_id)
+    return None
+
+
+def _requeue_stale(db: Session):
+    stale = datetime.utcnow() - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    n = db.execute(
+        update(Job).where(Job.status == "running", Job.locked_at < stale)
+        .values(status="queued", locked_by=None)
+    ).rowcount
+    db.commit()
+    if n:
+        logger.warning(f"Re-queued {n} stale jobs")
+
+
+def _settle(db: Session, job: Job):
+    for fn in _listeners:
+        try:
+            fn(db, job)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Job listener failed for {job.idempotency_key}: {e}")
+
+
+def run_job(db: Session, job: Job):
+    fn = _handlers.get(job.kind)
+    try:
+        if fn is None:
+            raise SkipJob(f"no handler for {job.kind}")
+        result = fn(db, job)
+        job.status = "done"
+        job.result = json.dumps(result or {}, default=str)
+        job.last_error = ""
+    except SkipJob as e:
+        db.rollback()
+        job.status = "skipped"
+        job.last_error = str(e)
+    except Exception as e:
+        db.rollback()
+        job.last_error = f"{type(e).__name__}: {e}"
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+        else:
+            backoff = JOB_RETRY_BASE ** job.attempts
+            job.status = "queued"
+            job.run_after = datetime.utcnow() + timedelta(seconds=backoff * random.uniform(0.5, 1.5))
+    job.locked_by = None
+    db.commit()
+    if job.status in SETTLED:
+        if job.status == "failed":
+            logger.warning(f"Job {job.idempotency_key} failed: {job.last_error}")
+        _settle(db, job)
+
+
+class WorkerPool:
+    def __init__(self, size: int = JOB_WORKERS):
+        self.size = size
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self):
+        if self._threads or self.size <= 0:
+            return
+        self._stop.clear()
+        db = SessionLocal()
+        try:
+            _requeue_stale(db)
+        finally:
+            db.close()
+        for i in range(self.size):
+            t = threading.Thread(target=self._run, args=(f"{self._name}/{i}",), name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        _wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _run(self, worker: str):
+        last_reap = time.monotonic()
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                if time.monotonic() - last_reap > JOB_LOCK_TIMEOUT:
+                    _requeue_stale(db)
+                    last_reap = time.monotonic()
+                job = _claim(db, worker)
+                if job is not None:
+                    run_job(db, job)
+                    continue
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Job worker {worker} error: {e}")
+            finally:
+                db.close()
+            _wake.wait(JOB_POLL_INTERVAL)
+            _wake.clear()
+
+
+pool = WorkerPool()
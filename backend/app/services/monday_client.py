@@ -1,4 +1,4 @@
-import os, httpx
+import os
 from typing import Optional, Dict
 from app.models.schemas import OrderIn
 
@@ -19,6 +19,7 @@ class MondayClient:
         )
         vars = {"board_id": self.board_id, "item_name": f"{order.customer_name} - {filename}"}
         headers = {"Authorization": self.token, "Content-Type": "application/json"}
+        import httpx
         try:
             r = httpx.post(API_URL, headers=headers, json={"query": query, "variables": vars}, timeout=10)
             r.raise_for_status()
@@ -0,0 +1,98 @@
+# backend/app/services/order_import.py
+"""
+Bulk import of historical orders from CSV or JSONL.
+
+Canonical filenames are generated for the whole file at once
+(filename_rules.build_filenames) and rows go in with executemany inserts
+in chunks. Imported orders do not get background jobs: they are back
+catalog, not new work to notify about.
+"""
+import io, os
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.orm import Order
+from app.services.filename_rules import load_rules, build_filenames
+from app.utils.logging import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+IMPORT_CHUNK = int(os.getenv("ORDER_IMPORT_CHUNK", "5000"))
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED = ("customer_name", "customer_email", "category", "metal")
+TEXT_COLS = ("customer_name", "customer_email", "customer_phone", "category", "design", "stone", "metal", "instructions")
+_EMAIL = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+class OrderImportError(ValueError):
+    pass
+
+
+def read_frame(body: bytes, fmt: str) -> "pd.DataFrame":
+    import pandas as pd
+    try:
+        if fmt == "csv":
+            df = pd.read_csv(io.BytesIO(body), dtype=str, keep_default_na=False)
+        elif fmt == "jsonl":
+            df = pd.read_json(io.BytesIO(body), lines=True, dtype=False)
+        else:
+            raise OrderImportError(f"unsupported format: {fmt}")
+    except OrderImportError:
+        raise
+    except Exception as e:
+        raise OrderImportError(f"could not parse {fmt}: {e}")
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [c for c in REQUIRED if c not in df]
+    if missing:
+        raise OrderImportError(f"missing columns: {', '.join(missing)}")
+    return df
+
+
+def _clean(df: "pd.DataFrame") -> "pd.DataFrame":
+    import pandas as pd
+    for c in TEXT_COLS:
+        df[c] = df[c].fillna("").astype(str).str.strip() if c in df else ""
+    df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0) if "price" in df else 0.0
+    size = pd.to_numeric(df["size"], errors="coerce") if "size" in df else pd.Series(float("nan"), index=df.index)
+    df["size"] = size
+    created = pd.to_datetime(df["created_at"], errors="coerce", utc=True).dt.tz_localize(None) \
+        if "created_at" in df else pd.Series(pd.NaT, index=df.index)
+    df["created_at"] = created.fillna(pd.Timestamp(datetime.utcnow()))
+    return df
+
+
+def _errors(df: "pd.DataFrame") -> "pd.Series":
+    """Per-row reason ("" = ok), checked column-wise; the first failing check wins."""
+    import pandas as pd
+    err = pd.Series("", index=df.index)
+    err = err.mask(~df["customer_email"].str.match(_EMAIL), "invalid customer_email")
+    for c in reversed(REQUIRED):
+        err = err.mask(df[c] == "", f"{c} is required")
+    return err
+
+
+def import_orders(db: Session, body: bytes, fmt: str) -> Dict:
+    df = _clean(read_frame(body, fmt))
+    err = _errors(df)
+    ok = df[err == ""].copy()
+    ok["canonical_filename"] = build_filenames(ok, load_rules())
+    # Stored the way create_order does: str(size or "").
+    ok["size"] = ok["size"].astype(float).astype(str).where(ok["size"].notna() & (ok["size"] != 0), "")
+
+    cols = [c.name for c in Order.__table__.columns if c.name != "id"]
+    rows: List[Dict] = ok[cols].to_dict("records")
+    for i in range(0, len(rows), IMPORT_CHUNK):
+        db.execute(insert(Order), rows[i:i + IMPORT_CHUNK])
+    db.commit()
+
+    bad = err[err != ""]
+    logger.info(f"Order import: {len(rows)} imported, {len(bad)} rejected")
+    return {
+        "imported": len(rows),
+        "rejected": len(bad),
+        # 1-based data line numbers (header excluded)
+        "errors": [{"row": int(i) + 1, "error": e} for i, e in bad.head(MAX_REPORTED_ERRORS).items()],
+    }
@@ -0,0 +1,106 @@
+# backend/app/services/order_jobs.py
+"""
+Order side-effects, run by the job pool instead of the request.
+
+    suggest  - similar-file search, stored as Suggestion rows
+    monday   - Monday draft item, stored in the job result
+    notify   - Telegram message, enqueued once both of the above settle
+"""
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from app.models.orm import Job, Order, Suggestion
+from app.services import jobs
+from app.services.assignment import top_free_workers
+from app.services.dropbox_search import search_similar_files
+from app.services.monday_client import MondayClient
+from app.services.telegram_bot import notify_new_order
+from app.utils.aio import run_sync
+
+SIDE_EFFECTS = ("suggest", "monday")
+
+
+def enqueue_order_jobs(db: Session, order_id: int):
+    for kind in SIDE_EFFECTS:
+        jobs.enqueue(db, kind, order_id)
+
+
+def _order(db: Session, job: Job) -> Order:
+    order = db.get(Order, job.order_id)
+    if order is None:
+        raise jobs.SkipJob(f"order {job.order_id} not found")
+    return order
+
+
+def suggestions_of(order: Order) -> List[Dict]:
+    return [{"filename": s.filename, "path": s.path, "size": s.size, "score": s.score, "temp_link": s.temp_link}
+            for s in order.suggestions]
+
+
+@jobs.handler("suggest")
+def run_suggest(db: Session, job: Job):
+    order = _order(db, job)
+    found = search_similar_files(order.canonical_filename)
+    # Replace, so a retried job never leaves duplicates behind.
+    db.query(Suggestion).filter(Suggestion.order_id == order.id).delete()
+    for s in found:
+        db.add(Suggestion(order_id=order.id, filename=s.get("filename"), path=s.get("path"),
+                          size=str(s.get("size", "")), score=s.get("score", 0), temp_link=s.get("temp_link", "")))
+    db.commit()
+    return {"count": len(found)}
+
+
+@jobs.handler("monday")
+def run_monday(db: Session, job: Job):
+    order = _order(db, job)
+    try:
+        monday = MondayClient()
+    except RuntimeError as e:
+        raise jobs.SkipJob(str(e))
+    item = monday.create_draft_item(order, order.canonical_filename)
+    if item is None:
+        raise RuntimeError("Monday create_item failed")
+    return item
+
+
+@jobs.handler("notify")
+def run_notify(db: Session, job: Job):
+    order = _order(db, job)
+    monday = jobs.job_result(db.query(Job).filter(Job.idempotency_key == f"monday:{order.id}").first())
+    suggestions = suggestions_of(order)
+    payload = {
+        "order_id": order.id,
+        "client_name": order.customer_name,
+        "filename": order.canonical_filename,
+    }
+    if monday.get("id"):
+        payload["monday_url"] = f"https://monday.com/items/{monday['id']}"
+    if suggestions and suggestions[0].get("temp_link"):
+        payload["similar_url"] = suggestions[0]["temp_link"]
+    run_sync(notify_new_order(payload, suggestions, top_free_workers(db, category=order.category)), timeout=30)
+    return {"sent": True}
+
+
+@jobs.on_settled
+def _maybe_notify(db: Session, job: Job):
+    # Whichever side-effect settles last enqueues the notification; the
+    # idempotency key keeps it to one even if both see the other settled.
+    if job.kind not in SIDE_EFFECTS or job.order_id is None:
+        return
+    keys = [f"{k}:{job.order_id}" for k in SIDE_EFFECTS]
+    settled = db.query(Job).filter(Job.idempotency_key.in_(keys), Job.status.in_(jobs.SETTLED)).count()
+    if settled == len(SIDE_EFFECTS):
+        jobs.enqueue(db, "notify", job.order_id, max_attempts=3)
+
+
+def order_status(db: Session, order: Order) -> Dict:
+    rows = db.query(Job).filter(Job.order_id == order.id).all()
+    by_kind = {j.kind: j for j in rows}
+    return {
+        "order_id": order.id,
+        "filename": order.canonical_filename,
+        "jobs": {j.kind: {"status": j.status, "attempts": j.attempts, "error": j.last_error or None} for j in rows},
+        "done": all(by_kind.get(k) is not None and by_kind[k].status in jobs.SETTLED
+                    for k in SIDE_EFFECTS + ("notify",)),
+        "suggestions": suggestions_of(order),
+        "monday_item": jobs.job_result(by_kind.get("monday")),
+    }
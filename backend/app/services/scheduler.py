@@ -0,0 +1,252 @@
+# backend/app/services/scheduler.py
+"""
+Pluggable worker-selection policies for new orders.
+
+A policy ranks `Worker` views for an order category. Policies only read
+the views and a `History` (per-agent, per-category assignment counts and
+turnaround times), so the same code runs live (views built from the agent
+registry) and in scripts/simulate_scheduler.py (views built by the
+simulator). ASSIGN_POLICY picks the live policy; "legacy" is the original
+(busy, cpu_5m, idle_minutes, tasks_today) order.
+
+Turnaround is assignment -> first completion event (COMPLETION_EVENTS)
+from the same agent, matched on task_id when the event carries one.
+"""
+import os, threading, time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple, Type
+from sqlalchemy.orm import Session
+from app.models.orm import Assignment, Event, Order
+from app.services.agent_registry import registry
+from app.services.worker_ranking import ranking
+from app.utils.logging import logger
+
+ASSIGN_POLICY = os.getenv("ASSIGN_POLICY", "legacy")
+HISTORY_DAYS = int(os.getenv("SCHED_HISTORY_DAYS", "90"))
+HISTORY_REFRESH = float(os.getenv("SCHED_HISTORY_REFRESH", "900"))
+DEFAULT_MINUTES = float(os.getenv("SCHED_DEFAULT_MINUTES", "120"))
+COMPLETION_EVENTS = ("file_done", "task_done")
+
+
+@dataclass
+class Worker:
+    agent_id: str
+    user: str = ""
+    busy: bool = False
+    queue: int = 0                       # open tasks, including the one in progress
+    busy_since: Optional[float] = None   # epoch seconds the current task started
+    cpu_5m: float = 0.0
+    idle_minutes: float = 0.0
+    tasks_today: int = 0
+    active_task_id: Optional[str] = None
+
+
+class History:
+    """Per-agent/per-category assignment counts and mean turnaround (minutes)."""
+
+    def __init__(self):
+        self.counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._dur: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._agent_dur: Dict[str, Tuple[float, int]] = {}
+        self._cat_dur: Dict[str, Tuple[float, int]] = {}
+        self._all: Tuple[float, int] = (0.0, 0)
+
+    def copy(self) -> "History":
+        h = History()
+        h.counts.update(self.counts)
+        h._dur, h._agent_dur, h._cat_dur = dict(self._dur), dict(self._agent_dur), dict(self._cat_dur)
+        h._all = self._all
+        return h
+
+    @staticmethod
+    def _add(table, key, minutes):
+        s, n = table.get(key, (0.0, 0))
+        table[key] = (s + minutes, n + 1)
+
+    def record_assignment(self, agent_id: str, category: str):
+        self.counts[(agent_id, category or "")] += 1
+
+    def record_duration(self, agent_id: str, category: str, minutes: float):
+        category = category or ""
+        self._add(self._dur, (agent_id, category), minutes)
+        self._add(self._agent_dur, agent_id, minutes)
+        self._add(self._cat_dur, category, minutes)
+        s, n = self._all
+        self._all = (s + minutes, n + 1)
+
+    def affinity(self, agent_id: str, category: str) -> int:
+        return self.counts.get((agent_id, category or ""), 0)
+
+    def expected_minutes(self, agent_id: str, category: str) -> float:
+        """Most specific mean available: agent+category, agent, category, everyone, default."""
+        for table, key in ((self._dur, (agent_id, category or "")), (self._agent_dur, agent_id),
+                           (self._cat_dur, category or "")):
+            s, n = table.get(key, (0.0, 0))
+            if n:
+                return s / n
+        s, n = self._all
+        return s / n if n else DEFAULT_MINUTES
+
+    @classmethod
+    def from_db(cls, db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None) -> "History":
+        h = cls()
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=HISTORY_DAYS)
+        rows = (db.query(Assignment.agent_id, Assignment.task_id, Assignment.ts, Order.category)
+                .outerjoin(Order, Order.id == Assignment.order_id)
+                .filter(Assignment.ts >= since, Assignment.ts < until)
+                .order_by(Assignment.agent_id, Assignment.ts).all())
+        done = (db.query(Event.agent_id, Event.task_id, Event.ts)
+                .filter(Event.type.in_(COMPLETION_EVENTS), Event.ts >= since, Event.ts < until)
+                .order_by(Event.agent_id, Event.ts).all())
+        events: Dict[str, List[Tuple[datetime, Optional[str]]]] = defaultdict(list)
+        for agent_id, task_id, ts in done:
+            events[agent_id].append((ts, task_id))
+        times = {a: [e[0] for e in evs] for a, evs in events.items()}
+        for agent_id, task_id, ts, category in rows:
+            h.record_assignment(agent_id, category)
+            evs = events.get(agent_id, ())
+            for ev_ts, ev_task in evs[bisect_left(times.get(agent_id, []), ts):]:
+                if ev_task in (None, task_id):
+                    h.record_duration(agent_id, category, (ev_ts - ts).total_seconds() / 60)
+                    break
+        return h
+
+
+class Policy:
+    name = ""
+
+    def rank(self, workers: List[Worker], category: str, history: History, now: float) -> List[Worker]:
+        raise NotImplementedError
+
+    def assigned(self, worker: Worker, category: str):
+        """Called once the pick is final (round-robin advances here)."""
+
+
+POLICIES: Dict[str, Type[Policy]] = {}
+
+
+def policy(name: str) -> Callable[[Type[Policy]], Type[Policy]]:
+    def register(cls: Type[Policy]) -> Type[Policy]:
+        cls.name = name
+        POLICIES[name] = cls
+        return cls
+    return register
+
+
+@policy("legacy")
+class Legacy(Policy):
+    def rank(self, workers, category, history, now):
+        return sorted(workers, key=lambda w: (w.busy, w.cpu_5m, w.idle_minutes, w.tasks_today, w.agent_id))
+
+
+@policy("least_loaded")
+class LeastLoaded(Policy):
+    """Fewest open tasks, then fewest assignments today."""
+
+    def rank(self, workers, category, history, now):
+        return sorted(workers, key=lambda w: (w.queue, w.tasks_today, w.agent_id))
+
+
+@policy("round_robin")
+class RoundRobin(Policy):
+    """Next free worker after the last pick, in agent_id order; busy workers last."""
+
+    def __init__(self):
+        self._last = ""
+
+    def rank(self, workers, category, history, now):
+        return sorted(workers, key=lambda w: (w.busy, w.agent_id <= self._last, w.agent_id))
+
+    def assigned(self, worker, category):
+        self._last = worker.agent_id
+
+
+@policy("affinity")
+class Affinity(Policy):
+    """Most past assignments in this category first, least loaded among equals."""
+
+    def rank(self, workers, category, history, now):
+        return sorted(workers, key=lambda w: (w.queue, -history.affinity(w.agent_id, category),
+                                              w.tasks_today, w.agent_id))
+
+
+@policy("ect")
+class EarliestCompletion(Policy):
+    """Smallest estimated finish time: remaining queued work plus this order's expected duration."""
+
+    def eta_minutes(self, w: Worker, category: str, history: History, now: float) -> float:
+        own = history.expected_minutes(w.agent_id, "")
+        backlog = 0.0
+        if w.queue:
+            elapsed = (now - w.busy_since) / 60 if w.busy_since else own / 2
+            backlog = max(0.0, own - elapsed) + own * (w.queue - 1)
+        return backlog + history.expected_minutes(w.agent_id, category)
+
+    def rank(self, workers, category, history, now):
+        return sorted(workers, key=lambda w: (self.eta_minutes(w, category, history, now), w.agent_id))
+
+
+def make_policy(name: str) -> Policy:
+    try:
+        return POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"unknown assignment policy {name!r}; one of {', '.join(POLICIES)}")
+
+
+class Scheduler:
+    """Live scheduler: registry-backed worker views plus a periodically refreshed History."""
+
+    def __init__(self, policy_name: str = ASSIGN_POLICY):
+        self.policy = make_policy(policy_name)
+        self.history = History()
+        self._loaded_at = 0.0
+        self._started: Dict[str, Tuple[float, str]] = {}  # agent -> (task start, category)
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session):
+        try:
+            h = History.from_db(db)
+        except Exception as e:
+            logger.warning(f"Scheduler history refresh failed: {e}")
+            return
+        with self._lock:
+            self.history, self._loaded_at = h, time.time()
+
+    def _maybe_refresh(self, db: Optional[Session]):
+        if db is not None and time.time() - self._loaded_at > HISTORY_REFRESH:
+            self.refresh(db)
+
+    def workers(self) -> List[Worker]:
+        counts = ranking.tasks_today()
+        return [Worker(agent_id=st.agent_id, user=st.user, busy=st.active_task_id is not None,
+                       queue=int(st.active_task_id is not None),
+                       busy_since=self._started.get(st.agent_id, (None,))[0],
+                       cpu_5m=st.cpu_5m, idle_minutes=st.idle_minutes, tasks_today=counts.get(st.agent_id, 0),
+                       active_task_id=st.active_task_id)
+                for st in registry.all()]
+
+    def suggest(self, category: str = "", k: int = 3, db: Optional[Session] = None) -> List[Dict]:
+        self._maybe_refresh(db)
+        with self._lock:
+            ranked = self.policy.rank(self.workers(), category, self.history, time.time())[:k]
+        return [{"agent_id": w.agent_id, "user": w.user, "cpu_5m": w.cpu_5m, "idle_minutes": w.idle_minutes,
+                 "active_task_id": w.active_task_id, "tasks_today": w.tasks_today} for w in ranked]
+
+    def assigned(self, agent_id: str, category: str = ""):
+        with self._lock:
+            self.history.record_assignment(agent_id, category)
+            self._started.setdefault(agent_id, (time.time(), category or ""))
+            self.policy.assigned(Worker(agent_id=agent_id), category)
+
+    def completed(self, agent_id: str):
+        with self._lock:
+            started = self._started.pop(agent_id, None)
+            if started is not None:
+                self.history.record_duration(agent_id, started[1], (time.time() - started[0]) / 60)
+
+
+scheduler = Scheduler()
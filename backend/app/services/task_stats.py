@@ -0,0 +1,77 @@
+# backend/app/services/task_stats.py
+"""
+Per-task time accounting for throughput analytics (api/analytics.py).
+
+One `task_stats` row per task_id, updated as things happen instead of
+re-joining assignments, events and heartbeats at query time:
+- record_assignment() opens it: order, designer, category, assigned_at;
+- the activity aggregator adds each folded heartbeat's active and idle
+  seconds, and the idle sessions it opens for the task (idle gaps);
+- stored agent events add the completion time and inactivity alerts,
+  in the same transaction as the events.
+Every function only stages changes; the caller commits.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.orm import ActivitySession, TaskStats
+from app.services.scheduler import COMPLETION_EVENTS
+
+INACTIVE_EVENT = "inactive_15m"
+
+
+def _row(db: Session, cache: Dict[str, TaskStats], task_id: str) -> TaskStats:
+    row = cache.get(task_id)
+    if row is None:
+        row = db.get(TaskStats, task_id)
+        if row is None:
+            row = TaskStats(task_id=task_id, active_seconds=0.0, idle_seconds=0.0, idle_gaps=0, inactive_alerts=0)
+            db.add(row)
+        cache[task_id] = row
+    return row
+
+
+def assigned(db: Session, task_id: str, order_id: Optional[int], agent_id: str, category: str,
+             ts: Optional[datetime] = None):
+    """A (re)assignment: the designer is the latest one, the clock starts at the first."""
+    row = _row(db, {}, task_id)
+    ts = ts or datetime.utcnow()
+    row.order_id, row.agent_id, row.category = order_id, agent_id, category or ""
+    row.assigned_at = min(row.assigned_at, ts) if row.assigned_at else ts
+
+
+def fold(db: Session, beats: Iterable[Tuple[str, datetime, float, float]], sessions: Iterable[ActivitySession]):
+    """
+    beats: (task_id, created_at, interval seconds, active seconds) of
+    heartbeats carrying a task; sessions: the ones the aggregator just opened.
+    """
+    cache: Dict[str, TaskStats] = {}
+    for task_id, ts, interval, active in beats:
+        row = _row(db, cache, task_id)
+        if row.assigned_at and ts - timedelta(seconds=interval) < row.assigned_at:
+            # Only the part of the interval after the assignment counts.
+            interval = max(0.0, (ts - row.assigned_at).total_seconds())
+            active = min(active, interval)
+        row.active_seconds = (row.active_seconds or 0.0) + active
+        row.idle_seconds = (row.idle_seconds or 0.0) + max(0.0, interval - active)
+        if active > 0:
+            start = ts - timedelta(seconds=active)
+            row.first_activity_at = min(row.first_activity_at, start) if row.first_activity_at else start
+            row.last_activity_at = max(row.last_activity_at, ts) if row.last_activity_at else ts
+    for s in sessions:
+        if s.state == "idle" and s.task_id:
+            row = _row(db, cache, s.task_id)
+            row.idle_gaps = (row.idle_gaps or 0) + 1
+
+
+def events(db: Session, items: Iterable[Tuple[str, Optional[str], datetime]]):
+    """(type, task_id, ts) of stored agent events."""
+    cache: Dict[str, TaskStats] = {}
+    for type_, task_id, ts in items:
+        if not task_id or type_ not in COMPLETION_EVENTS + (INACTIVE_EVENT,):
+            continue
+        row = _row(db, cache, task_id)
+        if type_ == INACTIVE_EVENT:
+            row.inactive_alerts = (row.inactive_alerts or 0) + 1
+        else:
+            row.completed_at = min(row.completed_at, ts) if row.completed_at else ts
@@ -1,7 +1,12 @@
-import os, asyncio, httpx
-from typing import List, Dict
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from __future__ import annotations
+import os, asyncio
+from typing import TYPE_CHECKING, List, Dict
+
+# python-telegram-bot and httpx are imported on first use: most processes
+# never start the bot, and the import alone costs a few hundred ms.
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import Application, ContextTypes
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 LEAD_CHAT_ID = os.getenv("TEAM_LEAD_CHAT_ID", "")
@@ -14,6 +19,7 @@ async def ensure_started():
     global _app, _started
     if _started or not BOT_TOKEN:
         return
+    from telegram.ext import Application, CommandHandler, CallbackQueryHandler
     _app = Application.builder().token(BOT_TOKEN).build()
     _app.add_handler(CommandHandler("start", cmd_start))
     _app.add_handler(CommandHandler("workers", cmd_workers))
@@ -28,6 +34,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("SLS Bot ready. Commands: /workers /orders /reports")
 
 async def cmd_workers(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    import httpx
     async with httpx.AsyncClient(timeout=10) as cx:
         r = await cx.get(f"{BASE}/api/agents/workers")
         workers = r.json()
@@ -45,6 +52,7 @@ async def cmd_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Orders list not implemented here yet.")
 
 async def cmd_reports(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    import httpx
     async with httpx.AsyncClient(timeout=20) as cx:
         r = await cx.get(f"{BASE}/api/reports?range=daily")
         content = r.text
@@ -59,6 +67,7 @@ async def cb_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if str(update.effective_user.id) != str(LEAD_CHAT_ID):
             await q.edit_message_text("Only Team Lead can assign.")
             return
+        import httpx
         async with httpx.AsyncClient(timeout=10) as cx:
             r = await cx.post(f"{BASE}/api/assign", json={"order_id": order_id, "agent_id": agent_id})
         ok = r.status_code == 200
@@ -68,6 +77,7 @@ async def notify_new_order(order: Dict, suggestions: List[Dict], top_workers: Li
     if not BOT_TOKEN or not LEAD_CHAT_ID:
         return
     await ensure_started()
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     lines = [
         f"New Order #{order.get('order_id')}",
         f"Client: {order.get('client_name')}",
@@ -98,3 +108,28 @@ async def notify_new_order(order: Dict, suggestions: List[Dict], top_workers: Li
     await _app.bot.send_message(
         chat_id=int(LEAD_CHAT_ID),
         text="\n".join(lines),
+        reply_markup=markup,
+    )
+
+# Plain Bot API helpers for synchronous callers (webhooks, assign).
+def _post(method: str, payload: dict):
+    if not BOT_TOKEN:
+        return None
+    import httpx
+    try:
+        r = httpx.post(f"https://api.telegram.org/bot{BOT_TOKEN}/{method}", json=payload, timeout=10)
+        r.raise_for_status()
+        return r.json()
+    except Exception:
+        return None
+
+def send_to(chat_id: str, text: str, reply_markup=None):
+    payload = {"chat_id": chat_id, "text": text}
+    if reply_markup:
+        payload["reply_markup"] = {"inline_keyboard": reply_markup}
+    _post("sendMessage", payload)
+
+def send_text(text: str):
+    if not LEAD_CHAT_ID:
+        return
+    send_to(LEAD_CHAT_ID, text)
@@ -0,0 +1,196 @@
+# backend/app/services/telemetry_hub.py
+"""
+Live worker telemetry for dashboards and the bot.
+
+The hub listens to the agent registry (heartbeats, registration, task
+changes) and to agent events, and keeps the latest view of every agent.
+GET snapshots reuse one cached serialization until something changes.
+SSE/WebSocket subscribers get a snapshot on connect and then coalesced
+deltas every TELEMETRY_PUSH_INTERVAL: only the agents that changed, once
+each, however many heartbeats arrived in between. A subscriber that falls
+behind is sent a fresh snapshot instead of a backlog. Agents that go
+quiet never change in the registry, so the publisher also re-checks
+`online` every ONLINE_CHECK_INTERVAL and pushes agents whose flag flipped.
+"""
+import asyncio, json, os, threading, time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from app.services.agent_registry import AgentState, registry
+from app.utils.logging import logger
+
+PUSH_INTERVAL = float(os.getenv("TELEMETRY_PUSH_INTERVAL", "0.5"))
+ONLINE_AFTER = float(os.getenv("TELEMETRY_ONLINE_AFTER", "630"))  # s since last heartbeat: two missed 5 min keepalives
+ONLINE_CHECK_INTERVAL = float(os.getenv("TELEMETRY_ONLINE_CHECK", "5"))
+SUBSCRIBER_QUEUE = int(os.getenv("TELEMETRY_SUBSCRIBER_QUEUE", "64"))
+
+
+def _iso(ts: Optional[datetime]) -> Optional[str]:
+    return ts.isoformat() if ts else None
+
+
+def _online(st: AgentState, now: datetime) -> bool:
+    return bool(st.last_seen and (now - st.last_seen).total_seconds() <= ONLINE_AFTER)
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self.resync = False
+        self.version = -1  # last version queued; older deltas are already covered
+
+    def offer(self, msg: Dict):
+        if msg["version"] <= self.version and msg["type"] == "delta":
+            return
+        try:
+            self.queue.put_nowait(msg)
+            self.version = msg["version"]
+        except asyncio.QueueFull:
+            self.resync = True
+
+
+class TelemetryHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: Dict[str, Dict] = {}     # agent_id -> last event
+        self._dirty: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._everything = False
+        self.version = 0
+        self._cached: Optional[str] = None
+        self._cached_version = -1
+        self._online: Dict[str, bool] = {}     # agent_id -> online as of the last check
+        self._subs: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    # -- inputs (any thread) --
+
+    def on_registry(self, agent_id: Optional[str], st: Optional[AgentState]):
+        with self._lock:
+            if agent_id is None:
+                self._everything = True
+            elif st is None:
+                self._removed.add(agent_id)
+                self._dirty.discard(agent_id)
+            else:
+                self._dirty.add(agent_id)
+                self._removed.discard(agent_id)
+            self.version += 1
+
+    def event(self, agent_id: str, type_: str, task_id: Optional[str], ts: datetime, meta: Optional[Dict] = None):
+        with self._lock:
+            self._events[agent_id] = {"type": type_, "task_id": task_id, "ts": _iso(ts), "meta": meta or {}}
+            self._dirty.add(agent_id)
+            self.version += 1
+
+    def check_online(self, now: Optional[datetime] = None):
+        """Mark agents whose `online` flag flipped since the last check (e.g. heartbeats stopped)."""
+        now = now or datetime.utcnow()
+        states = registry.all()
+        with self._lock:
+            flipped = False
+            for st in states:
+                online = _online(st, now)
+                if self._online.get(st.agent_id, online) != online:
+                    self._dirty.add(st.agent_id)
+                    flipped = True
+                self._online[st.agent_id] = online
+            if flipped:
+                self.version += 1
+            if len(self._online) > len(states):
+                known = {st.agent_id for st in states}
+                for agent_id in [a for a in self._online if a not in known]:
+                    del self._online[agent_id]
+
+    # -- views --
+
+    def view(self, st: AgentState, now: Optional[datetime] = None) -> Dict:
+        now = now or datetime.utcnow()
+        return {
+            "agent_id": st.agent_id,
+            "user": st.user,
+            "hostname": st.hostname,
+            "online": _online(st, now),
+            "last_seen": _iso(st.last_seen),
+            "active_task_id": st.active_task_id,
+            "is_rhino_running": st.is_rhino_running,
+            "cpu_5m": st.cpu_5m,
+            "idle_minutes": st.idle_minutes,
+            "last_event": self._events.get(st.agent_id),
+        }
+
+    def workers(self) -> List[Dict]:
+        now = datetime.utcnow()
+        return [self.view(st, now) for st in sorted(registry.all(), key=lambda s: s.agent_id)]
+
+    def snapshot(self) -> Dict:
+        return {"type": "snapshot", "version": self.version, "workers": self.workers()}
+
+    def snapshot_json(self) -> str:
+        """Serialized snapshot, rebuilt only when the version moved."""
+        v = self.version
+        if self._cached is None or self._cached_version != v:
+            self._cached = json.dumps(self.snapshot())
+            self._cached_version = v
+        return self._cached
+
+    # -- push --
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        sub.offer(self.snapshot())
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subs.discard(sub)
+
+    def _take_delta(self) -> Optional[Dict]:
+        with self._lock:
+            if self._everything:
+                self._everything = False
+                self._dirty.clear(); self._removed.clear()
+                return self.snapshot()
+            if not (self._dirty or self._removed):
+                return None
+            dirty, removed = self._dirty, self._removed
+            self._dirty, self._removed = set(), set()
+            version = self.version
+        upsert = [self.view(st) for st in (registry.get(a) for a in sorted(dirty)) if st is not None]
+        return {"type": "delta", "version": version, "upsert": upsert, "remove": sorted(removed)}
+
+    def publish(self):
+        msg = self._take_delta()
+        for sub in list(self._subs):
+            if sub.resync:
+                sub.resync = False
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.offer(self.snapshot())
+            elif msg is not None:
+                sub.offer(msg)
+
+    async def _run(self):
+        checked = 0.0
+        while True:
+            await asyncio.sleep(PUSH_INTERVAL)
+            try:
+                if time.monotonic() - checked >= ONLINE_CHECK_INTERVAL:
+                    checked = time.monotonic()
+                    self.check_online()
+                self.publish()
+            except Exception as e:
+                logger.warning(f"Telemetry publish failed: {e}")
+
+    def start(self):
+        """Run the publisher on the app's event loop (call from an async startup hook)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+hub = TelemetryHub()
+registry.subscribe(hub.on_registry)
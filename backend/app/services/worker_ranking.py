@@ -0,0 +1,125 @@
+# backend/app/services/worker_ranking.py
+"""
+In-memory ranking of workers for assignment suggestions.
+
+Agents are kept in a sorted list keyed like the old top_free_workers sort:
+(busy, cpu_5m, idle_minutes, tasks_today, agent_id). The list is updated
+incrementally from the agent registry (heartbeat / register / set_task)
+and from assignments, so top(k) is a slice of its head. tasks_today
+counts assignments since UTC midnight (Assignment.ts is UTC) and resets
+on the first touch after the day changes.
+"""
+import threading
+from bisect import bisect_left, insort
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.orm import Assignment
+from app.services.agent_registry import AgentState, registry
+
+Key = Tuple[bool, float, float, int, str]
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+class WorkerRanking:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._order: List[Key] = []
+        self._keys: Dict[str, Key] = {}
+        self._states: Dict[str, AgentState] = {}
+        self._tasks_today: Dict[str, int] = {}
+        self._day = _today()
+
+    def __len__(self):
+        return len(self._order)
+
+    def _key(self, st: AgentState) -> Key:
+        return (st.active_task_id is not None, st.cpu_5m or 0.0, st.idle_minutes or 0.0,
+                self._tasks_today.get(st.agent_id, 0), st.agent_id)
+
+    def _remove(self, agent_id: str):
+        key = self._keys.pop(agent_id, None)
+        if key is not None:
+            i = bisect_left(self._order, key)
+            del self._order[i]
+
+    def _place(self, st: AgentState):
+        key = self._key(st)
+        if self._keys.get(st.agent_id) == key:
+            return
+        self._remove(st.agent_id)
+        insort(self._order, key)
+        self._keys[st.agent_id] = key
+
+    def _rebuild(self):
+        self._keys = {a: self._key(st) for a, st in self._states.items()}
+        self._order = sorted(self._keys.values())
+
+    def _roll(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._tasks_today.clear()
+            self._rebuild()
+
+    def on_registry(self, agent_id: Optional[str], st: Optional[AgentState]):
+        """AgentRegistry listener."""
+        with self._lock:
+            self._roll()
+            if agent_id is None:
+                self._states = {s.agent_id: s for s in registry.all()}
+                self._rebuild()
+            elif st is None:
+                self._states.pop(agent_id, None)
+                self._remove(agent_id)
+            else:
+                self._states[agent_id] = st
+                self._place(st)
+
+    def assigned(self, agent_id: str, n: int = 1):
+        with self._lock:
+            self._roll()
+            self._tasks_today[agent_id] = self._tasks_today.get(agent_id, 0) + n
+            st = self._states.get(agent_id)
+            if st is not None:
+                self._place(st)
+
+    def tasks_today(self) -> Dict[str, int]:
+        with self._lock:
+            self._roll()
+            return dict(self._tasks_today)
+
+    def load_counts(self, db: Session):
+        """Seed tasks_today from today's assignments (startup)."""
+        since = datetime.combine(_today(), time.min)
+        rows = (db.query(Assignment.agent_id, func.count(Assignment.id))
+                .filter(Assignment.ts >= since).group_by(Assignment.agent_id).all())
+        with self._lock:
+            self._day = since.date()
+            self._tasks_today = {a: int(n) for a, n in rows}
+            self._states = {s.agent_id: s for s in registry.all()}
+            self._rebuild()
+
+    def top(self, k: int = 3) -> List[Dict]:
+        with self._lock:
+            self._roll()
+            out = []
+            for key in self._order[:k]:
+                st = self._states[key[-1]]
+                out.append({
+                    "agent_id": st.agent_id,
+                    "user": st.user,
+                    "cpu_5m": key[1],
+                    "idle_minutes": key[2],
+                    "active_task_id": st.active_task_id,
+                    "tasks_today": key[3],
+                })
+            return out
+
+
+ranking = WorkerRanking()
+registry.subscribe(ranking.on_registry)
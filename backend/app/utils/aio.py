@@ -0,0 +1,17 @@
+import asyncio, threading
+
+_loop = None
+_lock = threading.Lock()
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """One long-lived event loop on a daemon thread, for running async clients from sync code."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aio-loop", daemon=True).start()
+    return _loop
+
+def run_sync(coro, timeout: float = None):
+    """Run a coroutine on the background loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result(timeout)
@@ -0,0 +1,88 @@
+# backend/app/utils/profiling.py
+"""
+Startup profiling, enabled with SLS_PROFILE_STARTUP=1.
+
+install() must run before the app's own imports (app.main does this
+first thing). It times every module's first import, with self and
+cumulative time like `python -X importtime`, and step() times the
+startup hooks. report() logs the slowest imports and every step.
+The same data is served at GET /api/telemetry/startup.
+"""
+import builtins, os, sys, threading, time
+from contextlib import contextmanager
+from importlib.util import resolve_name
+from typing import Dict, List, Tuple
+
+ENABLED = os.getenv("SLS_PROFILE_STARTUP", "").lower() in ("1", "true", "yes")
+TOP_N = int(os.getenv("SLS_PROFILE_TOP", "25"))
+
+imports: Dict[str, Tuple[float, float]] = {}  # module -> (self s, cumulative s)
+steps: List[Tuple[str, float]] = []
+_t0 = time.perf_counter()
+_stack: List[float] = []
+_main = threading.main_thread()
+_orig_import = builtins.__import__
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if threading.current_thread() is not _main:
+        return _orig_import(name, globals, locals, fromlist, level)
+    try:
+        key = resolve_name("." * level + name, (globals or {}).get("__package__")) if level else name
+    except (ImportError, ValueError):
+        key = name
+    if key in sys.modules:
+        return _orig_import(name, globals, locals, fromlist, level)
+    _stack.append(0.0)
+    t = time.perf_counter()
+    try:
+        return _orig_import(name, globals, locals, fromlist, level)
+    finally:
+        total = time.perf_counter() - t
+        children = _stack.pop()
+        if _stack:
+            _stack[-1] += total
+        imports.setdefault(key, (total - children, total))
+
+
+def install():
+    global _t0
+    if ENABLED and builtins.__import__ is not _timed_import:
+        _t0 = time.perf_counter()
+        builtins.__import__ = _timed_import
+
+
+@contextmanager
+def step(name: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            steps.append((name, time.perf_counter() - t))
+
+
+def summary() -> Dict:
+    slow = sorted(imports.items(), key=lambda kv: kv[1][0], reverse=True)[:TOP_N]
+    return {
+        "enabled": ENABLED,
+        "since_install_ms": round((time.perf_counter() - _t0) * 1000, 1),
+        "imports_ms": round(sum(s for s, _ in imports.values()) * 1000, 1),
+        "slowest_imports": [{"module": m, "self_ms": round(s * 1000, 1), "cumulative_ms": round(c * 1000, 1)}
+                            for m, (s, c) in slow],
+        "steps": [{"name": n, "ms": round(d * 1000, 1)} for n, d in steps],
+    }
+
+
+def report():
+    if not ENABLED:
+        return
+    from app.utils.logging import logger
+    s = summary()
+    lines = [f"Startup profile: {s['since_install_ms']}ms since install, {s['imports_ms']}ms in imports"]
+    lines += [f"  import {i['module']:<48} self {i['self_ms']:>8.1f}ms  cum {i['cumulative_ms']:>8.1f}ms"
+              for i in s["slowest_imports"]]
+    lines += [f"  step   {st['name']:<48} {st['ms']:>8.1f}ms" for st in s["steps"]]
+    logger.info("\n".join(lines))
+    # The hook is only meant for startup; later imports go through the original.
+    builtins.__import__ = _orig_import
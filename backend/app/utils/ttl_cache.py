@@ -0,0 +1,118 @@
+import asyncio, sys, threading, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+def _sizeof(obj, depth: int = 0) -> int:
+    """Rough deep size of plain JSON-like values (dict/list/str/numbers)."""
+    n = sys.getsizeof(obj)
+    if depth > 4:
+        return n
+    if isinstance(obj, dict):
+        n += sum(_sizeof(k, depth + 1) + _sizeof(v, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        n += sum(_sizeof(v, depth + 1) for v in obj)
+    return n
+
+class TTLCache:
+    """
+    Size-bounded LRU with a per-entry TTL. `get_or_load` is single-flight:
+    concurrent misses for one key (on the same event loop) share a single
+    loader call instead of each going upstream.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires, value, bytes)
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._bytes = 0
+        self.hits = self.misses = self.loads = self.coalesced = self.evictions = self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            if item[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        size = _sizeof(key) + _sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable = _MISSING):
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+                self._bytes = 0
+            elif key in self._data:
+                self._drop(key)
+
+    def _drop(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[float] = None, cache_if: Callable[[Any], bool] = None) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        fut = self._inflight.get(key)
+        if fut is not None:
+            # Served by someone else's upstream call: not a miss for hit-rate purposes.
+            with self._lock:
+                self.misses -= 1
+                self.coalesced += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            self.loads += 1
+            value = await loader()
+            if cache_if is None or cache_if(value):
+                self.set(key, value, ttl)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.coalesced + self.misses
+        with self._lock:
+            entries, size = len(self._data), self._bytes
+        return {
+            "name": self.name,
+            "entries": entries,
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "approx_bytes": size,
+        }
@@ -1 +1,188 @@
-# Aggregation placeholder.
+# backend/app/workers/activity_agg.py
+"""
+Incremental utilization rollups.
+
+Folds heartbeats with id above a persisted high-water mark into
+per-agent daily and hourly rollup rows and activity sessions
+(services/activity_sessions.py), plus per-task time (services/task_stats.py),
+so reports never scan raw heartbeats. The mark is advanced with a compare-and-set, so two
+aggregators racing on the same DB cannot fold the same rows twice.
+
+Beats come at an adaptive cadence, so a row is worth its reported
+`active_s`, spread evenly over the `interval_s` before it and split at
+hour boundaries. Rows from fixed-cadence agents (no interval_s) count
+LEGACY_BEAT_SECONDS when Rhino was running or in front.
+"""
+import os, threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from sqlalchemy import case, func, select, update, tuple_
+from sqlalchemy.orm import Session
+from app.models.db import SessionLocal
+from app.models.orm import Heartbeat, AgentDailyRollup, AgentHourlyRollup, WorkerState
+from app.services import activity_sessions, task_stats
+from app.utils.logging import logger
+
+LEGACY_BEAT_SECONDS = 30.0  # fixed cadence of agents that don't report interval_s
+MAX_INTERVAL = 86400.0       # longest span a single beat may cover
+AGG_INTERVAL = float(os.getenv("ACTIVITY_AGG_INTERVAL", "60"))
+AGG_BATCH = int(os.getenv("ACTIVITY_AGG_BATCH", "20000"))
+# Rows younger than this are left for the next pass so that inserts still
+# in flight from other workers (lower ids, later commit) are not skipped.
+AGG_SETTLE_SECONDS = float(os.getenv("ACTIVITY_AGG_SETTLE", "10"))
+
+STATE_KEY = "activity_agg.heartbeat_id"
+
+
+def active_seconds_sql():
+    """SQL: active seconds a heartbeat row stands for."""
+    legacy = case((Heartbeat.is_rhino_running | Heartbeat.is_rhino_foreground, LEGACY_BEAT_SECONDS), else_=0.0)
+    return func.coalesce(Heartbeat.active_s, legacy)
+
+
+def _hour(t: datetime) -> datetime:
+    return t.replace(minute=0, second=0, microsecond=0)
+
+
+def _spread(end: datetime, interval_s: float, active_s: float) -> List[Tuple[datetime, float]]:
+    """[(hour, active minutes)] for a beat covering the `interval_s` seconds up to `end`."""
+    interval_s = min(interval_s or 0.0, MAX_INTERVAL)
+    if interval_s <= 0 or not active_s:
+        return [(_hour(end), (active_s or 0.0) / 60)]
+    start, t, out = end - timedelta(seconds=interval_s), end, []
+    while t > start:
+        h = _hour(t)
+        if h == t:
+            h -= timedelta(hours=1)
+        lo = max(h, start)
+        out.append((h, active_s / 60 * (t - lo).total_seconds() / interval_s))
+        t = lo
+    return out
+
+
+def _fold(db: Session, model, key_col: str, acc: Dict[Tuple, list]):
+    if not acc:
+        return
+    key_attr = getattr(model, key_col)
+    existing = {
+        (r.agent_id, getattr(r, key_col)): r
+        for r in db.query(model).filter(tuple_(model.agent_id, key_attr).in_(list(acc.keys())))
+    }
+    for (agent_id, k), (active, count) in acc.items():
+        r = existing.get((agent_id, k))
+        if r is None:
+            db.add(model(agent_id=agent_id, active_minutes=active, heartbeats=count, **{key_col: k}))
+        else:
+            r.active_minutes = (r.active_minutes or 0.0) + active
+            r.heartbeats = (r.heartbeats or 0) + count
+
+
+def run_once(db: Session, batch: int = AGG_BATCH) -> int:
+    """Fold one batch of new heartbeats. Returns the number of heartbeats folded."""
+    state = db.get(WorkerState, STATE_KEY)
+    if state is None:
+        state = WorkerState(name=STATE_KEY, value="0")
+        db.add(state)
+        db.commit()
+    hwm = state.value or "0"
+
+    cutoff = datetime.utcnow() - timedelta(seconds=AGG_SETTLE_SECONDS)
+    rows = db.execute(
+        select(Heartbeat.id, Heartbeat.agent_id, Heartbeat.created_at, Heartbeat.interval_s,
+               Heartbeat.is_rhino_running, Heartbeat.is_rhino_foreground, active_seconds_sql(),
+               Heartbeat.active_task_id)
+        .where(Heartbeat.id > int(hwm))
+        .order_by(Heartbeat.id)
+        .limit(batch)
+    ).all()
+
+    daily: Dict[Tuple, list] = defaultdict(lambda: [0.0, 0])
+    hourly: Dict[Tuple, list] = defaultdict(lambda: [0.0, 0])
+    beats, task_beats = [], []
+    last_id = int(hwm)
+    for hb_id, agent_id, created_at, interval_s, running, foreground, active_s, task_id in rows:
+        if created_at is None:
+            last_id = hb_id
+            continue
+        if created_at > cutoff:
+            break
+        for hour, active in _spread(created_at, interval_s, active_s):
+            daily[(agent_id, hour.date())][0] += active
+            hourly[(agent_id, hour)][0] += active
+        daily[(agent_id, created_at.date())][1] += 1
+        hourly[(agent_id, _hour(created_at))][1] += 1
+        beats.append((agent_id, created_at, running, foreground, task_id))
+        if task_id:
+            interval = interval_s if interval_s is not None else LEGACY_BEAT_SECONDS
+            task_beats.append((task_id, created_at, interval, active_s or 0.0))
+        last_id = hb_id
+
+    if last_id == int(hwm):
+        return 0
+
+    _fold(db, AgentDailyRollup, "day", daily)
+    _fold(db, AgentHourlyRollup, "hour", hourly)
+    task_stats.fold(db, task_beats, activity_sessions.fold(db, beats))
+    moved = db.execute(
+        update(WorkerState)
+        .where(WorkerState.name == STATE_KEY, WorkerState.value == hwm)
+        .values(value=str(last_id), updated_at=datetime.utcnow())
+    ).rowcount
+    if moved != 1:
+        # Someone else advanced the mark; discard our fold.
+        db.rollback()
+        return 0
+    db.commit()
+    return sum(c for _, c in daily.values())
+
+
+def run_pending(max_batches: int = 100) -> int:
+    total = 0
+    db = SessionLocal()
+    try:
+        for _ in range(max_batches):
+            n = run_once(db)
+            total += n
+            if n < AGG_BATCH:
+                break
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Activity aggregation failed: {e}")
+    finally:
+        db.close()
+    return total
+
+
+_stop = threading.Event()
+_thread = None
+
+
+def _loop():
+    while not _stop.wait(AGG_INTERVAL):
+        n = run_pending()
+        if n:
+            logger.debug(f"Activity aggregation folded {n} heartbeats")
+
+
+def start():
+    global _thread
+    if _thread:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="activity-agg", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread
+    _stop.set()
+    if _thread:
+        _thread.join()
+        _thread = None
+
+
+if __name__ == "__main__":
+    from app.models.db import init_engine, create_all
+    init_engine(); create_all()
+    print(f"folded {run_pending(max_batches=10**6)} heartbeats")
@@ -0,0 +1,93 @@
+# backend/app/workers/retention.py
+"""
+Heartbeat partition maintenance and retention.
+
+Once a day: pre-create upcoming monthly partitions (Postgres) and drop
+raw heartbeats older than HEARTBEAT_RETENTION_DAYS. Only rows already
+folded into the utilization rollups and activity sessions are removed;
+raw rows are needed for `source=raw` reports and debugging. Pruning is
+off by default: heartbeats folded before activity sessions and task
+stats existed were never folded into them, and deleting those rows loses
+that history for good. Without partitioning, old rows are deleted in
+batches.
+"""
+import os, threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from app.models import db as dbm
+from app.models import partitions
+from app.models.orm import Heartbeat, WorkerState
+from app.workers.activity_agg import STATE_KEY as AGG_STATE_KEY
+from app.utils.logging import logger
+
+HEARTBEAT_RETENTION_DAYS = int(os.getenv("HEARTBEAT_RETENTION_DAYS", "0"))  # 0 = keep forever
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", str(24 * 3600)))
+DELETE_BATCH = int(os.getenv("RETENTION_DELETE_BATCH", "10000"))
+
+
+def _aggregated_up_to() -> int:
+    db = dbm.SessionLocal()
+    try:
+        st = db.get(WorkerState, AGG_STATE_KEY)
+        return int(st.value or 0) if st else 0
+    finally:
+        db.close()
+
+
+def run_once():
+    engine = dbm.engine
+    partitions.ensure_partitions(engine)
+    if HEARTBEAT_RETENTION_DAYS <= 0:
+        return
+    cutoff = datetime.utcnow() - timedelta(days=HEARTBEAT_RETENTION_DAYS)
+    max_id = _aggregated_up_to()
+    if partitions.is_partitioned(engine):
+        dropped = partitions.drop_partitions_before(engine, cutoff.date(), max_id)
+        if dropped:
+            logger.info(f"Dropped heartbeat partitions: {', '.join(dropped)}")
+        return
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            ids = select(Heartbeat.id).where(Heartbeat.created_at < cutoff, Heartbeat.id <= max_id).limit(DELETE_BATCH)
+            n = conn.execute(delete(Heartbeat).where(Heartbeat.id.in_(ids))).rowcount
+        total += n
+        if n < DELETE_BATCH:
+            break
+    if total:
+        logger.info(f"Deleted {total} heartbeats older than {cutoff:%Y-%m-%d}")
+
+
+_stop = threading.Event()
+_thread = None
+
+
+def _loop():
+    while not _stop.wait(RETENTION_INTERVAL):
+        try:
+            run_once()
+        except Exception as e:
+            logger.warning(f"Heartbeat retention failed: {e}")
+
+
+def start():
+    global _thread
+    if _thread:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="hb-retention", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread
+    _stop.set()
+    if _thread:
+        _thread.join()
+        _thread = None
+
+
+if __name__ == "__main__":
+    dbm.init_engine()
+    dbm.create_all()
+    run_once()
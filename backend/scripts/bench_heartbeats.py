@@ -0,0 +1,125 @@
+# backend/scripts/bench_heartbeats.py
+"""
+Benchmark report and worker-ranking queries with and without the
+heartbeat/event/assignment indexes.
+
+    cd backend
+    POSTGRES_URI=postgresql+psycopg2://... python -m scripts.bench_heartbeats --rows 10000000
+    python -m scripts.bench_heartbeats --rows 1000000          # SQLite, ./bench.db
+
+Seeding uses generate_series (Postgres) or a recursive CTE (SQLite), so
+10M rows take minutes, not hours. Re-run with --skip-seed to only time.
+"""
+import argparse, os, time
+from datetime import date, datetime, timedelta
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=10_000_000)
+parser.add_argument("--agents", type=int, default=300)
+parser.add_argument("--days", type=int, default=365)
+parser.add_argument("--repeat", type=int, default=3)
+parser.add_argument("--skip-seed", action="store_true")
+args = parser.parse_args()
+
+os.environ.setdefault("POSTGRES_URI", "sqlite:///./bench.db")
+
+from sqlalchemy import func, select, text  # noqa: E402
+from app.models import db as dbm  # noqa: E402
+from app.models.orm import Heartbeat, Assignment, Event  # noqa: E402
+from app.api.reports import _raw_query  # noqa: E402
+
+dbm.init_engine()
+dbm.create_all()
+engine = dbm.engine
+pg = engine.dialect.name == "postgresql"
+
+
+def seed():
+    span = args.days * 86400
+    step = max(1, span // args.rows)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM heartbeats")); conn.execute(text("DELETE FROM assignments"))
+        conn.execute(text("DELETE FROM agents"))
+        for i in range(args.agents):
+            conn.execute(text("INSERT INTO agents (agent_id, \"user\", hostname) VALUES (:a, :a, :a)"),
+                         {"a": f"agent-{i}"})
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if pg:
+            conn.execute(text(
+                "INSERT INTO heartbeats (agent_id, is_rhino_running, is_rhino_foreground, created_at, ts) "
+                "SELECT 'agent-' || (g % :a), g % 3 = 0, g % 5 = 0, "
+                "       now() - make_interval(secs => g * :step), now() - make_interval(secs => g * :step) "
+                "FROM generate_series(1, :n) g"), {"a": args.agents, "n": args.rows, "step": step})
+            conn.execute(text(
+                "INSERT INTO assignments (order_id, agent_id, task_id, ts) "
+                "SELECT g, 'agent-' || (g % :a), 'TASK-' || g, now() - make_interval(secs => g * :step) "
+                "FROM generate_series(1, :n) g"), {"a": args.agents, "n": args.rows // 1000, "step": step * 1000})
+        else:
+            conn.execute(text(
+                "INSERT INTO heartbeats (agent_id, is_rhino_running, is_rhino_foreground, created_at, ts) "
+                "WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < :n) "
+                "SELECT 'agent-' || (x % :a), x % 3 = 0, x % 5 = 0, "
+                "       datetime('now', '-' || (x * :step) || ' seconds'), datetime('now', '-' || (x * :step) || ' seconds') "
+                "FROM g"), {"a": args.agents, "n": args.rows, "step": step})
+            conn.execute(text(
+                "INSERT INTO assignments (order_id, agent_id, task_id, ts) "
+                "WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < :n) "
+                "SELECT x, 'agent-' || (x % :a), 'TASK-' || x, datetime('now', '-' || (x * :step) || ' seconds') "
+                "FROM g"), {"a": args.agents, "n": args.rows // 1000, "step": step * 1000})
+    print(f"seeded {args.rows:,} heartbeats in {time.perf_counter() - t0:.1f}s")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def queries():
+    today = date.today()
+    month_start = today - timedelta(days=30)
+    midnight = datetime.combine(today, datetime.min.time())
+    return {
+        "report 30d, all agents": _raw_query(month_start, today, None),
+        "report 30d, one agent": _raw_query(month_start, today, ["agent-7"]),
+        "report 1d, all agents": _raw_query(today, today, None),
+        "latest beat, one agent": select(func.max(Heartbeat.created_at)).where(Heartbeat.agent_id == "agent-7"),
+        "tasks today per agent": (select(Assignment.agent_id, func.count(Assignment.id))
+                                  .where(Assignment.ts >= midnight).group_by(Assignment.agent_id)),
+        "assignments for order": select(Assignment).where(Assignment.order_id == 42),
+    }
+
+
+def timeit(stmt) -> float:
+    best = float("inf")
+    for _ in range(args.repeat):
+        with engine.connect() as conn:
+            t0 = time.perf_counter()
+            conn.execute(stmt).fetchall()
+            best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def indexes():
+    return [i for t in (Heartbeat.__table__, Event.__table__, Assignment.__table__) for i in t.indexes]
+
+
+def main():
+    if not args.skip_seed:
+        seed()
+    qs = queries()
+    for idx in indexes():
+        idx.drop(bind=engine, checkfirst=True)
+    without = {name: timeit(q) for name, q in qs.items()}
+    for idx in indexes():
+        idx.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    with_idx = {name: timeit(q) for name, q in qs.items()}
+
+    print(f"\n{engine.dialect.name}, {args.rows:,} heartbeats, best of {args.repeat} (ms)")
+    print(f"{'query':<28}{'no index':>12}{'indexed':>12}{'speedup':>10}")
+    for name in qs:
+        a, b = without[name], with_idx[name]
+        print(f"{name:<28}{a:>12.1f}{b:>12.1f}{a / b if b else float('inf'):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
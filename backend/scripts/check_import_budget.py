@@ -0,0 +1,54 @@
+# backend/scripts/check_import_budget.py
+"""
+Import-time regression check for the backend.
+
+    cd backend
+    python -m scripts.check_import_budget [--budget-ms 1500] [--runs 3]
+
+Imports app.main in a fresh interpreter (best of --runs) and fails if
+that takes longer than the budget, or if any of the lazily-loaded heavy
+dependencies got pulled in at import time. Meant for CI next to
+compileall.
+"""
+import argparse, json, os, subprocess, sys
+
+LAZY = ("pandas", "openpyxl", "telegram", "jinja2", "rapidfuzz", "httpx")
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import app.main
+print(json.dumps({"ms": (time.perf_counter() - t) * 1000,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY,)
+
+
+def probe() -> dict:
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), SLS_PROFILE_STARTUP="")
+    env.setdefault("POSTGRES_URI", "sqlite:///:memory:")
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    best = min(r["ms"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    print(f"import app.main: best {best:.0f}ms of {args.runs} (budget {args.budget_ms:.0f}ms)")
+    failed = False
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if best > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# backend/scripts/fake_dropbox.py
+"""
+Minimal local stand-in for the Dropbox HTTP API, for exercising the
+similar-file search without a real account.
+
+    cd backend
+    uvicorn scripts.fake_dropbox:app --port 8765
+    DROPBOX_API_BASE=http://127.0.0.1:8765/2 DROPBOX_TOKEN=fake uvicorn app.main:app
+
+FAKE_DROPBOX_LATENCY adds a per-call delay (seconds) to make the
+concurrency visible; FAKE_DROPBOX_FILES is a text file with one
+Dropbox-style path per line (defaults to a small built-in library).
+"""
+import asyncio, os
+from fastapi import FastAPI, Request
+
+LATENCY = float(os.getenv("FAKE_DROPBOX_LATENCY", "0.3"))
+
+_DEFAULT = [
+    "/library/er/er_sol_rou_14kw_6_5.3dm", "/library/er/er_sol_rou_14ky_7_0.3dm",
+    "/library/er/er_hal_ovl_pt_6_0.3dm", "/library/er/er_hal_ovl_18kw_6_5.3dm",
+    "/library/er/er_hha_cus_14kw_5_5.3dm", "/library/wb/wb_tst_eme_14kr_7_0.3dm",
+    "/library/wb/wb_sol_pri_pt.3dm", "/library/ear/ear_bez_rou_14kw.3dm",
+]
+
+def _load():
+    path = os.getenv("FAKE_DROPBOX_FILES")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return [l.strip() for l in f if l.strip()]
+    return _DEFAULT
+
+FILES = _load()
+stats = {"calls": 0}
+app = FastAPI(title="fake dropbox")
+
+def _md(path: str) -> dict:
+    return {".tag": "file", "name": path.rsplit("/", 1)[-1], "path_lower": path.lower(),
+            "path_display": path, "id": f"id:{abs(hash(path))}", "size": 1000 + len(path) * 37}
+
+@app.post("/2/files/search_v2")
+async def search_v2(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+    await asyncio.sleep(LATENCY)
+    terms = body.get("query", "").lower().replace(".3dm", "").split("_")
+    hits = [p for p in FILES if all(t in p.lower() for t in terms if t)]
+    return {"matches": [{"metadata": {".tag": "metadata", "metadata": _md(p)}} for p in hits[:100]],
+            "has_more": False}
+
+@app.post("/2/files/get_temporary_link")
+async def get_temporary_link(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+    await asyncio.sleep(LATENCY)
+    return {"metadata": _md(body["path"]), "link": f"https://fake-dl.local{body['path']}"}
+
+PAGE = 3
+
+@app.post("/2/files/list_folder")
+async def list_folder(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+    root = (body.get("path") or "").lower()
+    return _list_page([p for p in FILES if p.lower().startswith(root)], 0, body.get("limit") or PAGE)
+
+@app.post("/2/files/list_folder/continue")
+async def list_folder_continue(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+    offset, limit = (int(x) for x in body["cursor"].split(":"))
+    return _list_page(FILES, offset, limit)
+
+def _list_page(paths, offset: int, limit: int) -> dict:
+    # Cursor is "offset:limit"; an exhausted cursor returns no entries until
+    # FILES grows, which is enough to exercise incremental sync.
+    limit = min(limit, PAGE)
+    page = paths[offset:offset + limit]
+    nxt = offset + len(page)
+    return {"entries": [_md(p) for p in page], "cursor": f"{nxt}:{limit}", "has_more": nxt < len(paths)}
+
+@app.get("/stats")
+def get_stats():
+    return stats
@@ -0,0 +1,237 @@
+# backend/scripts/simulate_scheduler.py
+"""
+Discrete-event simulation of order assignment, one run per scheduler policy.
+
+    cd backend
+    python -m scripts.simulate_scheduler --days 30                  # replay the DB (POSTGRES_URI)
+    python -m scripts.simulate_scheduler --synthetic --agents 12 --orders 2000
+    python -m scripts.simulate_scheduler --policies legacy,ect --seed 7
+
+Replay mode takes order arrivals (orders.created_at, category) from the
+last --days and treats an agent as on shift while it has heartbeats no
+more than --online-gap minutes apart. Task durations come from historical
+turnaround (scheduler.History over the whole table), scaled by
+lognormal noise. The noise is seeded per (order, agent), so every policy
+sees the same workload and the same task costs. Policies themselves only
+see history from before the window.
+
+Each order is assigned on arrival to the policy's first pick among
+on-shift agents and waits in that agent's FIFO queue. With nobody on
+shift it waits in a backlog, which is re-offered on every event and
+every --tick minutes. cpu_5m is always 0, as the agent reports today.
+"""
+import argparse, heapq, math, os, random, statistics
+from bisect import bisect_right
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--policies", default="")
+parser.add_argument("--days", type=int, default=30)
+parser.add_argument("--online-gap", type=float, default=5.0, help="minutes between heartbeats still counted as on shift")
+parser.add_argument("--tick", type=float, default=15.0, help="minutes between backlog re-offers")
+parser.add_argument("--sigma", type=float, default=0.35, help="lognormal spread of task durations")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--synthetic", action="store_true")
+parser.add_argument("--agents", type=int, default=10)
+parser.add_argument("--orders", type=int, default=1000)
+parser.add_argument("--rate", type=float, default=3.0, help="synthetic orders per hour")
+args = parser.parse_args()
+
+os.environ.setdefault("POSTGRES_URI", "sqlite:///./sls.db")
+
+from app.services.scheduler import History, POLICIES, Worker, make_policy  # noqa: E402
+
+CATEGORIES = ["ER", "WB", "Earring", "Necklace", "Bracelet"]
+
+
+@dataclass
+class Workload:
+    start: float                                  # epoch seconds
+    orders: List[tuple]                           # (t, category), time-ordered
+    agents: List[str]
+    online: Dict[str, List[float]] = field(default_factory=dict)  # agent -> heartbeat times; missing = always on
+    truth: History = field(default_factory=History)      # drives simulated durations
+    prior: History = field(default_factory=History)      # what policies know at t=start
+
+    def is_online(self, agent_id: str, t: float) -> bool:
+        beats = self.online.get(agent_id)
+        if beats is None:
+            return True
+        i = bisect_right(beats, t)
+        return i > 0 and t - beats[i - 1] <= args.online_gap * 60
+
+    def duration(self, idx: int, agent_id: str, category: str) -> float:
+        """Seconds; identical for a given (order, agent) whichever policy asks."""
+        rng = random.Random(f"{args.seed}:{idx}:{agent_id}")
+        return self.truth.expected_minutes(agent_id, category) * 60 * math.exp(rng.gauss(0, args.sigma))
+
+
+def synthetic() -> Workload:
+    rng = random.Random(args.seed)
+    agents = [f"agent-{i:02d}" for i in range(args.agents)]
+    truth = History()
+    for a in agents:
+        base = rng.uniform(60, 180)
+        for c in CATEGORIES:
+            # Each worker is quick at a couple of categories and slow at the rest.
+            truth.record_duration(a, c, base * (0.6 if rng.random() < 0.35 else rng.uniform(1.0, 1.6)))
+    prior = History()
+    for a in agents:
+        for c in CATEGORIES:
+            fast = truth.expected_minutes(a, c) < truth.expected_minutes(a, "")
+            for _ in range(rng.randint(5, 20) if fast else rng.randint(0, 4)):
+                prior.record_assignment(a, c)
+                prior.record_duration(a, c, truth.expected_minutes(a, c) * math.exp(rng.gauss(0, args.sigma)))
+    t, orders = 0.0, []
+    weights = [5, 3, 2, 1, 1]
+    for _ in range(args.orders):
+        t += rng.expovariate(args.rate / 3600)
+        orders.append((t, rng.choices(CATEGORIES, weights)[0]))
+    return Workload(start=0.0, orders=orders, agents=agents, truth=truth, prior=prior)
+
+
+def replay() -> Workload:
+    from app.models import db as dbm
+    from app.models.orm import Heartbeat, Order
+    dbm.init_engine()
+    dbm.create_all()
+    db = dbm.SessionLocal()
+    try:
+        end = datetime.utcnow()
+        begin = end - timedelta(days=args.days)
+        orders = [(o.created_at.timestamp(), o.category or "") for o in
+                  db.query(Order.created_at, Order.category)
+                  .filter(Order.created_at >= begin).order_by(Order.created_at)]
+        online: Dict[str, List[float]] = defaultdict(list)
+        q = (db.query(Heartbeat.agent_id, Heartbeat.created_at).filter(Heartbeat.created_at >= begin)
+             .order_by(Heartbeat.agent_id, Heartbeat.created_at).execution_options(yield_per=10000))
+        for agent_id, ts in q:
+            online[agent_id].append(ts.timestamp())
+        truth = History.from_db(db, since=datetime(1970, 1, 2), until=end + timedelta(days=1))
+        prior = History.from_db(db, until=begin)
+    finally:
+        db.close()
+    if not orders or not online:
+        raise SystemExit("no orders/heartbeats in the window; try --synthetic or a larger --days")
+    return Workload(start=begin.timestamp(), orders=orders, agents=sorted(online), online=dict(online),
+                    truth=truth, prior=prior)
+
+
+def _pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+
+def simulate(w: Workload, policy_name: str) -> Dict:
+    policy = make_policy(policy_name)
+    history = w.prior.copy()
+
+    queues: Dict[str, deque] = {a: deque() for a in w.agents}
+    running: Dict[str, Optional[tuple]] = {a: None for a in w.agents}  # (idx, category, started, arrived)
+    last_free: Dict[str, float] = {a: w.start for a in w.agents}
+    day_counts: Dict[tuple, int] = defaultdict(int)
+    busy_time: Dict[str, float] = defaultdict(float)
+    backlog: deque = deque()
+    waits, flows, max_queue = [], [], 0
+    events, seq = [], 0
+
+    def push(t, kind, data):
+        nonlocal seq
+        heapq.heappush(events, (t, seq, kind, data)); seq += 1
+
+    def start_next(agent_id, t):
+        if running[agent_id] is None and queues[agent_id]:
+            idx, cat, arrived = queues[agent_id].popleft()
+            running[agent_id] = (idx, cat, t, arrived)
+            waits.append(t - arrived)
+            push(t + w.duration(idx, agent_id, cat), "finish", agent_id)
+
+    def offer(idx, cat, arrived, t) -> bool:
+        nonlocal max_queue
+        online = [a for a in w.agents if w.is_online(a, t)]
+        if not online:
+            return False
+        day = int(t // 86400)
+        views = []
+        for a in online:
+            run = running[a]
+            views.append(Worker(agent_id=a, busy=run is not None, queue=len(queues[a]) + (run is not None),
+                                busy_since=run[2] if run else None, cpu_5m=0.0,
+                                idle_minutes=0.0 if run else (t - last_free[a]) / 60,
+                                tasks_today=day_counts[(a, day)]))
+        pick = policy.rank(views, cat, history, t)[0]
+        policy.assigned(pick, cat)
+        history.record_assignment(pick.agent_id, cat)
+        day_counts[(pick.agent_id, day)] += 1
+        queues[pick.agent_id].append((idx, cat, arrived))
+        max_queue = max(max_queue, len(queues[pick.agent_id]))
+        start_next(pick.agent_id, t)
+        return True
+
+    def drain_backlog(t):
+        while backlog and offer(*backlog[0], t):
+            backlog.popleft()
+
+    for idx, (t, cat) in enumerate(w.orders):
+        push(t, "arrive", (idx, cat))
+    end_of_arrivals = w.orders[-1][0]
+    push(w.start + args.tick * 60, "tick", None)
+
+    t = w.start
+    while events:
+        t, _, kind, data = heapq.heappop(events)
+        if kind == "arrive":
+            idx, cat = data
+            if backlog or not offer(idx, cat, t, t):
+                backlog.append((idx, cat, t))
+        elif kind == "finish":
+            agent_id = data
+            idx, cat, started, arrived = running[agent_id]
+            running[agent_id] = None
+            minutes = (t - started) / 60
+            history.record_duration(agent_id, cat, minutes)
+            busy_time[agent_id] += t - started
+            flows.append(t - arrived)
+            last_free[agent_id] = t
+            start_next(agent_id, t)
+        elif kind == "tick" and (backlog or t < end_of_arrivals):
+            push(t + args.tick * 60, "tick", None)
+        drain_backlog(t)
+
+    span_h = max(1e-9, (t - w.start) / 3600)
+    util = [busy_time[a] / (t - w.start) for a in w.agents] if t > w.start else [0.0]
+    return {
+        "policy": policy_name,
+        "done": len(flows),
+        "throughput_h": len(flows) / span_h,
+        "makespan_h": span_h,
+        "wait_mean_m": statistics.fmean(waits) / 60 if waits else 0.0,
+        "wait_p95_m": _pct(waits, 0.95) / 60,
+        "flow_mean_m": statistics.fmean(flows) / 60 if flows else 0.0,
+        "flow_p95_m": _pct(flows, 0.95) / 60,
+        "max_queue": max_queue,
+        "util_mean": statistics.fmean(util),
+        "util_spread": statistics.pstdev(util),
+    }
+
+
+def main():
+    w = synthetic() if args.synthetic else replay()
+    names = [p for p in args.policies.split(",") if p] or list(POLICIES)
+    print(f"{len(w.orders)} orders, {len(w.agents)} agents, "
+          f"{(w.orders[-1][0] - w.orders[0][0]) / 3600:.1f}h of arrivals")
+    cols = ["policy", "done", "throughput_h", "makespan_h", "wait_mean_m", "wait_p95_m",
+            "flow_mean_m", "flow_p95_m", "max_queue", "util_mean", "util_spread"]
+    print("  ".join(f"{c:>12}" for c in cols))
+    for name in names:
+        r = simulate(w, name)
+        print("  ".join(f"{r[c]:>12.2f}" if isinstance(r[c], float) else f"{r[c]:>12}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()